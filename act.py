@@ -52,3 +52,57 @@ VOID_ACTION = (
     NONE,
     np.array([])
 )
+
+# Compact actions: a small-int verb and a direction, as a single integer
+# code (verb * N_DIRECTIONS + direction) with per-code tables, so that the
+# actions of all agents fit in an integer array. Minds choose actions in the
+# (verb, arguments) form above, which is encoded once chosen.
+
+# Verbs (their codes are their indexes in VERBS).
+VERBS = (NONE, MOVE, EAT)
+VERB_CODES = {verb: code for code, verb in enumerate(VERBS)}
+VERB_NONE, VERB_MOVE, VERB_EAT = (VERB_CODES[verb] for verb in VERBS)
+
+# Directions: indexes of XY_8_DELTAS (the same as grid.NEIGHBOURS' bits),
+# plus HERE for (0, 0), i.e. no direction at all.
+HERE = len(XY_8_DELTAS)
+N_DIRECTIONS = HERE + 1
+DIRECTION_DELTAS = np.array(XY_8_DELTAS + [[0, 0]], dtype=np.int64)
+DIRECTION_ICONS = XY_8_ICONS + ("",)
+# Direction of each (dx, dy), as DIRECTION_INDEX[dx + 1][dy + 1].
+DIRECTION_INDEX = [[XY_8_DELTAS.index([dx, dy]) if (dx, dy) != (0, 0) else HERE for dy in (-1, 0, 1)]
+                   for dx in (-1, 0, 1)]
+
+# Tables per action code.
+N_ACTIONS = len(VERBS) * N_DIRECTIONS
+ACTION_VERBS = np.repeat(np.arange(len(VERBS)), N_DIRECTIONS)
+ACTION_DELTAS = np.tile(DIRECTION_DELTAS, (len(VERBS), 1))
+ACTION_ICONS = DIRECTION_ICONS * len(VERBS)
+ENERGY_RATIOS = np.array([ACTIONS_DEF[VERBS[verb]].energy_ratio for verb in ACTION_VERBS])
+
+VOID_CODE = VERB_NONE * N_DIRECTIONS + HERE  # Code of VOID_ACTION.
+
+###############################################################################
+# Auxiliary functions
+
+
+def encode_action(action):
+    # Return the code of an action in (verb, arguments) form.
+    verb, arguments = action
+    verb_code = VERB_CODES.get(verb)
+    if verb_code is None:
+        raise Exception('Invalid action type passed: {}.'.format(verb))
+    if verb_code == VERB_NONE or len(arguments) == 0:
+        return verb_code * N_DIRECTIONS + HERE
+    dx, dy = arguments
+    if not (-1 <= dx <= 1 and -1 <= dy <= 1):
+        raise Exception('Invalid action arguments passed: {}.'.format(arguments))
+    return verb_code * N_DIRECTIONS + DIRECTION_INDEX[dx + 1][dy + 1]
+
+
+def decode_action(code):
+    # Return the action of a code in (verb, arguments) form.
+    verb = VERBS[ACTION_VERBS[code]]
+    if verb == NONE:
+        return VOID_ACTION
+    return [verb, ACTION_DELTAS[code].copy()]
@@ -10,6 +10,8 @@ import random
 
 # Modules
 import act
+import grid
+import vision as vis
 
 ###############################################################################
 # CONSTANTS
@@ -26,6 +28,9 @@ DISTANCE_MAP_2_TILES = np.array([
 ])
 DISTANCE_MAP_2_TILES_CENTER = [2, 2]
 
+VISION_RADIUS = 6  # Number of tiles agents with 'vision' can see around.
+OCCUPIED = 0  # Value for occupied (or unseen) tiles in occupation maps.
+
 NO_PERCEPTION = None
 NO_ACTION = None
 NO_LEARNING = None
@@ -85,7 +90,7 @@ def obtain_move(occupation_bitmap, position, radius=1):
         radius)
 
     # Obtain relative position of all UNOCCUPIED positions in submap.
-    moves_list = np.argwhere(occupation_submap == 1)  # TODO: use UNOCCUPIED_TILE.
+    moves_list = np.argwhere(occupation_submap == grid.UNOCCUPIED_TILE)
 
     if len(moves_list > 0):
         # Some move(s) found: pick a random one.
@@ -103,6 +108,42 @@ def obtain_move(occupation_bitmap, position, radius=1):
     return move
 
 
+def pick_neighbour(mask):
+    # Return the delta to a random neighbour among those flagged in an 8-bit
+    # neighbour mask (see grid.py), or 'None' if there's none.
+    count = int(grid.MASK_COUNTS[mask])
+    if count == 0:
+        return None
+    return grid.MASK_DELTAS[mask, random.randint(0, count - 1)].copy()
+
+
+def adjacent_move(world, position):
+    # Return a delta to a random unoccupied adjacent tile, or 'None' if none
+    # is found: a lookup on the world's neighbour masks (if it keeps them,
+    # unlike e.g. visual fields), picking the same as obtain_move() would.
+    free_masks = getattr(world, "free_masks", None)
+    if free_masks is None:
+        return obtain_move(world.occupation_bitmap, position, act.ACTIONS_DEF[act.MOVE].radius)
+    return pick_neighbour(free_masks.at(position))
+
+
+def adjacent_bite(world, position, highest=False):
+    # Return a delta to a random adjacent tile with some energy (the highest
+    # around, if 'highest'), or 'None' if none is found: a lookup on the
+    # world's neighbour masks (if it keeps them), picking the same as
+    # obtain_bite() would.
+    energy_masks = getattr(world, "energy_masks", None)
+    if energy_masks is None:
+        return obtain_bite(world.energy_map, position, act.ACTIONS_DEF[act.EAT].radius, highest)
+    mask = energy_masks.at(position)
+    if highest and grid.MASK_COUNTS[mask] > 1:
+        deltas = grid.MASK_DELTAS[mask, :grid.MASK_COUNTS[mask]]
+        energies = world.energy_map[position[0] + deltas[:, 0], position[1] + deltas[:, 1]]
+        bites = deltas[energies == energies.max()]
+        return bites[random.randint(0, len(bites) - 1)].copy()
+    return pick_neighbour(mask)
+
+
 def obtain_best_escape(occupation_bitmap, position,
                        negative_touch_map, max_loss_position, radius=1):
     # Return a delta with the move best escaping from a 'bite', i.e.
@@ -154,6 +195,43 @@ def obtain_best_escape(occupation_bitmap, position,
     return best_escape
 
 
+def obtain_descent(distance_field, occupation_bitmap, position):
+    # Return a delta from the given position leading to the free adjacent
+    # tile closest to the sources of 'distance_field' (a random one among
+    # equally close), or 'None' if no free adjacent tile reaches any source.
+    # (The agent's own tile is occupied, so distance_field has no distance
+    # for it to compare with: its distance is one more than that of its
+    # closest free neighbour, which any move returned gets closer to.)
+
+    # Obtain submaps around position (center and occupied tiles excluded).
+    distance_submap, submap_origin = copy_submap(distance_field, position)
+    occupation_submap, _ = copy_submap(occupation_bitmap, position)
+    distance_submap[occupation_submap != grid.UNOCCUPIED_TILE] = grid.UNREACHABLE
+
+    min_distance = distance_submap.min()
+    if min_distance < grid.UNREACHABLE:
+        # Pick any of the closest tiles.
+        moves_list = np.argwhere(distance_submap == min_distance)
+        move_position = moves_list[random.randint(0, len(moves_list) - 1)]
+        move = np.array([
+            submap_origin[0] + move_position[0] - position[0],
+            submap_origin[1] + move_position[1] - position[1]
+            ])
+    else:
+        # Handle void result.
+        move = None
+
+    return move
+
+
+def perceived_position(agent, world):
+    # Return the agent's position on the maps it perceives: the world's
+    # (with 'full_info') or a local window (with 'vision').
+    if isinstance(world, vis.Visual_field):
+        return world.position
+    return agent.position
+
+
 def copy_submap(map, position, radius=1):
     # Return:
     # submap: a subset copied from the given map centered around 'position'
@@ -173,9 +251,11 @@ def copy_submap(map, position, radius=1):
     # Get 'submap_origin'.
     submap_origin = [submap_x0, submap_y0]
 
-    # Copy subrectangle on submap.
-    submap = np.copy(
-        map[submap_x0:submap_x1+1, submap_y0:submap_y1+1]
+    # Copy subrectangle on submap (widening small types, e.g. uint8
+    # occupation, to hold OFF_BOARD).
+    submap = np.array(
+        map[submap_x0:submap_x1+1, submap_y0:submap_y1+1],
+        dtype=np.promote_types(map.dtype, np.int32)
     )
 
     # Mark central position as OFF_BOARD.
@@ -260,6 +340,23 @@ def full_info(agent, world=None):
     return state
 
 
+def vision(agent, world):
+    # Perception limited to what the agent can see within VISION_RADIUS:
+    # blocks and other agents hide the tiles behind them.
+    # The state contains the agent and a Visual_field (see vision.py module),
+    # which offers local 'energy_map' and 'occupation_bitmap' maps.
+    view = world.visibility.visual_field(
+        agent.position,
+        VISION_RADIUS,
+        world.energy_map,
+        world.occupation_bitmap,
+        OCCUPIED)
+
+    state = (agent, view)
+
+    return state
+
+
 ###############################################################################
 # Minds: Action
 #
@@ -277,6 +374,7 @@ def full_info(agent, world=None):
 #       - action_arguments, e.g. [-1, 1], [].
 #       - action_energy_ratio, the cost invested in the action,
 #         as a multiplier of agent.move_cost, e.g. 1.0, 0.0, 4.0.
+#   (Once chosen, actions are encoded as integers, see act.encode_action().)
 ###############################################################################
 
 def passive(state=None):
@@ -295,6 +393,7 @@ def wanderer(state):
     # - Capability to eat from adjacent objects at times.
 
     agent, world = state  # Extract both complete objects from tuple.
+    position = perceived_position(agent, world)  # Agent's position on the maps perceived.
 
     inertia_prob = 0.66  # Probability of repeating latest action.
     stopping_prob = 0.1  # Probability of stopping vs. doing something.
@@ -309,21 +408,13 @@ def wanderer(state):
             action = act.VOID_ACTION
         else:
             # EAT: Check for close agents.
-            xy_delta = obtain_bite(
-                world.energy_map,
-                agent.position,
-                act.ACTIONS_DEF[act.EAT].radius
-                )
+            xy_delta = adjacent_bite(world, position)
             if random.uniform(0, 1) <= biting_prob and xy_delta is not None:
                 # Some bite is possible.
                 action = [act.EAT, xy_delta]
             else:
                 # MOVE: Choose a random legal move.
-                xy_delta = obtain_move(
-                    world.occupation_bitmap,
-                    agent.position,
-                    act.ACTIONS_DEF[act.MOVE].radius
-                    )
+                xy_delta = adjacent_move(world, position)
                 if xy_delta is not None:
                     action = [act.MOVE, xy_delta]
                 else:
@@ -339,6 +430,7 @@ def wanderer2(state):
     # 3. Otherwise, act as a regular 'wanderer'.
 
     agent, world = state  # Extract both complete objects.
+    position = perceived_position(agent, world)  # Agent's position on the maps perceived.
 
     loss_threshold = agent.step_cost  # Arbitrary, relative to agent.
     hunger_threshold = 0.5  # Energy ratio below which eating is prioritary.
@@ -356,7 +448,7 @@ def wanderer2(state):
             # Pain detected: try to escape.
             best_move_delta = obtain_best_escape(
                 world.occupation_bitmap,
-                agent.position,
+                position,
                 agent.negative_touch_map,
                 max_loss_position)
             if best_move_delta is not None:
@@ -366,11 +458,7 @@ def wanderer2(state):
     if action == act.VOID_ACTION:
         if agent.energy / agent.max_energy < hunger_threshold:
             # Hungry: try best bite.
-            best_move_delta = obtain_bite(
-                world.energy_map,
-                agent.position,
-                act.ACTIONS_DEF[act.EAT].radius,
-                highest=True)
+            best_move_delta = adjacent_bite(world, position, highest=True)
             if best_move_delta is not None:
                 action = [act.EAT, best_move_delta]
 
@@ -380,6 +468,40 @@ def wanderer2(state):
 
     return action
 
+
+def hunter(state):
+    # A hard-coded AI chasing energy:
+    # 1. Never miss adjacent food: bite the highest-energy target around.
+    # 2. Otherwise, move towards the closest reachable energy, following the
+    #    distance field shared by all hunters (requires 'full_info').
+    # 3. Otherwise (nothing reachable, or limited perception), act as a 'wanderer'.
+
+    agent, world = state  # Extract both complete objects.
+    position = perceived_position(agent, world)  # Agent's position on the maps perceived.
+
+    # 0. Default action is to rest.
+    action = act.VOID_ACTION
+
+    # 1. Bite.
+    xy_delta = adjacent_bite(world, position, highest=True)
+    if xy_delta is not None:
+        action = [act.EAT, xy_delta]
+
+    # 2. Chase.
+    if action == act.VOID_ACTION and not isinstance(world, vis.Visual_field):
+        xy_delta = obtain_descent(
+            world.energy_field(ignore=hunter),
+            world.occupation_bitmap,
+            position)
+        if xy_delta is not None:
+            action = [act.MOVE, xy_delta]
+
+    # 3. Act as a regular 'wanderer'.
+    if action == act.VOID_ACTION:
+        action = wanderer(state)
+
+    return action
+
 ###############################################################################
 # Minds: Learning
 #
@@ -0,0 +1,115 @@
+###############################################################################
+# CLOCK
+# Frame scheduling for "Lil' ASCII Lab"'s main loop...
+###############################################################################
+
+# Libraries.
+import numpy as np
+import time
+from collections import deque
+
+# Modules.
+import world as w
+
+###############################################################################
+# CONSTANTS
+
+# Catch-up policies, applied when the loop falls behind its deadlines:
+CATCH_UP = "catch-up"  # Run the missed steps (up to 'max_catch_up') before drawing again.
+DROP_FRAMES = "drop"  # Skip the missed steps, keeping the original cadence.
+
+# Scheduler settings:
+SCHEDULER_DEF = dict(
+    catch_up=CATCH_UP,  # Policy when deadlines are missed (CATCH_UP or DROP_FRAMES).
+    max_catch_up=5,  # Maximum number of extra steps run in a row to catch up.
+    stats_window=50,  # Number of latest steps used for achieved fps and jitter.
+)
+
+###############################################################################
+
+
+class Scheduler:
+    # Paces world steps against absolute deadlines on a monotonic clock, so
+    # that the time spent on steps, drawing and input never accumulates as drift.
+    def __init__(self, world, scheduler_def=SCHEDULER_DEF):
+        self.world = world
+        self.catch_up = scheduler_def["catch_up"]
+        self.max_catch_up = scheduler_def["max_catch_up"]
+
+        self.next_deadline = None  # None: (re)anchor on next check.
+        self.spf = world.spf  # Speed the deadlines were computed for.
+        self.last_tick = None  # Time at which latest step was started.
+        self.step_dt = w.WORLD_DEFAULT_SPF  # Simulated seconds for next steps.
+        self.dropped_frames = 0  # Number of deadlines skipped (DROP_FRAMES).
+        self.ticks = deque(maxlen=scheduler_def["stats_window"])
+
+    def hold(self):
+        # The simulation is halted: forget deadlines, so that resuming
+        # doesn't trigger a burst of catch-up steps.
+        self.next_deadline = None
+        self.last_tick = None
+        self.ticks.clear()
+
+    def time_to_next_step(self):
+        # Return the number of seconds to wait till next step is due.
+        if self.world.spf is None or self.next_deadline is None:
+            return 0
+        return max(0, self.next_deadline - time.monotonic())
+
+    def steps_due(self):
+        # Return the number of steps to run right now (0 if not due yet),
+        # updating deadlines as per catch-up policy.
+        now = time.monotonic()
+        spf = self.world.spf
+
+        if spf is None:
+            # Full-speed: always due; simulated time is the real time taken.
+            if self.last_tick is not None:
+                self.step_dt = now - self.last_tick
+            self.next_deadline = now
+            self.spf = spf
+            self.tick(now, 1)
+            return 1
+
+        if self.next_deadline is None or spf != self.spf:
+            # Start (or speed changed): anchor deadlines at current time.
+            self.next_deadline = now
+            self.spf = spf
+        if now < self.next_deadline:
+            return 0
+
+        # Count deadlines missed, besides the current one.
+        missed = int((now - self.next_deadline) // spf)
+        if self.catch_up == CATCH_UP:
+            n_steps = 1 + min(missed, self.max_catch_up)
+            if missed > self.max_catch_up:
+                # Too far behind: give up on the rest and re-anchor.
+                self.next_deadline = now + spf
+            else:
+                self.next_deadline += n_steps * spf
+        else:
+            n_steps = 1
+            self.dropped_frames += missed
+            self.next_deadline += (1 + missed) * spf
+
+        self.step_dt = spf
+        self.tick(now, n_steps)
+        return n_steps
+
+    def tick(self, now, n_steps):
+        # Register the start of a frame running n_steps.
+        self.last_tick = now
+        self.ticks.append((now, n_steps))
+
+    def achieved_fps(self):
+        # Steps actually run per second, or None if still unknown.
+        if len(self.ticks) < 2 or self.ticks[-1][0] == self.ticks[0][0]:
+            return None
+        steps = sum(n_steps for _, n_steps in self.ticks) - self.ticks[-1][1]
+        return steps / (self.ticks[-1][0] - self.ticks[0][0])
+
+    def jitter(self):
+        # Standard deviation (in seconds) of the intervals between frames.
+        if len(self.ticks) < 3:
+            return 0.0
+        return float(np.std(np.diff([t for t, _ in self.ticks])))
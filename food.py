@@ -0,0 +1,53 @@
+###############################################################################
+# FOOD
+# Energy growing on the ground of "Lil' ASCII Lab"'s worlds...
+#
+# An optional grid with the food on each tile, which grows, is capped and
+# diffuses on every step in whole-map NumPy operations (no per-tile loops).
+# Agents harvest it by EATing on empty tiles.
+###############################################################################
+
+# Libraries.
+import numpy as np
+from collections import namedtuple
+
+# Modules.
+import grid
+
+###############################################################################
+# FOOD:
+# Settings defining the food layer of a world:
+
+Food_def = namedtuple("Food_def", [
+    'initial',  # Food on each tile at start.
+    'growth',  # Relative growth per step (logistic, towards 'maximum').
+    'regrowth',  # Food added per step on every tile (so that bare tiles recover).
+    'maximum',  # Food a tile can hold.
+    'diffusion'  # Share of the difference between 4-adjacent tiles evened out per step [0, 0.25].
+])
+
+# Default settings:
+FOOD_DEF = Food_def(
+    initial=1,
+    growth=0.05,
+    regrowth=0.01,
+    maximum=10,
+    diffusion=0.05
+)
+
+###############################################################################
+# Functions
+
+
+def create(food_def, fertile):
+    # Return the initial food grid, with food on 'fertile' tiles only (e.g.
+    # those with no blocks).
+    return np.where(fertile, float(food_def.initial), 0.)
+
+
+def grow(food, food_def, fertile):
+    # Grow, cap and diffuse the 'food' grid in place (on 'fertile' tiles).
+    food += food_def.growth * food * (1 - food / food_def.maximum) + food_def.regrowth
+    np.minimum(food, food_def.maximum, out=food)
+    food *= fertile
+    grid.diffuse(food, fertile, food_def.diffusion)
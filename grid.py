@@ -0,0 +1,256 @@
+###############################################################################
+# GRID
+# Whole-map operations on "Lil' ASCII Lab"'s grids (NumPy, no per-tile loops)...
+###############################################################################
+
+# Libraries.
+import numpy as np
+
+# Modules.
+pass
+
+###############################################################################
+# CONSTANTS
+
+UNREACHABLE = np.iinfo(np.int32).max  # Distance to tiles with no path to any source.
+
+# Values on occupation bitmaps (see World.occupation_bitmap):
+OCCUPIED_TILE = 0  # Multiply to ZERO OUT values on maps.
+UNOCCUPIED_TILE = 1  # Multiply to KEEP values on maps.
+
+# Neighbour masks: 8 bits per tile, bit k flagging its k-th neighbour (as
+# per NEIGHBOURS, in the same order as act.XY_8_DELTAS).
+NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+# Lookup tables per mask (0..255): number of neighbours flagged, and their
+# deltas (the first MASK_COUNTS[mask] rows, in order).
+MASK_COUNTS = np.array([bin(mask).count("1") for mask in range(256)], dtype=np.uint8)
+MASK_DELTAS = np.array([[delta for k, delta in enumerate(NEIGHBOURS) if mask >> k & 1]
+                        + [(0, 0)] * (8 - MASK_COUNTS[mask]) for mask in range(256)], dtype=np.int64)
+
+###############################################################################
+# Functions
+
+
+def dilate(mask):
+    # Return the boolean 'mask' grown by one tile in all 8 directions.
+    grown = mask.copy()
+    grown[1:, :] |= mask[:-1, :]
+    grown[:-1, :] |= mask[1:, :]
+    result = grown.copy()
+    result[:, 1:] |= grown[:, :-1]
+    result[:, :-1] |= grown[:, 1:]
+    return result
+
+
+def distance_field(sources, walkable, max_distance=None):
+    # Return an int32 grid with the number of 8-adjacent steps from each tile
+    # to its closest 'sources' tile, moving over 'walkable' tiles only
+    # (multi-source BFS as a vectorized wavefront).
+    # Unreachable tiles (or farther than max_distance) get UNREACHABLE.
+    distances = np.full(sources.shape, UNREACHABLE, dtype=np.int32)
+    distances[sources] = 0
+    reached = sources.copy()
+    frontier = sources
+    d = 0
+    while max_distance is None or d < max_distance:
+        d += 1
+        frontier = dilate(frontier) & walkable & ~reached
+        if not frontier.any():
+            break
+        distances[frontier] = d
+        reached |= frontier
+    return distances
+
+
+def grow_labels(labels):
+    # Return (labels, distances): every tile of the int 'labels' grid (-1 =
+    # unlabelled) takes the label of its closest labelled tile, with the
+    # number of 8-adjacent steps to it (like distance_field, over all tiles;
+    # ties go to the first neighbour in NEIGHBOURS order). Each tile at
+    # distance d > 0 has a neighbour with the same label at distance d - 1.
+    # (The wavefront is kept as flat indices in grids with a border of -2,
+    # never grown into, so each step costs its length.)
+    width, height = labels.shape
+    padded = np.pad(labels, 1, mode='constant', constant_values=-2).ravel()
+    distances = np.where(padded >= 0, 0, UNREACHABLE).astype(np.int32)
+    wavefront = np.flatnonzero(np.pad(frontier(labels >= 0), 1, mode='constant'))
+    d = 0
+    while len(wavefront) > 0:
+        d += 1
+        sources = padded[wavefront]
+        grown = []
+        for dx, dy in NEIGHBOURS:
+            # Tiles (x - dx, y - dy) reached from wavefront tiles (x, y).
+            reached = wavefront - (dx * (height + 2) + dy)
+            new = padded[reached] == -1
+            reached = reached[new]
+            padded[reached] = sources[new]
+            distances[reached] = d
+            grown.append(reached)
+        wavefront = np.concatenate(grown)
+    return (padded.reshape(width + 2, height + 2)[1:-1, 1:-1],
+            distances.reshape(width + 2, height + 2)[1:-1, 1:-1])
+
+
+def neighbour_counts(mask, border=False):
+    # Return a uint8 grid with the number of True tiles among the 8 neighbours
+    # of each tile, counting off-board neighbours as 'border'.
+    padded = np.pad(mask, 1, mode='constant', constant_values=border).astype(np.uint8)
+    width, height = mask.shape
+    counts = np.zeros((width, height), dtype=np.uint8)
+    for dx in (0, 1, 2):
+        for dy in (0, 1, 2):
+            if (dx, dy) != (1, 1):
+                counts += padded[dx:dx + width, dy:dy + height]
+    return counts
+
+
+def neighbour_masks(mask):
+    # Return a uint8 grid with the neighbour mask of each tile: bit k set if
+    # its k-th neighbour is True in 'mask' (off-board neighbours never are).
+    width, height = mask.shape
+    padded = np.pad(mask, 1, mode='constant', constant_values=False).astype(np.uint8)
+    masks = np.zeros((width, height), dtype=np.uint8)
+    for k, (dx, dy) in enumerate(NEIGHBOURS):
+        masks |= padded[1 + dx:1 + dx + width, 1 + dy:1 + dy + height] << k
+    return masks
+
+
+def frontier(mask):
+    # Return the boolean grid of True tiles with some False neighbour (e.g.
+    # free tiles next to occupied ones; off-board neighbours don't count).
+    return mask & (neighbour_masks(~mask) != 0)
+
+
+def density(mask, radius):
+    # Return a float32 grid with the ratio of True tiles within 'radius'
+    # (Chebyshev distance) of each tile, among those on the board, e.g.
+    # crowding. Window sums come from a summed-area table: O(1) per tile.
+    width, height = mask.shape
+    table = np.zeros((width + 1, height + 1), dtype=np.int32)
+    table[1:, 1:] = np.cumsum(np.cumsum(mask, axis=0, dtype=np.int32), axis=1)
+    x0 = np.maximum(np.arange(width) - radius, 0)[:, None]
+    x1 = np.minimum(np.arange(width) + radius + 1, width)[:, None]
+    y0 = np.maximum(np.arange(height) - radius, 0)[None, :]
+    y1 = np.minimum(np.arange(height) + radius + 1, height)[None, :]
+    counts = table[x1, y1] - table[x0, y1] - table[x1, y0] + table[x0, y0]
+    return (counts / ((x1 - x0) * (y1 - y0))).astype(np.float32)
+
+
+def pack(bitmap):
+    # Return a bitmap of 0 / 1 values (any integer or bool grid) with 8 tiles
+    # per byte along y: (width, ceil(height / 8)) uint8.
+    return np.packbits(bitmap.astype(bool), axis=1)
+
+
+def unpack(packed, height):
+    # Return the (width, height) uint8 bitmap of 0 / 1 values packed by pack().
+    return np.unpackbits(packed, axis=1)[:, :height]
+
+
+def label_components(mask):
+    # Return an int32 grid labelling the 8-connected components of True tiles
+    # (-1 on False tiles, labels numbered from 0 with no particular order).
+    # Vectorized union-find: vertical runs of True tiles are the nodes;
+    # roots are hooked through edges between runs, then pointers are jumped.
+    width, height = mask.shape
+
+    # Nodes: runs of contiguous True tiles along y.
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    runs = (np.cumsum(starts.ravel(), dtype=np.int32) - 1).reshape(mask.shape)
+    n_runs = int(starts.sum())
+
+    # Edges: pairs of runs touching across neighbouring columns (each pair once).
+    edges_u, edges_v = [], []
+    for dy in (-1, 0, 1):
+        y0, y1 = max(0, -dy), height - max(0, dy)
+        both = mask[:-1, y0:y1] & mask[1:, y0 + dy:y1 + dy]
+        u = runs[:-1, y0:y1][both]
+        v = runs[1:, y0 + dy:y1 + dy][both]
+        new = np.ones(len(u), dtype=bool)
+        new[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        edges_u.append(u[new])
+        edges_v.append(v[new])
+    u = np.concatenate(edges_u)
+    v = np.concatenate(edges_v)
+
+    parent = np.arange(n_runs, dtype=np.int32)
+    while len(u) > 0:
+        # Hook the larger root of every edge still crossing two trees.
+        pu, pv = parent[u], parent[v]
+        crossing = pu != pv
+        u, v, pu, pv = u[crossing], v[crossing], pu[crossing], pv[crossing]
+        if len(u) == 0:
+            break
+        parent[np.maximum(pu, pv)] = np.minimum(pu, pv)
+        # Flatten trees, so that every run points to its root.
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    labels = parent[runs]
+    labels[~mask] = -1
+    return labels
+
+
+def diffuse(values, passable, rate):
+    # Even out float 'values' in place between 4-adjacent 'passable' tiles:
+    # 'rate' of the difference flows across each edge per step (the total is
+    # kept; stable for rates up to 0.25).
+    flow = np.zeros_like(values)
+    both = passable[1:, :] & passable[:-1, :]
+    across = np.where(both, values[1:, :] - values[:-1, :], 0) * rate
+    flow[:-1, :] += across
+    flow[1:, :] -= across
+    both = passable[:, 1:] & passable[:, :-1]
+    across = np.where(both, values[:, 1:] - values[:, :-1], 0) * rate
+    flow[:, :-1] += across
+    flow[:, 1:] -= across
+    values += flow
+
+
+class NeighbourMasks:
+    # Neighbour masks of all tiles of a grid, kept up to date in O(1) as
+    # tiles get flagged or unflagged (e.g. occupied or freed). They're kept
+    # on an array padded by one tile all around (so that no bounds need
+    # checking), written through a flat memoryview (much cheaper than
+    # NumPy's per-item access).
+    def __init__(self, width, height, padded=None):
+        if padded is None:
+            padded = np.zeros((width + 2, height + 2), dtype=np.uint8)
+        self.padded = padded
+        self.masks = padded[1:-1, 1:-1]  # Masks of the tiles, as a (width, height) view.
+        self.flat = memoryview(padded).cast("B")
+        self.stride = height + 2
+        # (Offset, bit) to the 8 tiles around one on the flat array, which
+        # see it as their neighbour in the opposite direction.
+        self.around = tuple((dx * self.stride + dy, 1 << NEIGHBOURS.index((-dx, -dy))) for dx, dy in NEIGHBOURS)
+        self.left_bit = 1 << NEIGHBOURS.index((-1, 0))
+
+    # (Tile (x, y) is at (x + 1) * stride + y + 1 on the flat array.)
+
+    def at(self, position):
+        # Return the mask of a tile.
+        return self.flat[(position[0] + 1) * self.stride + position[1] + 1]
+
+    def is_flagged(self, position):
+        # Return whether a tile is flagged (as seen by the tile on its right).
+        return self.flat[(position[0] + 2) * self.stride + position[1] + 1] & self.left_bit != 0
+
+    def flag(self, position, flag):
+        # Flag (or unflag) a tile on the masks of the tiles around it.
+        i = (position[0] + 1) * self.stride + position[1] + 1
+        flat = self.flat
+        if flag:
+            for offset, bit in self.around:
+                flat[i + offset] |= bit
+        else:
+            for offset, bit in self.around:
+                flat[i + offset] &= 0xFF ^ bit
+
+    def reset(self, mask):
+        # Recompute all masks from a boolean grid of flagged tiles.
+        self.padded[:] = neighbour_masks(np.pad(mask, 1, mode='constant', constant_values=False))
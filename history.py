@@ -0,0 +1,209 @@
+###############################################################################
+# HISTORY
+# Bounded history of the latest steps of "Lil' ASCII Lab"'s worlds, to go
+# back (and forth) in time on the UI...
+#
+# Steps are kept as the RECORD rows of agents (see stream.py): a full
+# keyframe every 'keyframe_every' steps (or on spawns and despawns), and
+# for the steps in between only the rows that changed, out of those of the
+# agents the world went over on that step. Passive agents' lazy drains are
+# kept as they are (re)started, not as rows on every step. Any step kept is
+# rebuilt on a mirror world from its keyframe plus the deltas after it,
+# never re-running the AI.
+# Over the memory budget, older steps are thinned: first the deltas of the
+# oldest segments (their keyframes are kept), then whole oldest segments.
+###############################################################################
+
+# Libraries.
+import itertools
+import random
+from collections import deque, namedtuple
+import numpy as np
+
+# Modules.
+import shared
+import stream
+import style
+
+###############################################################################
+# CONSTANTS
+
+HISTORY_DEF = dict(
+    keyframe_every=20,  # Steps between full keyframes.
+    length=1000,  # Maximum number of latest steps kept.
+    budget=4 * 2**20,  # Maximum bytes of records kept.
+)
+
+ENTRY_OVERHEAD = 200  # Approximate bytes per step kept, besides its records.
+
+# Lazy drain of a passive agent, as (re)started on a step (see World.schedule()).
+LAZY = np.dtype([
+    ('slot', '<u4'),
+    ('energy', '<f8'),  # energy_at_step.
+    ('drain', '<f8'),
+    ('step', '<i8'),  # last_update_step.
+    ('max_energy', '<f8'),
+])
+
+# One step kept: agents' records (all of them on keyframes, changed ones
+# otherwise) and lazy drains (all of them on keyframes, (re)started ones otherwise).
+Entry = namedtuple("Entry", ['step', 'time_run', 'records', 'lazy'])
+
+###############################################################################
+# Auxiliary functions
+
+
+def lazy_records(agents):
+    # Return the LAZY array with the lazy drains of the given passive agents.
+    lazy = np.zeros(len(agents), dtype=LAZY)
+    lazy['slot'] = [agent.slot for agent in agents]
+    lazy['energy'] = [agent.energy_at_step for agent in agents]
+    lazy['drain'] = [agent.drain for agent in agents]
+    lazy['step'] = [agent.last_update_step for agent in agents]
+    lazy['max_energy'] = [agent.max_energy for agent in agents]
+    return lazy
+
+
+###############################################################################
+
+
+class History:
+    # Segments of steps, oldest first: each one a list with a keyframe Entry
+    # followed by the delta Entries of the next steps.
+    def __init__(self, world, history_def=HISTORY_DEF):
+        self.world = world
+        self.keyframe_every = history_def["keyframe_every"]
+        self.length = history_def["length"]
+        self.budget = history_def["budget"]
+        self.segments = deque()
+        self.size = 0  # Bytes kept.
+        self.previous = None  # Latest records (of all slots).
+        self.population_changes = None  # World's population_changes as of latest keyframe.
+        self.pending = []  # Agents whose step variables are reset on next step (see World.pre_step()).
+        self.mirror = None  # World on which past steps are rebuilt (created on first use).
+
+    def record(self):
+        # Keep the world's current step.
+        world = self.world
+        since = self.segments[-1][-1].step if self.segments else None
+        if (self.previous is None or world.population_changes != self.population_changes
+                or world.steps % self.keyframe_every == 0):
+            world.materialize_passive()
+            current = stream.agent_records(world.pool.agents, since)
+            entry = Entry(world.steps, world.time_run, current,
+                          lazy_records([agent for agent in world.passive if agent.drain != 0]))
+            self.segments.append([entry])
+            self.previous = current.copy()  # (Updated in place by next deltas.)
+            self.population_changes = world.population_changes
+        else:
+            # Only agents gone over on this step may have changed: active
+            # ones, passive ones acted upon or (re)scheduled, those that died
+            # or respawned, and those whose step variables were just reset.
+            agents = list(dict.fromkeys(itertools.chain(
+                world.active, world.touched, world.rescheduled, world.just_died, world.just_respawned,
+                self.pending)))
+            for agent in agents:
+                if agent.action is None and agent not in world.dead:
+                    world.materialize(agent)
+            current = stream.agent_records(agents, since)
+            changed = stream.changes(self.previous[current['slot']], current)
+            self.previous[current['slot']] = current
+            entry = Entry(world.steps, world.time_run, current[changed], lazy_records(world.rescheduled))
+            self.segments[-1].append(entry)
+        self.pending = list(itertools.chain(world.touched, world.just_died))
+        self.size += entry.records.nbytes + entry.lazy.nbytes + ENTRY_OVERHEAD
+        self.thin()
+
+    def thin(self):
+        # Drop steps older than 'length', then thin the oldest ones till
+        # within budget (the latest segment is always kept whole).
+        while len(self.segments) > 1 and self.segments[0][-1].step <= self.world.steps - self.length:
+            self.drop(self.segments.popleft())
+        for segment in self.segments:
+            if self.size <= self.budget or segment is self.segments[-1]:
+                break
+            if len(segment) > 1:
+                self.drop(segment[1:])
+                del segment[1:]
+        while self.size > self.budget and len(self.segments) > 1:
+            self.drop(self.segments.popleft())
+
+    def drop(self, entries):
+        for entry in entries:
+            self.size -= entry.records.nbytes + entry.lazy.nbytes + ENTRY_OVERHEAD
+
+    def steps(self):
+        # Return the list of steps that can be visited (oldest first).
+        return [entry.step for segment in self.segments for entry in segment]
+
+    def frame(self, step):
+        # Return the shared.Frame of a step kept (None if not kept).
+        for segment in self.segments:
+            if segment[0].step <= step <= segment[-1].step:
+                records = segment[0].records.copy()
+                time_run = segment[0].time_run
+                lazy = [segment[0].lazy]
+                for entry in segment[1:]:
+                    if entry.step > step:
+                        break
+                    records[entry.records['slot']] = entry.records
+                    time_run = entry.time_run
+                    lazy.append(entry.lazy)
+                # Passive agents' energy as of the step, from their latest lazy drains.
+                lazy = np.concatenate(lazy)[::-1]
+                lazy = lazy[np.unique(lazy['slot'], return_index=True)[1]]
+                energy = np.clip(lazy['energy'] + lazy['drain'] * (step - lazy['step']), 0, lazy['max_energy'])
+                records['energy'][lazy['slot']] = energy
+                drained = lazy['slot'][energy <= 0]
+                records['color'][drained], records['intensity'][drained] = style.DEAD_AGENT_COLOR
+                world = self.world
+                return stream.records_frame(step, step, time_run, world.random_seed, world.fps,
+                                            False, records)
+        return None
+
+    def view(self, step):
+        # Return the mirror world showing a step kept.
+        frame = self.frame(step)
+        if self.mirror is None:
+            # A mirror is created from the world's seed: keep the global
+            # random state of the world being run untouched.
+            state = random.getstate()
+            self.mirror = shared.mirror_world(frame, self.world.simulation_def)
+            random.setstate(state)
+            self.mirror.trajectories = None  # No paths across jumps in time.
+        else:
+            shared.apply_frame(self.mirror, frame)
+        self.mirror.paused = True
+        self.mirror.step_by_step = False
+        return self.mirror
+
+
+###############################################################################
+# Code for TESTING purposes only:
+if __name__ == '__main__':
+    import world as w
+
+    # Run a world keeping its history, then check that past steps rebuilt
+    # match the world as it was (and that the budget holds).
+    simulation_def = dict(w.Simulation_def)
+    simulation_def["world"] = dict(w.WORLD_DEF, random_seed=1)
+    world = w.World(simulation_def)
+    history = History(world, dict(HISTORY_DEF, budget=64 * 2**10))
+    states = {}
+    for _ in range(300):
+        world.step()
+        history.record()
+        world.materialize_passive()  # (Only to compare passive agents' energies.)
+        states[world.steps] = stream.agent_records(world.pool.agents)
+    steps = history.steps()
+    same = True
+    for step in steps:
+        records = states[step]
+        agents = sorted(history.view(step).agents, key=lambda a: a.slot)
+        same &= [agent.slot for agent in agents] == list(records['slot'])
+        for record, agent in zip(records, agents):
+            same &= (tuple(agent.position) == (record['x'], record['y']) and abs(record['energy'] - agent.energy) < 1e-3
+                     and (agent.color, agent.intensity, agent.action_code) ==
+                     (record['color'], record['intensity'], record['action']))
+    print("Steps kept: {} ({}..{}), {:,} bytes | Past steps match: {}".format(
+        len(steps), steps[0], steps[-1], history.size, same))
@@ -6,54 +6,134 @@
 
 # Libraries.
 from curses import wrapper
+import argparse
 import time
 
 # Modules.
 import world as w
+import clock
+import history
+import report
+import shared
+import stream
 import ui
 
 
-def main_loop(stdscr, world):
+def main_loop(stdscr, world, stats, publishers=()):
     '''
     :param stdscr: standard screen created by curses' wrapper.
     :param world: the world on which the simulation will run.
+    :param stats: a report.Stats timing steps and draws (for the final report).
+    :param publishers: for out-of-process viewers (shared.Publisher, stream.Broadcaster).
     :return: (nothing).
     '''
 
-    # Initialize UI.
-    u_i = ui.UI(stdscr, world)
+    # Initialize UI, the scheduler pacing the steps and the history of
+    # latest steps (to rewind through).
+    scheduler = clock.Scheduler(world)
+    steps_kept = history.History(world)
+    steps_kept.record()
+    u_i = ui.UI(stdscr, world, scheduler, steps_kept)
 
-    # Main world loop.
+    # Main world loop: the UI keeps drawing and reading input even while the
+    # simulation is halted (paused or step-by-step).
     end_loop = False
     while not end_loop:
+        if u_i.fast_forwarding():
+            # Fast-forward: run steps off-clock and with no drawing, showing
+            # progress (and checking for a stop) every 'fast_forward_spf' seconds.
+            deadline = time.monotonic() + u_i.fast_forward_spf
+            while u_i.fast_forwarding() and time.monotonic() < deadline:
+                stats.time_step(world)
+                steps_kept.record()
+            for publisher in publishers:
+                publisher.publish()
+            if u_i.fast_forwarding():
+                u_i.draw_progress()
+                end_loop = u_i.handle_keys(u_i.wait_for_keys(0))
+            continue
+
         # Display the world as it is now.
-        user_break = u_i.draw()
+        stats.time_render(u_i.draw)
+
+        # Wait for user's input till next step is due (or next redraw, if halted).
+        if world.is_running():
+            timeout = scheduler.time_to_next_step()
+        else:
+            scheduler.hold()
+            stats.hold()
+            timeout = u_i.idle_spf
+        user_break = u_i.handle_keys(u_i.wait_for_keys(timeout))
 
         # Check conditions to go on.
         end_loop = user_break or world.is_end_loop()
-        if not end_loop:
-            # Evolve world by one time-fixed step.
-            t_start = time.time()
-            world.step()
-            if world.spf is not None:
-                # No full-speed mode; keep time-step duration.
-                t_end = time.time()
-                time.sleep(max(0, world.spf - (t_end - t_start)))
-
-    # Exit program.
-    # TODO: Produce final results.
+        if not end_loop and world.is_running():
+            # Evolve world by as many steps as due (none if early, several if catching up).
+            for _ in range(scheduler.steps_due()):
+                stats.time_step(world, scheduler.step_dt)
+                steps_kept.record()
+                for publisher in publishers:
+                    publisher.publish()
+                if world.is_end_loop() or not world.is_running():
+                    break
+
+
+def headless_loop(world, stats, publishers):
+    '''
+    :param world: the world on which the simulation will run (with no UI).
+    :param stats: a report.Stats timing steps (for the final report).
+    :param publishers: for viewers to attach to (see viewer.py).
+    :return: (nothing).
+    '''
+
+    # Run at world's speed till the end (or Ctrl-C, or the world halting on a steady state).
+    scheduler = clock.Scheduler(world)
+    world.paused = world.step_by_step = False
+    try:
+        while not world.is_end_loop() and not world.paused:
+            time.sleep(scheduler.time_to_next_step())
+            for _ in range(scheduler.steps_due()):
+                stats.time_step(world, scheduler.step_dt)
+                for publisher in publishers:
+                    publisher.publish()
+                if world.is_end_loop() or world.paused:
+                    break
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == '__main__':
     # Main program.
+    parser = argparse.ArgumentParser(description="Lil' ASCII Lab")
+    parser.add_argument("--headless", action="store_true",
+                        help="run with no UI, sharing (or streaming) the world's state (see viewer.py)")
+    parser.add_argument("--share", nargs="?", const=shared.SHARED_NAME, metavar="NAME",
+                        help="share the world's state on named shared memory (default: %(const)s)")
+    parser.add_argument("--stream", metavar="ADDRESS",
+                        help="stream the world's steps on a socket (a path, or host:port for TCP)")
+    parser.add_argument("--report", default=report.REPORT_PATH, metavar="PATH",
+                        help="file the final report is saved to, as JSON (default: %(default)s)")
+    args = parser.parse_args()
     time_0 = time.ctime()  # Start time.
 
-    # Create the world and start "wrapped" environment.
+    # Create the world and start "wrapped" environment (or a headless one).
     world = w.World(w.Simulation_def)
-    wrapper(main_loop, world)
-
-    # Quit program.
-    print("Lil' ASCII Lab v0.1")
-    print("{:<20}{}".format("- Started:", time_0))
-    print("{:<20}{}".format("- Ended:", time.ctime()))
-    print("{:<20}{:,}".format("- Steps run:", world.steps))
-    print("{:<20}{}".format("- Random seed used:", world.random_seed))
+    stats = report.Stats()
+    publishers = []
+    if args.share or (args.headless and not args.stream):
+        publishers.append(shared.Publisher(world, args.share or shared.SHARED_NAME))
+    if args.stream:
+        publishers.append(stream.Broadcaster(world, args.stream))
+    try:
+        if args.headless:
+            headless_loop(world, stats, publishers)
+        else:
+            wrapper(main_loop, world, stats, publishers)
+    finally:
+        for publisher in publishers:
+            publisher.close()
+
+    # Quit program, with the final report.
+    final_report = report.build(world, stats, time_0, time.ctime())
+    report.show(final_report)
+    report.save(final_report, args.report)
+    print("{:<20}{}".format("- Report saved to:", args.report))
@@ -0,0 +1,124 @@
+###############################################################
+# Lil' ASCII Lab
+# Memory report: bytes taken per tile, block and agent by a world created
+# from a Simulation_def (e.g. to size worlds with millions of things).
+#
+# E.g.:  python memory.py --width 1000 --height 1000 --agents 10
+#
+# Objects are measured with sys.getsizeof(), adding up the values of their
+# attributes unless shared (e.g. settings, functions, constants), and the
+# rows they take on the world's grids and per-agent arrays.
+
+###############################################################
+
+# Libraries.
+import argparse
+import sys
+
+# Modules.
+import act
+import style
+import world as w
+
+###############################################################
+# Measures
+
+
+def attribute_values(thing):
+    # Return the values of a thing's attributes (its slots and __dict__, if any).
+    values = []
+    for cls in type(thing).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(thing, name):
+                values.append(getattr(thing, name))
+    if hasattr(thing, "__dict__"):
+        values.extend(vars(thing).values())
+    return values
+
+
+def shared_ids(simulation_def):
+    # Return the ids of values not owned by any single thing: those in the
+    # definitions and the modules' constants.
+    ids = {id(None), id(True), id(False)}
+    pending = list(simulation_def.values()) + list(vars(act).values()) + list(vars(style).values())
+    while pending:
+        value = pending.pop()
+        if id(value) not in ids:
+            ids.add(id(value))
+            if isinstance(value, (tuple, list)):
+                pending.extend(value)
+            elif isinstance(value, dict):
+                pending.extend(value.values())
+    return ids
+
+
+def object_bytes(objects, shared):
+    # Return the total bytes of the objects given, with the values of their
+    # attributes not in 'shared' nor referenced by more than one object.
+    owners = {}
+    for obj in objects:
+        for value in {id(v): v for v in attribute_values(obj)}.values():
+            owners.setdefault(id(value), []).append(value)
+    total = sum(sys.getsizeof(obj) for obj in objects)
+    for key, values in owners.items():
+        if len(values) == 1 and key not in shared and not callable(values[0]):
+            total += sys.getsizeof(values[0])
+    return total
+
+
+def report(simulation_def):
+    # Return a world created from 'simulation_def' and the bytes it takes
+    # per tile, block and agent, as {name: {part: bytes}}.
+    world = w.World(simulation_def)
+    shared = shared_ids(simulation_def)
+    n_tiles = world.width * world.height
+    n_blocks = max(int(world.blocks_bitmap.sum()), 1)
+    n_agents = max(len(world.agents), 1)
+
+    grids = (world.things, world.ground, world.energy_map, world.occupation_bitmap, world.blocks_bitmap,
+             world.free_masks.padded, world.energy_masks.padded)  # (Masks padded by one tile all around.)
+    if world.food_map is not None:
+        grids += (world.food_map,)
+    per_tile = dict(
+        grids=sum(g.nbytes for g in grids) / n_tiles,
+        ground=object_bytes(world.ground.ravel().tolist(), shared) / n_tiles,
+    )
+    per_block = dict(
+        objects=object_bytes(world.blocks, shared) / n_blocks,
+    )
+    per_agent = dict(
+        objects=object_bytes(world.agents, shared) / n_agents,
+        touch_maps=world.pool.touch_maps.nbytes / max(len(world.pool.touch_maps), 1),
+        trajectory=0 if world.trajectories is None else world.trajectories.buffer[0].nbytes + 8,
+        lists=8 * 3,  # Entries in world.agents, pool.agents and pool.in_use.
+    )
+    return world, dict(tile=per_tile, block=per_block, agent=per_agent)
+
+
+if __name__ == '__main__':
+    # Main program.
+    parser = argparse.ArgumentParser(description="Lil' ASCII Lab memory report")
+    parser.add_argument("--width", type=int, default=w.WORLD_DEF["width"], help="world's width")
+    parser.add_argument("--height", type=int, default=w.WORLD_DEF["height"], help="world's height")
+    parser.add_argument("--agents", type=int, default=1, metavar="FACTOR",
+                        help="multiply the number of instances of each agent")
+    args = parser.parse_args()
+
+    simulation_def = dict(w.Simulation_def)
+    simulation_def["world"] = dict(w.WORLD_DEF, width=args.width, height=args.height, random_seed=1)
+    simulation_def["agents"] = tuple(a_def._replace(n_instances=a_def.n_instances * args.agents)
+                                     for a_def in simulation_def["agents"])
+    world, parts = report(simulation_def)
+
+    # Show results.
+    print("Lil' ASCII Lab v{}".format(w.VERSION))
+    print('"{}": {} x {} tiles, {:,} block tiles, {:,} agents.'.format(
+        world.name, world.width, world.height, int(world.blocks_bitmap.sum()), len(world.agents)))
+    counts = dict(tile=world.width * world.height, block=int(world.blocks_bitmap.sum()), agent=len(world.agents))
+    total = 0
+    for name, sizes in parts.items():
+        print("{:<20}{:>10,.1f} bytes".format("- Per {}:".format(name), sum(sizes.values())))
+        for part, size in sizes.items():
+            print("    {:<16}{:>10,.1f}".format(part, size))
+        total += sum(sizes.values()) * counts[name]
+    print("{:<20}{:>10,.0f} bytes".format("- Total:", total))
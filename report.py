@@ -0,0 +1,202 @@
+###############################################################
+# Lil' ASCII Lab
+# Final report of a run: outcome (survivors, deaths, respawns and energy
+# per kind of agent) and performance (step and render times, achieved vs.
+# requested fps, memory), printed and saved as JSON as a baseline to
+# compare runs against.
+#
+# Steps and draws are timed by a Stats object along the run (see lal.py),
+# which also counts the time the world was actually running (i.e. not
+# halted: paused, rewinding...), that achieved fps are based on.
+# Peak RSS comes from the 'resource' module, where available (not on
+# Windows), and allocations are Python's allocated memory blocks, sampled
+# every MEMORY_SAMPLE_EVERY steps (and at the end).
+
+###############################################################
+
+# Libraries.
+import gc
+import json
+import sys
+import time
+from array import array
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Modules.
+import world as w
+
+REPORT_PATH = "lal_report.json"  # Default file the report is saved to.
+MEMORY_SAMPLE_EVERY = 100  # Steps between samples of allocated memory blocks.
+
+###############################################################
+# Measures
+
+
+class Stats:
+    # Timings and memory samples taken along a run.
+    def __init__(self):
+        self.step_times = array("d")  # Seconds per step.
+        self.render_times = array("d")  # Seconds per draw.
+        self.max_sampled_blocks = sys.getallocatedblocks()
+        self.wall_0 = time.monotonic()
+        self.running_seconds = 0  # Wall time the world was running (see hold()).
+        self.latest_step_end = None  # Time latest step ended at (None: halted since).
+
+    def time_step(self, world, dt=None):
+        # Run (and time) one step of the world, counting as running time all
+        # of it since latest step (or only the step itself, after a halt).
+        t0 = time.perf_counter()
+        world.step(dt)
+        t1 = time.perf_counter()
+        self.step_times.append(t1 - t0)
+        self.running_seconds += t1 - (t0 if self.latest_step_end is None else self.latest_step_end)
+        self.latest_step_end = t1
+        if len(self.step_times) % MEMORY_SAMPLE_EVERY == 0:
+            self.sample_memory()
+
+    def hold(self):
+        # The world is halted (e.g. paused): stop counting running time.
+        self.latest_step_end = None
+
+    def time_render(self, draw):
+        # Call (and time) a drawing function.
+        t0 = time.perf_counter()
+        draw()
+        self.render_times.append(time.perf_counter() - t0)
+
+    def sample_memory(self):
+        self.max_sampled_blocks = max(self.max_sampled_blocks, sys.getallocatedblocks())
+
+
+def peak_rss():
+    # Return the peak resident memory of this process in bytes (None if unknown).
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024  # (kilobytes on Linux).
+
+
+def timings(seconds):
+    # Return mean, p95 and max of a series of durations, in milliseconds.
+    if len(seconds) == 0:
+        return dict(count=0, mean_ms=None, p95_ms=None, max_ms=None)
+    ms = np.frombuffer(seconds, dtype=float) * 1000
+    return dict(count=len(ms), mean_ms=round(float(ms.mean()), 3),
+                p95_ms=round(float(np.percentile(ms, 95)), 3), max_ms=round(float(ms.max()), 3))
+
+
+def distribution(values):
+    # Return min, quartiles, max and mean of some values (e.g. energies).
+    if not values:
+        return None
+    q = np.percentile(values, [0, 25, 50, 75, 100])
+    return dict(min=round(float(q[0]), 2), q1=round(float(q[1]), 2), median=round(float(q[2]), 2),
+                q3=round(float(q[3]), 2), max=round(float(q[4]), 2),
+                mean=round(float(np.mean(values)), 2))
+
+###############################################################
+# Report
+
+
+def build(world, stats, time_0, time_1):
+    # Return the report of a world's run (as a JSON-serializable dict),
+    # started at 'time_0' and ended at 'time_1' (as per time.ctime()).
+    world.materialize_passive()
+    kinds = {}
+    for agent in world.agents:
+        kind = kinds.setdefault(agent.kind(), dict(agents=0, alive=0, deaths=0, respawns=0, energies=[]))
+        kind["agents"] += 1
+        if agent.energy > 0:
+            kind["alive"] += 1
+            kind["energies"].append(agent.energy)
+    for name, kind in kinds.items():
+        kind["deaths"] = world.deaths.get(name, 0)
+        kind["respawns"] = world.respawns.get(name, 0)
+        kind["energy"] = distribution(kind.pop("energies"))
+
+    wall_seconds = time.monotonic() - stats.wall_0
+    stats.sample_memory()
+    return dict(
+        run=dict(
+            version=w.VERSION,
+            world=world.name,
+            random_seed=world.random_seed,
+            started=time_0,
+            ended=time_1,
+            steps=world.steps,
+            time_run=round(world.time_run, 3),
+            wall_seconds=round(wall_seconds, 3),
+            running_seconds=round(stats.running_seconds, 3),  # Wall time not halted (paused, rewinding...).
+            steady=world.steady,  # Why the world was steady at the end (if it was).
+        ),
+        outcome=dict(
+            agents=kinds,
+            total_energy=round(float(world.total_energy), 2),
+        ),
+        performance=dict(
+            steps=timings(stats.step_times),
+            renders=timings(stats.render_times),
+            requested_fps=world.original_fps,
+            achieved_fps=(round(len(stats.step_times) / stats.running_seconds, 2)
+                          if stats.running_seconds > 0 else None),  # Steps per second while running.
+            wall_fps=round(len(stats.step_times) / wall_seconds, 2) if wall_seconds > 0 else None,
+            peak_rss_bytes=peak_rss(),
+            max_sampled_allocated_blocks=stats.max_sampled_blocks,
+            gc_collections=[generation["collections"] for generation in gc.get_stats()],
+        ),
+    )
+
+
+def show(report):
+    # Print a report on the terminal.
+    run, outcome, performance = report["run"], report["outcome"], report["performance"]
+    print("Lil' ASCII Lab v{}".format(run["version"]))
+    print("{:<20}{}".format("- Started:", run["started"]))
+    print("{:<20}{}".format("- Ended:", run["ended"]))
+    print("{:<20}{:,}".format("- Steps run:", run["steps"]))
+    print("{:<20}{}".format("- Random seed used:", run["random_seed"]))
+    print("{:<20}{:,.1f}".format("- Total energy:", outcome["total_energy"]))
+    for name, kind in outcome["agents"].items():
+        energy = kind["energy"]
+        print("    {:<16}alive {:>4}/{:<4} deaths {:<6,} respawns {:<6,} energy {}".format(
+            name, kind["alive"], kind["agents"], kind["deaths"], kind["respawns"],
+            "-" if energy is None else "{:.1f} (median {:.1f})".format(energy["mean"], energy["median"])))
+    for name in ("steps", "renders"):
+        times = performance[name]
+        if times["count"]:
+            print("{:<20}mean {:.2f} ms, p95 {:.2f} ms, max {:.2f} ms".format(
+                "- {}:".format(name.capitalize()), times["mean_ms"], times["p95_ms"], times["max_ms"]))
+    print("{:<20}{} (requested: {}; {} over the whole wall time)".format(
+        "- Achieved fps:", performance["achieved_fps"], performance["requested_fps"] or "full-speed",
+        performance["wall_fps"]))
+    if performance["peak_rss_bytes"] is not None:
+        print("{:<20}{:,.1f} MB".format("- Peak RSS:", performance["peak_rss_bytes"] / 2**20))
+    print("{:<20}{:,} (max. sampled every {} steps)".format(
+        "- Mem. blocks:", performance["max_sampled_allocated_blocks"], MEMORY_SAMPLE_EVERY))
+
+
+def save(report, path=REPORT_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+###############################################################
+# Code for TESTING purposes only:
+if __name__ == '__main__':
+    # Run a short headless world and show its report (checking it's valid JSON).
+    simulation_def = dict(w.Simulation_def)
+    simulation_def["world"] = dict(w.WORLD_DEF, random_seed=1)
+    world = w.World(simulation_def)
+    stats = Stats()
+    time_0 = time.ctime()
+    for _ in range(300):
+        stats.time_step(world)
+    report = build(world, stats, time_0, time.ctime())
+    show(report)
+    print("JSON: {:,} bytes".format(len(json.dumps(report))))
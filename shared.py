@@ -0,0 +1,354 @@
+###############################################################################
+# SHARED
+# World state on named shared memory for out-of-process viewers of
+# "Lil' ASCII Lab"...
+#
+# The simulation (Publisher) writes the authoritative grids and agents'
+# arrays after each step, guarded by a sequence number (seqlock): odd while
+# writing, even once the frame is complete. Viewers (Reader) copy a frame
+# and check the sequence number didn't change meanwhile, retrying otherwise.
+# The writer never waits for readers, so viewers can't stall the simulation,
+# and any number of them can attach to the same run.
+# Agents' arrays have a row per slot of the world's pool: if it outgrows
+# them (spawns), the writer moves to a new segment of the same name with
+# twice the rows, flagging the old one, and readers re-attach on next read.
+###############################################################################
+
+# Libraries.
+import numpy as np
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+# Modules.
+import act
+import grid
+import things
+import world as w
+
+###############################################################################
+# CONSTANTS
+
+SHARED_NAME = "lil_ascii_lab"  # Default name of the shared memory segment.
+READ_ATTEMPTS = 100  # Times a reader retries a frame being written.
+ALIGNMENT = 8  # Bytes each array is aligned to.
+
+OFF_BOARD = -1  # Shared coordinates of agents not placed (things.RANDOM_POSITION) or free slots.
+RELAID_OUT = -1  # Number of agents on a segment replaced by a larger one (to re-attach to).
+NO_FPS = -1  # Shared fps when running at full-speed (world.fps is None).
+
+# Names of the segments published by this process.
+_published = set()
+
+# Arrays in the segment: name -> (shape builder from (width, height, n_agents), dtype).
+# 'dims' comes first, so that readers can work out the rest of the layout.
+LAYOUT = dict(
+    dims=(lambda width, height, n: (3,), np.int64),  # Width, height, number of agents' rows (slots).
+    seq=(lambda width, height, n: (1,), np.uint64),  # Sequence number (odd while writing).
+    info=(lambda width, height, n: (5,), np.float64),  # Step, time run, seed, fps, ended.
+    energy_map=(lambda width, height, n: (width, height), np.float64),
+    occupation_bitmap=(lambda width, height, n: (width, -(-height // 8)), np.uint8),  # Bit-packed (see grid.pack()).
+    positions=(lambda width, height, n: (n, 2), np.int64),
+    energies=(lambda width, height, n: (n,), np.float64),
+    energy_deltas=(lambda width, height, n: (n,), np.float64),
+    colors=(lambda width, height, n: (n, 2), np.int64),  # Color, intensity.
+    actions=(lambda width, height, n: (n,), np.uint8),  # Action codes (see act.py).
+    success=(lambda width, height, n: (n,), np.bool_),
+)
+
+# A consistent copy of the world's state, as read from shared memory.
+Frame = namedtuple("Frame", [
+    'seq',  # Sequence number of the frame.
+    'step',  # World's steps run.
+    'time_run',  # World's simulated seconds.
+    'random_seed',  # Seed the world was created with.
+    'fps',  # World's speed (None for full-speed).
+    'ended',  # Whether the simulation is over.
+    'energy_map',  # (None if to be rebuilt from agents.)
+    'occupation_bitmap',  # (None if to be rebuilt from agents.)
+    'positions',
+    'energies',
+    'energy_deltas',
+    'colors',
+    'actions',
+    'success'
+])
+
+###############################################################################
+# Auxiliary functions
+
+
+def layout(width, height, n_agents):
+    # Return {name: (offset, shape, dtype)} of the arrays and the total size.
+    arrays, offset = {}, 0
+    for key, (shape, dtype) in LAYOUT.items():
+        shape = shape(width, height, n_agents)
+        arrays[key] = (offset, shape, dtype)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset += -(-size // ALIGNMENT) * ALIGNMENT
+    return arrays, max(offset, ALIGNMENT)
+
+
+def views(buffer, width, height, n_agents):
+    # Return the dict of arrays on a segment's buffer.
+    arrays, _ = layout(width, height, n_agents)
+    return {key: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            for key, (offset, shape, dtype) in arrays.items()}
+
+###############################################################################
+
+
+class Publisher:
+    # Writes a world's state on a named shared memory segment after each step.
+    def __init__(self, world, name=SHARED_NAME):
+        self.world = world
+        self.name = name
+        self.create(world.pool.capacity(), takeover=True)
+        self.publish()
+
+    def create(self, n_agents, takeover=False):
+        # Create the segment, with rows for 'n_agents' slots ('takeover': the
+        # name of an ended run, if any).
+        world, name = self.world, self.name
+        _, size = layout(world.width, world.height, n_agents)
+        try:
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Only take the name over from a run that ended: a live run's
+            # viewers would otherwise be switched to this one.
+            if not takeover:
+                raise
+            other = Reader(name)
+            frame = other.read()
+            other.close()
+            if frame is None or not frame.ended:
+                raise FileExistsError(
+                    'Shared memory "{}" is in use by another run: share this one under another name '
+                    '(or remove the segment, e.g. /dev/shm/{}, if that run was killed).'.format(name, name))
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _published.add(name)
+        self.arrays = views(self.segment.buf, world.width, world.height, n_agents)
+        self.arrays["dims"][:] = world.width, world.height, n_agents
+        self.arrays["seq"][0] = 0
+        self.arrays["positions"][:] = OFF_BOARD  # (Free slots.)
+
+    def relayout(self):
+        # Move to a new segment of the same name with room for the world's
+        # pool (doubling the rows, so that growing populations cause few
+        # moves), flagging the old one for readers to re-attach (see Reader.read()).
+        seq, n_agents = int(self.arrays["seq"][0]), len(self.arrays["energies"])
+        self.arrays["dims"][2] = RELAID_OUT
+        self.arrays.clear()
+        self.segment.close()
+        self.segment.unlink()
+        self.create(max(self.world.pool.capacity(), 2 * n_agents))
+        self.arrays["seq"][0] = seq  # (Next frames are new to readers.)
+
+    def publish(self, ended=False):
+        # Write the world's current state as a new frame (with all agents
+        # in the world's pool, moving to a larger segment if it grew).
+        world = self.world
+        agents = world.pool.agents
+        if len(agents) > len(self.arrays["energies"]):
+            self.relayout()
+        arrays = self.arrays
+        world.materialize_passive()
+        arrays["seq"][0] += 1  # Odd: frame being written.
+
+        arrays["info"][:] = (world.steps, world.time_run, world.random_seed,
+                             NO_FPS if world.fps is None else world.fps, ended)
+        arrays["energy_map"][:] = world.energy_map
+        arrays["occupation_bitmap"][:] = grid.pack(world.occupation_bitmap)
+        for agent in agents:
+            slot = agent.slot
+            if agent.position != things.RANDOM_POSITION:
+                arrays["positions"][slot] = agent.position
+            else:
+                arrays["positions"][slot] = OFF_BOARD
+            arrays["energies"][slot] = agent.energy
+            arrays["energy_deltas"][slot] = agent.current_energy_delta
+            arrays["colors"][slot] = agent.color, agent.intensity
+            arrays["actions"][slot] = agent.action_code
+            arrays["success"][slot] = agent.chosen_action_success
+
+        arrays["seq"][0] += 1  # Even: frame complete.
+
+    def close(self):
+        # Signal the end of the run and remove the segment (attached
+        # readers keep their mapping till they close it).
+        self.publish(ended=True)
+        self.arrays.clear()
+        self.segment.close()
+        self.segment.unlink()
+        _published.discard(self.name)
+
+
+class Reader:
+    # Reads consistent frames of a world published on shared memory.
+    def __init__(self, name=SHARED_NAME):
+        self.name = name
+        self.attach()
+        self.last_seq = None
+
+    def attach(self):
+        # Map the segment's arrays (as laid out by its dims).
+        self.segment = shared_memory.SharedMemory(name=self.name)
+        # Only the publisher removes the segment (readers in other processes
+        # would otherwise have it unlinked when they exit).
+        if self.name not in _published:
+            resource_tracker.unregister(self.segment._name, "shared_memory")
+        dims = np.ndarray((3,), dtype=np.int64, buffer=self.segment.buf)
+        self.width, self.height, self.n_agents = (int(d) for d in dims)
+        del dims
+        if self.width == 0:  # Just created by the writer (dims not written yet).
+            self.segment.close()
+            raise FileNotFoundError(self.name)
+        self.arrays = views(self.segment.buf, self.width, self.height, self.n_agents)
+
+    def read(self):
+        # Return a consistent copy of latest frame, or None if the writer
+        # kept on changing it for READ_ATTEMPTS attempts. Re-attaches to
+        # the writer's new segment if it moved (see Publisher.relayout()).
+        for _ in range(READ_ATTEMPTS):
+            if not self.arrays or self.arrays["dims"][2] == RELAID_OUT:
+                self.close()
+                try:
+                    self.attach()
+                except FileNotFoundError:
+                    time.sleep(0)  # (New segment not created yet.)
+                    continue
+            arrays = self.arrays
+            seq = int(arrays["seq"][0])
+            if seq % 2 == 0:
+                step, time_run, random_seed, fps, ended = arrays["info"].tolist()
+                copies = [arrays[key].copy() for key in Frame._fields[6:]]
+                if int(arrays["seq"][0]) == seq:
+                    self.last_seq = seq
+                    frame = Frame(seq, int(step), time_run, random_seed,
+                                  None if fps == NO_FPS else fps, bool(ended), *copies)
+                    return frame._replace(occupation_bitmap=grid.unpack(frame.occupation_bitmap, self.height))
+            time.sleep(0)  # Let the writer go on.
+        return None
+
+    def is_new(self):
+        # Check whether a frame was published since latest read.
+        return not self.arrays or int(self.arrays["seq"][0]) != self.last_seq
+
+    def close(self):
+        self.arrays.clear()
+        self.segment.close()
+
+###############################################################################
+# Mirror worlds: local copies of a published world, e.g. to draw it.
+
+
+def mirror_world(frame, simulation_def=w.Simulation_def):
+    # Return a world rebuilt from the seed in 'frame' (it must have been
+    # created from the same 'simulation_def'), with the frame applied.
+    seed = frame.random_seed
+    if float(seed).is_integer():
+        seed = int(seed)
+    simulation_def = dict(simulation_def)
+    simulation_def["world"] = dict(simulation_def["world"], random_seed=seed)
+    world = w.World(simulation_def)
+    apply_frame(world, frame)
+    return world
+
+
+def apply_frame(world, frame):
+    # Update a mirror world to the state in 'frame' (that of the agents the
+    # mirror has: those spawned later on by the world being run aren't
+    # rebuilt, as frames don't tell their definitions).
+    agents = sorted(world.agents, key=lambda a: a.slot)
+
+    # Remove agents from the board, then place them on their new positions.
+    for agent in agents:
+        if agent.position != things.RANDOM_POSITION:
+            world.things[agent.position[0], agent.position[1]] = None
+    positions = frame.positions.tolist()
+    for agent in agents:
+        position = positions[agent.slot]
+        if position[0] == OFF_BOARD:
+            agent.position = things.RANDOM_POSITION
+        else:
+            agent.position = position
+            world.things[position[0], position[1]] = agent
+
+    # Agents' state.
+    for agent in agents:
+        slot = agent.slot
+        agent.energy = float(frame.energies[slot])
+        agent.current_energy_delta = float(frame.energy_deltas[slot])
+        agent.color, agent.intensity = frame.colors[slot].tolist()
+        agent.set_action(int(frame.actions[slot]))
+        agent.chosen_action_success = bool(frame.success[slot])
+        agent.action_icon = act.ACTION_ICONS[agent.action_code]
+        if world.trajectories is not None and frame.step > world.steps:
+            world.trajectories.record(slot, frame.step, agent.position, agent.action_code,
+                                      agent.current_energy_delta, agent.chosen_action_success)
+
+    # World's state (grids are rebuilt from agents if the frame has none).
+    if frame.energy_map is not None:
+        world.energy_map[:] = frame.energy_map
+        world.occupation_bitmap[:] = frame.occupation_bitmap
+    else:
+        world.energy_map[:] = 0
+        world.occupation_bitmap[:] = np.where(world.blocks_bitmap, w.OCCUPIED_TILE, w.UNOCCUPIED_TILE)
+        for agent in agents:
+            if agent.position != things.RANDOM_POSITION:
+                world.energy_map[agent.position[0], agent.position[1]] = agent.energy
+                world.occupation_bitmap[agent.position[0], agent.position[1]] = w.OCCUPIED_TILE
+    world.update_masks()
+    world.energy_fields.clear()
+    world.occupancy_maps.clear()
+    world.steps = frame.step
+    world.time_run = frame.time_run
+    world.total_energy = world.energy_map.sum()
+    world.update_agent_sets()
+
+
+###############################################################################
+# Code for TESTING purposes only:
+if __name__ == '__main__':
+    # Publish a headless run and check that a mirror world matches it.
+    simulation_def = dict(w.Simulation_def)
+    simulation_def["world"] = dict(w.WORLD_DEF, random_seed=1)
+    world = w.World(simulation_def)
+    publisher = Publisher(world, "lil_ascii_lab_test")
+    reader = Reader("lil_ascii_lab_test")
+    mirror = mirror_world(reader.read())
+    for _ in range(100):
+        world.step()
+        publisher.publish()
+        apply_frame(mirror, reader.read())
+    same = all(a.position == b.position and a.energy == b.energy
+               for a, b in zip(sorted(world.agents, key=lambda a: a.slot),
+                               sorted(mirror.agents, key=lambda a: a.slot)))
+    print("Mirror matches world:", same, "| Step:", mirror.steps)
+    # Agents spawned beyond the segment's rows must be published too (on a
+    # larger segment the reader re-attaches to).
+    bug_def = [a_def for a_def in simulation_def["agents"] if a_def.thing_settings.name == "bug"][0]
+    for _ in range(3):
+        for _ in range(30):
+            world.spawn(bug_def)
+        world.step()
+        publisher.publish()
+        frame = reader.read()
+    published = all(tuple(frame.positions[a.slot]) == tuple(a.position) for a in world.agents)
+    print("Spawned agents published:", published, "| Rows: {} for {} agents".format(
+        len(frame.positions), len(world.agents)))
+    assert published, "Spawned agents should be published."
+    # A live run's segment must not be taken over (only an ended one's).
+    try:
+        Publisher(world, "lil_ascii_lab_test")
+        taken_over = True
+    except FileExistsError:
+        taken_over = False
+    reader.close()
+    publisher.close()
+    print("Live segment taken over:", taken_over)
+    assert not taken_over, "A second run took over a live run's shared memory."
+
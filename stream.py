@@ -0,0 +1,403 @@
+###############################################################################
+# STREAM
+# Binary delta stream of "Lil' ASCII Lab"'s world over a local socket...
+#
+# After each step the simulation (Broadcaster) sends to every client the
+# records of agents whose state changed: moves, energy changes, deaths and
+# respawns. Every 'keyframe_every' steps, and whenever a client joins, a
+# keyframe with all agents is sent, so that late clients can sync.
+#
+# Messages: a fixed HEADER followed by a payload of fixed-size RECORDs
+# (zlib-compressed if flagged). Keyframes start with KEYFRAME_INFO.
+# Sockets are non-blocking: data a client can't take yet is queued, and
+# clients falling more than 'max_queued' bytes behind are dropped, so that
+# broadcasting never blocks World.step().
+###############################################################################
+
+# Libraries.
+import numpy as np
+import os
+import socket
+import struct
+import zlib
+import selectors
+
+# Modules.
+import things
+import shared
+
+###############################################################################
+# CONSTANTS
+
+# Stream settings:
+STREAM_DEF = dict(
+    keyframe_every=50,  # Steps between periodic keyframes.
+    compress=True,  # Whether to zlib-compress payloads.
+    max_queued=1 << 20,  # Bytes queued for a slow client before dropping it.
+)
+
+# Message kinds.
+KEYFRAME = 1
+DELTA = 2
+
+# Header flags.
+COMPRESSED = 1
+ENDED = 2
+
+# Agent events (bit flags on records).
+MOVED = 1
+ENERGY_CHANGED = 2
+DIED = 4
+RESPAWNED = 8
+
+# Kind, flags, step, number of records, time run, payload length.
+HEADER = struct.Struct("<BBIIdI")
+# Random seed, fps (-1 for full-speed), width, height, number of agents.
+KEYFRAME_INFO = struct.Struct("<ddHHI")
+
+# One agent's state (21 bytes).
+RECORD = np.dtype([
+    ('slot', '<u4'),
+    ('x', '<i2'),  # -1 if not placed.
+    ('y', '<i2'),
+    ('energy', '<f4'),
+    ('energy_delta', '<f4'),
+    ('color', 'u1'),
+    ('intensity', 'u1'),
+    ('action', 'u1'),  # Action code: verb and direction (see act.py).
+    ('success', 'u1'),
+    ('events', 'u1'),  # Events since previous message (MOVED, DIED...).
+])
+
+RECV_SIZE = 65536  # Bytes read from the socket at once.
+
+###############################################################################
+# Auxiliary functions
+
+
+def parse_address(address):
+    # Return (family, address) for "host:port" (TCP) or a path (Unix socket).
+    host, _, port = address.rpartition(":")
+    if port.isdigit():
+        return socket.AF_INET, (host or "localhost", int(port))
+    return socket.AF_UNIX, address
+
+
+def agent_records(agents, since=None):
+    # Return the RECORD array with the current state of the given agents,
+    # flagging those that died or respawned after step 'since' (as recorded
+    # by the world; other events are filled in by changes()).
+    records = np.zeros(len(agents), dtype=RECORD)
+    records['slot'] = [agent.slot for agent in agents]
+    positions = [agent.position if agent.position != things.RANDOM_POSITION
+                 else (shared.OFF_BOARD, shared.OFF_BOARD) for agent in agents]
+    records['x'], records['y'] = np.array(positions, dtype=np.int64).reshape(-1, 2).T
+    records['energy'] = [agent.energy for agent in agents]
+    records['energy_delta'] = [agent.current_energy_delta for agent in agents]
+    records['color'] = [agent.color for agent in agents]
+    records['intensity'] = [agent.intensity for agent in agents]
+    records['action'] = [agent.action_code for agent in agents]
+    records['success'] = [agent.chosen_action_success for agent in agents]
+    if since is not None:
+        records['events'] = [DIED * (agent.death_step is not None and agent.death_step > since) +
+                             RESPAWNED * (agent.respawn_step is not None and agent.respawn_step > since)
+                             for agent in agents]
+    return records
+
+
+def events(previous, current):
+    # Return the MOVED and ENERGY_CHANGED flags of each agent between two
+    # RECORD arrays (deaths and respawns can't be told from them: agents
+    # may respawn on the step they die, see agent_records()).
+    moved = (previous['x'] != current['x']) | (previous['y'] != current['y'])
+    changed = previous['energy'] != current['energy']
+    return (MOVED * moved + ENERGY_CHANGED * changed).astype(np.uint8)
+
+
+def changes(previous, current):
+    # Add the events of 'current' (RECORD arrays of the same agents) and
+    # return the mask of records that changed since 'previous'.
+    current['events'] |= events(previous, current)
+    changed = current['events'] != 0
+    for field in ('energy_delta', 'action', 'success'):
+        changed |= current[field] != previous[field]
+    return changed
+
+
+def records_frame(seq, step, time_run, random_seed, fps, ended, records):
+    # Return a shared.Frame with the state of all agents in 'records' (one
+    # per slot), with grids to be rebuilt from them.
+    positions = np.stack([records['x'], records['y']], axis=1).astype(np.int64)
+    return shared.Frame(
+        seq, step, time_run, random_seed, fps, ended,
+        None, None,
+        positions,
+        records['energy'].astype(np.float64),
+        records['energy_delta'].astype(np.float64),
+        np.stack([records['color'], records['intensity']], axis=1).astype(np.int64),
+        records['action'].astype(np.int64),
+        records['success'].astype(bool))
+
+
+def encode(kind, step, time_run, records, info=b"", compress=False, ended=False):
+    # Return a message as bytes.
+    payload = info + records.tobytes()
+    flags = ENDED if ended else 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= COMPRESSED
+    return HEADER.pack(kind, flags, step, len(records), time_run, len(payload)) + payload
+
+
+def decode(buffer):
+    # Return (message, bytes used) for the first complete message in
+    # 'buffer', or (None, 0) if incomplete. A message is a dict with kind,
+    # step, time_run, ended, records and (keyframes) info.
+    if len(buffer) < HEADER.size:
+        return None, 0
+    kind, flags, step, n_records, time_run, length = HEADER.unpack_from(buffer)
+    end = HEADER.size + length
+    if len(buffer) < end:
+        return None, 0
+    payload = bytes(buffer[HEADER.size:end])
+    if flags & COMPRESSED:
+        payload = zlib.decompress(payload)
+    message = dict(kind=kind, step=step, time_run=time_run, ended=bool(flags & ENDED))
+    if kind == KEYFRAME:
+        message["info"] = KEYFRAME_INFO.unpack_from(payload)
+        payload = payload[KEYFRAME_INFO.size:]
+    message["records"] = np.frombuffer(payload, dtype=RECORD, count=n_records)
+    return message, end
+
+###############################################################################
+
+
+class Broadcaster:
+    # Streams a world's steps to any number of clients on a local socket.
+    def __init__(self, world, address, stream_def=STREAM_DEF):
+        self.world = world
+        self.keyframe_every = stream_def["keyframe_every"]
+        self.compress = stream_def["compress"]
+        self.max_queued = stream_def["max_queued"]
+
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)  # Left over by some previous run.
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.family = family
+
+        self.clients = {}  # Socket -> bytearray of data queued.
+        self.previous = None  # Records latest sent (None if no clients).
+        self.previous_step = None  # World's step when they were sent.
+        self.dropped_clients = 0
+
+    def keyframe(self, records, ended=False):
+        # Return a keyframe message with the given records (one per slot).
+        world = self.world
+        info = KEYFRAME_INFO.pack(world.random_seed, shared.NO_FPS if world.fps is None else world.fps,
+                                  world.width, world.height, len(records))
+        return encode(KEYFRAME, world.steps, world.time_run, records, info, self.compress, ended)
+
+    def publish(self, ended=False):
+        # Send the changes since previous step (or a keyframe) to all
+        # clients, welcoming new ones. Never blocks. All agents in the
+        # world's pool are sent (one record per slot, free ones off board),
+        # with a keyframe whenever new slots were taken (spawns).
+        new_clients = self.accept()
+        if not self.clients:
+            self.previous = self.previous_step = None
+            return
+
+        self.world.materialize_passive()
+        current = agent_records(self.world.pool.agents, self.previous_step)
+        self.previous_step = self.world.steps
+        if new_clients:
+            message = self.keyframe(current, ended)
+            for client in new_clients:
+                self.clients[client] += message
+        if self.previous is not None:
+            if self.world.steps % self.keyframe_every == 0 or len(current) != len(self.previous):
+                message = self.keyframe(current, ended)
+            else:
+                changed = changes(self.previous, current)
+                message = encode(DELTA, self.world.steps, self.world.time_run,
+                                 current[changed], compress=self.compress, ended=ended)
+            for client in self.clients:
+                if client not in new_clients:
+                    self.clients[client] += message
+        self.previous = current
+        self.flush()
+
+    def accept(self):
+        # Accept clients waiting to connect, returning them.
+        new_clients = []
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except (BlockingIOError, InterruptedError):
+                break
+            client.setblocking(False)
+            self.clients[client] = bytearray()
+            new_clients.append(client)
+        return new_clients
+
+    def flush(self):
+        # Send as much queued data as each client can take right now,
+        # dropping clients that fell too far behind (or left).
+        for client, queued in list(self.clients.items()):
+            try:
+                if queued:
+                    sent = client.send(queued)
+                    del queued[:sent]
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError:
+                self.drop(client)
+                continue
+            if len(queued) > self.max_queued:
+                self.drop(client)
+
+    def drop(self, client):
+        del self.clients[client]
+        client.close()
+        self.dropped_clients += 1
+
+    def close(self):
+        # Tell clients the run ended, then close all sockets.
+        self.publish(ended=True)
+        for client in list(self.clients):
+            client.close()
+        self.clients.clear()
+        self.server.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class Receiver:
+    # Rebuilds the frames of a streamed world (same interface as shared.Reader).
+    def __init__(self, address):
+        family, address = parse_address(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self.socket.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        self.buffer = bytearray()
+        self.records = None  # Latest state of all agents (after a keyframe).
+        self.frame = None  # Latest frame (not read yet).
+        self.seq = 0
+        self.ended = False
+
+    def poll(self, timeout=0):
+        # Read and apply any messages received within 'timeout' seconds.
+        if not self.ended and self.selector.select(timeout):
+            while True:
+                try:
+                    data = self.socket.recv(RECV_SIZE)
+                except (BlockingIOError, InterruptedError):
+                    break
+                if not data:
+                    self.ended = True  # Server closed.
+                    break
+                self.buffer += data
+        while True:
+            message, used = decode(self.buffer)
+            if message is None:
+                break
+            del self.buffer[:used]
+            self.apply(message)
+
+    def apply(self, message):
+        # Update agents' state with a message and build the frame.
+        if message["kind"] == KEYFRAME:
+            self.random_seed, fps, width, height, n_agents = message["info"]
+            self.fps = None if fps == shared.NO_FPS else fps
+            self.records = np.zeros(n_agents, dtype=RECORD)
+        elif self.records is None:
+            return  # Deltas are useless till first keyframe.
+        records = message["records"]
+        self.records[records['slot']] = records
+        self.ended = self.ended or message["ended"]
+
+        self.seq += 2
+        self.frame = records_frame(self.seq, message["step"], message["time_run"],
+                                   self.random_seed, self.fps, self.ended, self.records)
+
+    def is_new(self):
+        # Check whether a frame was received since latest read.
+        self.poll()
+        return self.frame is not None
+
+    def read(self, timeout=None):
+        # Return latest frame received (waiting up to 'timeout' seconds for
+        # one, forever if None), or None.
+        self.poll()
+        while self.frame is None and not self.ended:
+            if not self.selector.select(timeout):
+                break
+            self.poll()
+        frame, self.frame = self.frame, None
+        return frame
+
+    def close(self):
+        self.selector.close()
+        self.socket.close()
+
+
+###############################################################################
+# Code for TESTING purposes only:
+if __name__ == '__main__':
+    import tempfile
+    import world as w
+
+    # Stream a run to a client joining late, and check that its mirror matches.
+    simulation_def = dict(w.Simulation_def)
+    simulation_def["world"] = dict(w.WORLD_DEF, random_seed=1)
+    world = w.World(simulation_def)
+    address = os.path.join(tempfile.mkdtemp(), "lal.sock")
+    broadcaster = Broadcaster(world, address)
+    for _ in range(10):
+        world.step()
+        broadcaster.publish()
+    receiver = Receiver(address)
+    mirror = None
+    deaths, respawns = sum(world.deaths.values()), sum(world.respawns.values())
+    flags = dict(deaths=0, respawns=0)
+    for _ in range(100):
+        world.step()
+        broadcaster.publish()
+        flags["deaths"] += np.count_nonzero(broadcaster.previous['events'] & DIED)
+        flags["respawns"] += np.count_nonzero(broadcaster.previous['events'] & RESPAWNED)
+        frame = receiver.read(timeout=1)
+        if mirror is None:
+            mirror = shared.mirror_world(frame)
+        else:
+            shared.apply_frame(mirror, frame)
+    same = all(a.position == b.position and np.isclose(a.energy, b.energy, atol=1e-3)
+               for a, b in zip(sorted(world.agents, key=lambda a: a.slot),
+                               sorted(mirror.agents, key=lambda a: a.slot)))
+    print("Mirror matches world:", same, "| Step:", mirror.steps)
+    print("Events: {deaths} DIED, {respawns} RESPAWNED".format(**flags),
+          "| World: {} deaths, {} respawns".format(sum(world.deaths.values()) - deaths,
+                                                  sum(world.respawns.values()) - respawns))
+    assert flags == dict(deaths=sum(world.deaths.values()) - deaths,
+                         respawns=sum(world.respawns.values()) - respawns), "Deaths or respawns not streamed."
+
+    # Agents spawned on the run must be streamed too (on a new keyframe).
+    bug_def = [a_def for a_def in simulation_def["agents"] if a_def.thing_settings.name == "bug"][0]
+    for _ in range(30):
+        world.spawn(bug_def)
+    world.step()
+    broadcaster.publish()
+    frame = receiver.read(timeout=1)
+    streamed = all(tuple(frame.positions[a.slot]) == tuple(a.position) for a in world.agents)
+    print("Spawned agents streamed:", streamed, "| Rows: {} for {} agents".format(
+        len(frame.positions), len(world.agents)))
+    assert streamed, "Spawned agents should be streamed."
+    receiver.close()
+    broadcaster.close()
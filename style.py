@@ -0,0 +1,39 @@
+###############################################################################
+# STYLE
+# Colors and intensities of "Lil' ASCII Lab"'s things...
+#
+# Plain numbers, so that the simulation core (world, things, ai, act) never
+# needs curses: colors are the 8 basic ANSI ones (the same numbers curses
+# uses for COLOR_BLACK...COLOR_YELLOW), and intensity is an offset on them.
+# Only the UI resolves them into actual terminal attributes (see ui.py).
+###############################################################################
+
+# Libraries.
+pass
+
+# Modules.
+pass
+
+###############################################################################
+# CONSTANTS
+
+# The 8 basic colors.
+BLACK = 0
+RED = 1
+GREEN = 2
+YELLOW = 3
+BLUE = 4
+MAGENTA = 5
+CYAN = 6
+WHITE = 7
+
+colors = (BLACK, BLUE, CYAN, GREEN, MAGENTA, RED, WHITE, YELLOW)
+color_names = ("BLACK", "BLUE", "CYAN", "GREEN", "MAGENTA", "RED", "WHITE", "YELLOW")
+
+# Intensities.
+NORMAL = 0  # No offset for normal colors (1..8).
+BRIGHT = 8  # Offset to get brighter colors, assuming COLORS >= 16 .
+
+# Colors of some states.
+DEAD_AGENT_COLOR = (BLACK, BRIGHT)
+ENERGY_DROP_COLOR = RED
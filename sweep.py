@@ -0,0 +1,226 @@
+###############################################################
+# Lil' ASCII Lab
+# Parameter sweeps: headless runs over a grid of settings, with results
+# cached on disk by the hash of their fully resolved definitions.
+#
+# E.g.:  python sweep.py --steps 500 --seeds 1 2 3 \
+#            --param energy.bite_power=5,10,20 --param world.width=30,60
+#
+# Parameters:
+#   - world.<key>: a WORLD_DEF setting (e.g. world.width).
+#   - energy.<field>: an Energy_settings_def field for all agents.
+#   - energy.<agent name>.<field>: the same, only for agents with that name.
+#
+# Each run's key hashes the resolved Simulation_def (AI functions by name),
+# the seed, the number of steps, the program's VERSION and the source of the
+# simulation's modules (so that any change of code makes results stale,
+# whether the VERSION was bumped or not). Runs found in the
+# cache are skipped; the rest are run on a process pool, and each result is
+# written as soon as it's ready, so an interrupted sweep resumes from there.
+
+###############################################################
+
+# Libraries.
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+# Modules.
+import world as w
+
+SWEEP_CACHE = ".sweep_cache"  # Default directory of cached results.
+
+_source_hash = None  # Hash of the simulation's source (see source_hash()).
+
+###############################################################
+# Parameter grid
+
+
+def parse_param(text):
+    # Return (name, [values]) from "name=v1,v2,...", with values as JSON
+    # (numbers, true/false, null) or else as strings.
+    name, _, values = text.partition("=")
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(json.loads(value))
+        except ValueError:
+            parsed.append(value)
+    return name, parsed
+
+
+def expand(params):
+    # Return the list of all combinations of {name: [values]}, as dicts
+    # (in a fixed order).
+    names = sorted(params)
+    return [dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))]
+
+
+def resolve(simulation_def, overrides, seed, steps):
+    # Return a copy of 'simulation_def' with the given overrides, seed and
+    # number of steps applied.
+    simulation_def = dict(simulation_def)
+    world_def = dict(simulation_def["world"], random_seed=seed, max_steps=steps)
+    agents_def = list(simulation_def["agents"])
+    for name, value in overrides.items():
+        parts = name.split(".")
+        if parts[0] == "world" and len(parts) == 2:
+            if parts[1] not in world_def:
+                raise Exception('Unknown world setting "{}".'.format(parts[1]))
+            world_def[parts[1]] = value
+        elif parts[0] == "energy" and len(parts) in (2, 3):
+            field = parts[-1]
+            agent_name = parts[1] if len(parts) == 3 else None
+            for i, a_def in enumerate(agents_def):
+                if agent_name is None or a_def.thing_settings.name == agent_name:
+                    energy_settings = a_def.energy_settings._replace(**{field: value})
+                    agents_def[i] = a_def._replace(energy_settings=energy_settings)
+        else:
+            raise Exception('Unknown parameter "{}".'.format(name))
+    simulation_def["world"] = world_def
+    simulation_def["agents"] = tuple(agents_def)
+    return simulation_def
+
+###############################################################
+# Cache
+
+
+def canonical(value):
+    # Return a JSON-serializable, unambiguous version of a definition:
+    # functions by their qualified name, namedtuples as dicts with their type.
+    if callable(value):
+        return "{}.{}".format(value.__module__, value.__qualname__)
+    if hasattr(value, "_asdict"):
+        return dict(canonical(value._asdict()), _type=type(value).__name__)
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    return value
+
+
+def source_hash():
+    # Return the hash of the source of the program's modules the simulation
+    # is made of (i.e. those loaded from this directory by world.py).
+    global _source_hash
+    if _source_hash is None:
+        directory = os.path.dirname(os.path.abspath(w.__file__))
+        paths = sorted(os.path.abspath(module.__file__) for module in list(sys.modules.values())
+                       if getattr(module, "__file__", None)
+                       and os.path.dirname(os.path.abspath(module.__file__)) == directory
+                       and module.__name__ not in ("__main__", __name__))
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, "rb") as f:
+                digest.update(os.path.basename(path).encode("utf-8") + b"\0" + f.read())
+        _source_hash = digest.hexdigest()
+    return _source_hash
+
+
+def run_key(simulation_def):
+    # Return the hash identifying the results of a fully resolved run.
+    text = json.dumps(dict(version=w.VERSION, source=source_hash(), simulation=canonical(simulation_def)),
+                      sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], key + ".json")
+
+
+def load(cache_dir, key):
+    # Return the cached result for 'key', or None.
+    try:
+        with open(cache_path(cache_dir, key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store(cache_dir, key, result):
+    # Write a result atomically (no half-written files if interrupted).
+    path = cache_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(result, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+###############################################################
+# Runs
+
+
+def run(job):
+    # Run a headless simulation; return its key and results.
+    key, overrides, simulation_def = job
+    t0 = time.time()
+    world = w.World(simulation_def)
+    while not world.is_end_loop():
+        world.step()
+    survivors = {}
+    for agent in world.agents:
+        if agent.action is not None and agent.energy > 0:
+            kind = agent.kind()
+            survivors[kind] = survivors.get(kind, 0) + 1
+    return key, dict(
+        overrides=overrides,
+        seed=world.random_seed,
+        steps=world.steps,
+        total_energy=float(world.total_energy),
+        survivors=survivors,
+        seconds=round(time.time() - t0, 3),
+    )
+
+
+def sweep(params, seeds, steps, simulation_def=w.Simulation_def, cache_dir=SWEEP_CACHE, processes=None):
+    # Return the results of all combinations of 'params' and 'seeds' (in
+    # order), running only those not found in the cache.
+    jobs, results = [], {}
+    for overrides in expand(params):
+        for seed in seeds:
+            resolved = resolve(simulation_def, overrides, seed, steps)
+            key = run_key(resolved)
+            results[key] = load(cache_dir, key)
+            if results[key] is None:
+                jobs.append((key, overrides, resolved))
+    n_cached = len(results) - len(jobs)
+
+    if jobs:
+        with Pool(processes) as pool:
+            for key, result in pool.imap_unordered(run, jobs):
+                store(cache_dir, key, result)
+                results[key] = result
+    return list(results.values()), n_cached
+
+
+if __name__ == '__main__':
+    # Main program.
+    parser = argparse.ArgumentParser(description="Lil' ASCII Lab parameter sweeps")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="values of a parameter (e.g. energy.bite_power=5,10)")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1], help="random seeds to run")
+    parser.add_argument("--steps", type=int, default=200, help="steps per run")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all CPUs)")
+    parser.add_argument("--cache", default=SWEEP_CACHE, help="cache directory (default: %(default)s)")
+    args = parser.parse_args()
+
+    time_0 = time.time()
+    params = dict(parse_param(p) for p in args.param)
+    results, n_cached = sweep(params, args.seeds, args.steps, cache_dir=args.cache, processes=args.workers)
+
+    # Show results.
+    for result in results:
+        settings = " ".join("{}={}".format(k, v) for k, v in sorted(result["overrides"].items()))
+        survivors = " ".join("{}:{}".format(k, v) for k, v in sorted(result["survivors"].items()))
+        print("{:<40} seed={:<6} energy={:>9.1f}  {}".format(
+            settings, result["seed"], result["total_energy"], survivors))
+    print("Lil' ASCII Lab v{}".format(w.VERSION))
+    print("{:<20}{}".format("- Runs:", len(results)))
+    print("{:<20}{}".format("- Cached:", n_cached))
+    print("{:<20}{:.1f}s".format("- Time:", time.time() - time_0))
@@ -13,7 +13,7 @@ from collections import namedtuple
 # Modules.
 import ai
 import act
-import ui
+import style
 
 
 ###############################################################################
@@ -23,8 +23,8 @@ import ui
 Thing_settings_def = namedtuple("Thing_settings_def", [
     'name',  # Some descriptive text (e.g. "bug").
     'aspect',  # One single Unicode character (e.g. "⚉").
-    'color',  # Its normal color (e.g. ui.CYAN). (See ui.py module).
-    'intensity',  # Its normal intensity (e.g. ui.BRIGHT). (See ui.py module).
+    'color',  # Its normal color (e.g. style.CYAN). (See style.py module).
+    'intensity',  # Its normal intensity (e.g. style.BRIGHT). (See style.py module).
     'initial_position'  # Its initial position (or RND). If 'n_instances' > 1, it will be used for the first one only.
 ])
 
@@ -97,7 +97,7 @@ AI_settings_def = namedtuple("AI_settings_def", [
 # Tiles definition:
 # name, aspect, color, intensity, initial_position.
 TILE_DEF = (
-    Thing_settings_def("ground", "·", ui.BLUE, ui.NORMAL, RANDOM_POSITION)
+    Thing_settings_def("ground", "·", style.BLUE, style.NORMAL, RANDOM_POSITION)
 )
 
 # Block definition:
@@ -106,41 +106,41 @@ TILE_DEF = (
 #   Aspect: " " for a generic full block (which will be doubled to fit world's spacing).
 #           ONE single Unicode character, e.g. "#" (which will be doubled to fit world's spacing).
 #           TWO Unicode characters for specific styles (e.g. "[]", "▛▜", "◢◣").
-#   Color & intensity: (see ui.py module).
+#   Color & intensity: (see style.py module).
 #   Position: (a tuple, currently ignored).
 
 BLOCKS_DEF = (
     Block_def(
         100,
-        Thing_settings_def("block", "▢", ui.BLUE, ui.BRIGHT, RANDOM_POSITION)
+        Thing_settings_def("block", "▢", style.BLUE, style.BRIGHT, RANDOM_POSITION)
     ),
 )
-    #   (None, "full-block", " ", ui.BLACK, ui.BRIGHT, RANDOM_POSITION),
-    #   (10, "fence", "#", ui.WHITE, ui.BRIGHT, RANDOM_POSITION),
+    #   (None, "full-block", " ", style.BLACK, style.BRIGHT, RANDOM_POSITION),
+    #   (10, "fence", "#", style.WHITE, style.BRIGHT, RANDOM_POSITION),
 
 AGENTS_DEF = (
     # With real minds:
     Agent_def(
         5,
-        Thing_settings_def("Omi", "Ω", ui.CYAN, ui.BRIGHT, RANDOM_POSITION),
+        Thing_settings_def("Omi", "Ω", style.CYAN, style.BRIGHT, RANDOM_POSITION),
         Energy_settings_def(100, 110, 5, -0.1, -0.5, RESPAWNABLE),
         AI_settings_def(ai.full_info, ai.wanderer2, ai.no_learning)
     ),
     Agent_def(
         15,
-        Thing_settings_def("bug", "⚉", ui.GREEN, ui.BRIGHT, RANDOM_POSITION),
+        Thing_settings_def("bug", "⚉", style.GREEN, style.BRIGHT, RANDOM_POSITION),
         Energy_settings_def(100, 110, 5, -0.1, -0.1, NON_RECHARGEABLE),
         AI_settings_def(ai.full_info, ai.wanderer, ai.no_learning)
     ),
     Agent_def(
         2,
-        Thing_settings_def("killer", "Ѫ", ui.RED, ui.BRIGHT, RANDOM_POSITION),
+        Thing_settings_def("killer", "Ѫ", style.RED, style.BRIGHT, RANDOM_POSITION),
         Energy_settings_def(100, 110, 25, -0.1, -0.1, NON_RECHARGEABLE),
-        AI_settings_def(ai.full_info, ai.wanderer, ai.no_learning)
+        AI_settings_def(ai.full_info, ai.hunter, ai.no_learning)
     ),
     Agent_def(
         5,
-        Thing_settings_def("foe", "Д", ui.MAGENTA, ui.BRIGHT, RANDOM_POSITION),
+        Thing_settings_def("foe", "Д", style.MAGENTA, style.BRIGHT, RANDOM_POSITION),
         Energy_settings_def(100, 110, 10, -0.1, -1, RESPAWNABLE),
         AI_settings_def(ai.full_info, ai.wanderer, ai.no_learning)
     ),
@@ -148,13 +148,13 @@ AGENTS_DEF = (
     # Mindless:
     Agent_def(
         15,
-        Thing_settings_def("energy", "♥", ui.RED, ui.NORMAL, RANDOM_POSITION),
+        Thing_settings_def("energy", "♥", style.RED, style.NORMAL, RANDOM_POSITION),
         Energy_settings_def(50, 50, 0, -0.001, 0, RESPAWNABLE),
         AI_settings_def(None, None, None)
     ),
     Agent_def(
         1,
-        Thing_settings_def("recharger", "*", ui.YELLOW, ui.BRIGHT, RANDOM_POSITION),
+        Thing_settings_def("recharger", "*", style.YELLOW, style.BRIGHT, RANDOM_POSITION),
         Energy_settings_def(30, 30, 0, 0, 0, EVERLASTING),
         AI_settings_def(None, None, None)
     )
@@ -171,6 +171,9 @@ AGENTS_DEF = (
 
 class Thing:
     # Root class containing the common attributes for all classes.
+    # (All classes of Thing use __slots__, i.e. no per-instance __dict__.)
+    __slots__ = ('name', 'aspect', 'color', 'intensity', 'position')
+
     def __init__(self, thing_def):
         self.name = thing_def.name  # Name of the thing.
         self.aspect = thing_def.aspect  # Text character to display.
@@ -180,10 +183,11 @@ class Thing:
 
 
 class Tile(Thing):
-    pass  # Use root class'.
+    __slots__ = ()  # Use root class'.
 
 
 class Block(Thing):
+    __slots__ = ()
     num_blocks = 0
 
     # It passively occupies one tile, never moving.
@@ -196,13 +200,44 @@ class Block(Thing):
 
 class Agent(Thing):
     # Default class for Agents.
+    __slots__ = (
+        'slot',  # Its row in per-agent tables (see AgentPool).
+        'energy', 'max_energy', 'bite_power', 'step_cost', 'move_cost', 'recycling', 'acceptable_energy_drop',
+        'perception', 'action', 'learning',
+        'original_color', 'original_intensity',
+        'steps', 'current_state', 'current_energy_delta',
+        'negative_touch_map', 'positive_touch_map',
+        'chosen_action', 'action_code', 'chosen_action_success', 'action_icon', 'learn_result',
+        'energy_at_step', 'last_update_step', 'drain', 'event_step',  # Lazy energy of passive agents (see World.materialize()).
+        'state_key',  # Its part of the world's state hash (see zobrist.py).
+        'death_step', 'respawn_step'  # Latest transitions, as recorded by the world (see World.post_step()).
+    )
     num_agents = 0
 
     def __init__(self,
                  thing_settings,
                  energy_settings,
                  ai_settings,
-                 agent_suffix=None):
+                 agent_suffix=None,
+                 touch_maps=None):
+        # Buffers allocated once per Agent (reused if recycled, see AgentPool):
+        # its (negative, positive) 3x3 touch maps, by default on their own
+        # array, or views on a pool's 'touch_maps' row.
+        if touch_maps is None:
+            touch_maps = np.zeros([2, 3, 3])
+        self.negative_touch_map, self.positive_touch_map = touch_maps
+
+        # Set all attributes as defined.
+        self.define(thing_settings, energy_settings, ai_settings, agent_suffix)
+
+        Agent.num_agents += 1
+
+    def define(self,
+               thing_settings,
+               energy_settings,
+               ai_settings,
+               agent_suffix=None):
+        # (Re)define the agent from its settings, e.g. when recycled.
         # Initialize inherited attributes, customizing 'name'.
         super().__init__(thing_settings)
         if agent_suffix is not None:
@@ -226,19 +261,28 @@ class Agent(Thing):
         self.original_color = self.color
         self.original_intensity = self.intensity
 
+        # Lazy energy (of passive agents): 'energy_at_step' as of 'last_update_step',
+        # changing by 'drain' per step till 'event_step' (bound hit).
+        self.energy_at_step = self.energy
+        self.last_update_step = 0
+        self.state_key = 0  # (Not on the board yet.)
+        self.drain = 0
+        self.event_step = None
+        # Steps (as per world.steps once over) on which it latest died and respawned.
+        self.death_step = None
+        self.respawn_step = None
+
         # Initialize internal variables.
         self.initialize_state()
 
-        Agent.num_agents += 1
-
     def initialize_state(self):
-        # Initialize agent-specific attributes.
+        # Initialize agent-specific attributes (reusing its buffers).
         self.steps = 0
         self.current_state = None
         self.current_energy_delta = 0
-        self.negative_touch_map = np.zeros([3, 3])
-        self.positive_touch_map = np.zeros([3, 3])
+        self.reset_touch_maps()
         self.chosen_action = act.VOID_ACTION
+        self.action_code = act.VOID_CODE  # chosen_action, encoded (see act.py).
         self.chosen_action_success = True
         self.action_icon = ""
         self.learn_result = None
@@ -290,7 +334,7 @@ class Agent(Thing):
             # Check for death condition:
             if self.energy <= 0:
                 # Update aspect (RESPAWNEABLE condition handled by world).
-                self.color, self.intensity = ui.DEAD_AGENT_COLOR
+                self.color, self.intensity = style.DEAD_AGENT_COLOR
 
         return energy_used
 
@@ -299,23 +343,27 @@ class Agent(Thing):
         self.current_state = self.perception(agent=self, world=world)
         # Now its "acting mind" is requested to choose an action.
         self.chosen_action = self.action(self.current_state)
+        self.action_code = act.encode_action(self.chosen_action)
 
         return self.chosen_action
 
-    def update_after_action(self, success):
+    def set_action(self, code):
+        # Take an action chosen elsewhere (e.g. in another process), by its code.
+        self.action_code = code
+        self.chosen_action = act.decode_action(code)
+
+    def update_after_action(self, success, reset_touch_maps=True):
         # Update internal state of agent after trying some action.
+        # (Touch maps are kept when the world has already reset them before
+        # resolving the actions of a simultaneous step.)
 
         # Update internal variables, aspect, etc.
         self.chosen_action_success = success
-        self.reset_touch_maps()
+        if reset_touch_maps:
+            self.reset_touch_maps()
 
         # UI: Capture action's icon, if any.
-        action = self.chosen_action[1].tolist()
-        if action in act.XY_8_DELTAS:
-            action_idx = act.XY_8_DELTAS.index(action)
-            self.action_icon = act.XY_8_ICONS[action_idx]
-        else:
-            self.action_icon = ""
+        self.action_icon = act.ACTION_ICONS[self.action_code]
 
         # TODO: Update aspect (character(s) displayed, color...)?
 
@@ -332,6 +380,10 @@ class Agent(Thing):
         # Now the 'step' is finished.
         self.steps += 1
 
+    def kind(self):
+        # Return the name of the agent's definition (i.e. without suffix).
+        return self.name.split(".")[0]
+
     def respawn(self):
         # Restablish an agent back to its optimal state.
         self.energy = self.max_energy
@@ -339,3 +391,62 @@ class Agent(Thing):
         self.intensity = self.original_intensity
         # Initialize internal variables.
         self.initialize_state()
+
+
+class AgentPool:
+    # Recycles Agents, so that populations may swing without allocating:
+    # every Agent keeps its 'slot' (its row in per-agent tables) for good,
+    # and despawned ones wait on a free list to be redefined by next spawns.
+    # All touch maps lie on one preallocated array, one row per slot.
+    def __init__(self, capacity=0):
+        self.agents = []  # All Agents ever created, by slot.
+        self.in_use = []  # Whether each slot is taken by a spawned Agent.
+        self.free_slots = []  # Slots to reuse (latest freed first).
+        self.touch_maps = np.zeros([capacity, 2, 3, 3])  # (Negative, positive) maps per slot.
+
+    def acquire(self, agent_def, agent_suffix=None):
+        # Return an Agent defined as per 'agent_def', recycled if possible.
+        if self.free_slots:
+            agent = self.agents[self.free_slots.pop()]
+            agent.define(
+                agent_def.thing_settings,
+                agent_def.energy_settings,
+                agent_def.ai_settings,
+                agent_suffix
+                )
+        else:
+            slot = len(self.agents)
+            self.reserve(slot + 1)
+            agent = Agent(
+                agent_def.thing_settings,
+                agent_def.energy_settings,
+                agent_def.ai_settings,
+                agent_suffix,
+                self.touch_maps[slot]
+                )
+            agent.slot = slot
+            self.agents.append(agent)
+            self.in_use.append(False)
+        self.in_use[agent.slot] = True
+        return agent
+
+    def release(self, agent):
+        # Put an Agent back on the free list.
+        if not self.in_use[agent.slot]:
+            raise Exception('Agent "{}" is already released.'.format(agent.name))
+        self.in_use[agent.slot] = False
+        self.free_slots.append(agent.slot)
+
+    def reserve(self, capacity):
+        # Make room for at least 'capacity' slots (doubling the array, so that
+        # growing populations cause few reallocations), moving agents' maps.
+        if capacity > len(self.touch_maps):
+            touch_maps = np.zeros([max(capacity, 2 * len(self.touch_maps)), 2, 3, 3])
+            touch_maps[:len(self.touch_maps)] = self.touch_maps
+            self.touch_maps = touch_maps
+            for agent in self.agents:
+                agent.negative_touch_map, agent.positive_touch_map = touch_maps[agent.slot]
+
+    def capacity(self):
+        # Number of slots (i.e. rows needed in per-agent tables).
+        return len(self.agents)
@@ -0,0 +1,83 @@
+###############################################################################
+# TRAJECTORY
+# Bounded history of positions, actions and energy of "Lil' ASCII Lab"'s
+# agents...
+###############################################################################
+
+# Libraries.
+import numpy as np
+
+# Modules.
+import act
+
+###############################################################################
+# CONSTANTS
+
+# Fields recorded for every agent and step (last axis of the buffer).
+STEP = 0  # World's step on which the record was taken.
+X = 1  # Position of the agent after acting.
+Y = 2
+ACTION = 3  # Action code (verb and direction, see act.py).
+ENERGY_DELTA = 4  # Energy change reported by the action.
+SUCCESS = 5  # 1 if the action succeeded, 0 otherwise.
+N_FIELDS = 6
+
+###############################################################################
+
+
+class Trajectories:
+    # A single preallocated (n_agents, length, N_FIELDS) ring buffer with the
+    # latest 'length' records of each agent. Memory never grows with steps.
+    def __init__(self, n_agents, length):
+        self.length = length
+        self.buffer = np.zeros((n_agents, length, N_FIELDS))
+        self.count = np.zeros(n_agents, dtype=np.int64)  # Records ever written per agent.
+
+    def record(self, slot, step, position, action_code, energy_delta, success):
+        # Store one step of the agent in 'slot', overwriting its oldest record.
+        row = self.buffer[slot, self.count[slot] % self.length]
+        row[STEP] = step
+        row[X], row[Y] = position
+        row[ACTION] = action_code
+        row[ENERGY_DELTA] = energy_delta
+        row[SUCCESS] = success
+        self.count[slot] += 1
+
+    def reserve(self, n_agents):
+        # Make room for at least 'n_agents' (doubling the buffer, so that
+        # growing populations cause few reallocations).
+        if n_agents > len(self.count):
+            n = max(n_agents, 2 * len(self.count))
+            buffer = np.zeros((n, self.length, N_FIELDS))
+            buffer[:len(self.count)] = self.buffer
+            count = np.zeros(n, dtype=np.int64)
+            count[:len(self.count)] = self.count
+            self.buffer, self.count = buffer, count
+
+    def reset(self, slot):
+        # Forget the history of an agent (e.g. after respawning).
+        self.count[slot] = 0
+
+    def recent(self, slot, n=None):
+        # Return the latest 'n' records of an agent (all kept if None),
+        # oldest first.
+        kept = min(self.count[slot], self.length)
+        if n is not None:
+            kept = min(kept, n)
+        end = self.count[slot] % self.length
+        idx = (np.arange(end - kept, end)) % self.length
+        return self.buffer[slot, idx]
+
+    def path(self, slot, n=None):
+        # Return the latest 'n' positions of an agent as an (n, 2) array.
+        return self.recent(slot, n)[:, X:Y + 1].astype(int)
+
+    def path_icons(self, slot, n=None):
+        # Return a string with the icons of the moves actually made by the
+        # agent among its latest 'n' records.
+        positions = self.path(slot, n)
+        icons = ""
+        for dx, dy in np.diff(positions, axis=0).tolist():
+            if -1 <= dx <= 1 and -1 <= dy <= 1:
+                icons += act.DIRECTION_ICONS[act.DIRECTION_INDEX[dx + 1][dy + 1]]
+        return icons
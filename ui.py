@@ -9,27 +9,34 @@ import numpy as np
 import random
 import curses
 import os
+import sys
+import selectors
 import datetime
+import itertools
+import bisect
 from curses import wrapper
 
 # Modules
-pass
-
-# Constants based on curses' 8 basic colors:
-BLACK = curses.COLOR_BLACK
-BLUE = curses.COLOR_BLUE
-CYAN = curses.COLOR_CYAN
-GREEN = curses.COLOR_GREEN
-MAGENTA = curses.COLOR_MAGENTA
-RED = curses.COLOR_RED
-WHITE = curses.COLOR_WHITE
-YELLOW = curses.COLOR_YELLOW
-
-colors = (BLACK, BLUE, CYAN, GREEN, MAGENTA, RED, WHITE, YELLOW)
-color_names = ("BLACK", "BLUE", "CYAN", "GREEN", "MAGENTA", "RED", "WHITE", "YELLOW")
-
-NORMAL = 0  # No offset for normal colors (1..8).
-BRIGHT = 8  # Offset to get brighter colors, assuming COLORS >= 16 .
+import style
+
+# Colors (see style.py module), checked against curses' 8 basic colors:
+BLACK = style.BLACK
+BLUE = style.BLUE
+CYAN = style.CYAN
+GREEN = style.GREEN
+MAGENTA = style.MAGENTA
+RED = style.RED
+WHITE = style.WHITE
+YELLOW = style.YELLOW
+assert (BLACK, BLUE, CYAN, GREEN, MAGENTA, RED, WHITE, YELLOW) == (
+    curses.COLOR_BLACK, curses.COLOR_BLUE, curses.COLOR_CYAN, curses.COLOR_GREEN,
+    curses.COLOR_MAGENTA, curses.COLOR_RED, curses.COLOR_WHITE, curses.COLOR_YELLOW)
+
+colors = style.colors
+color_names = style.color_names
+
+NORMAL = style.NORMAL  # No offset for normal colors (1..8).
+BRIGHT = style.BRIGHT  # Offset to get brighter colors, assuming COLORS >= 16 .
 MAX_COLORS = 16  # The number of predefined colors to try to use.
 
 # Constants based on curses to manage keycaps:
@@ -39,11 +46,30 @@ KEY_LEFT = curses.KEY_LEFT  # Left-arrow
 KEY_SLEFT = curses.KEY_SLEFT  # Shifted Left arrow
 KEY_RIGHT = curses.KEY_RIGHT  # Right-arrow
 KEY_SRIGHT = curses.KEY_SRIGHT  # Shifted Right arrow
+KEYS_ENTER = [curses.KEY_ENTER, ord('\n'), ord('\r')]
+KEYS_BACKSPACE = [curses.KEY_BACKSPACE, 127, 8]
+KEY_ESC = 27
+
+# Render states of things (see UI.glyph()), by increasing order within a kind.
+TILE = 0  # Empty tile.
+TILE_HIGHLIGHT = 1  # Empty tile next to the tracked agent.
+BLOCK = 2
+AGENT = 3
+AGENT_LOW = 4  # Alive with dangerously low energy.
+AGENT_GAIN = 5  # Just gained some energy.
+AGENT_GAIN_LOW = 6
+AGENT_DROP = 7  # Just suffered a huge energy drop.
+AGENT_DROP_LOW = 8
+AGENT_DEAD = 9
+AGENT_DEAD_DROP = 10  # Just died of a huge energy drop.
+TRACKER = 11  # Agent's aspect on the tracker.
+TRACKER_DEAD = 12
+N_STATES = 13
 
 # Other constants.
 LOW_ENERGY_THRESHOLD = 0.25  # Below this % energy is displayed as dangerously low.
-DEAD_AGENT_COLOR = (BLACK, BRIGHT)
-ENERGY_DROP_COLOR = RED
+DEAD_AGENT_COLOR = style.DEAD_AGENT_COLOR
+ENERGY_DROP_COLOR = style.ENERGY_DROP_COLOR
 
 # Output settings: Define how I/O will happen:
 UI_def = dict(
@@ -57,6 +83,7 @@ UI_def = dict(
     tracking_width=60,  # Width for the tracking space will be set up on the right.
     tracking_right_column=36,  # Column where the right section of the tracker starts.
     name_length=10,  # Maximum length displayed of agents' names.
+    path_length=18,  # Maximum number of latest moves displayed for the tracked agent.
     window_bg=BLACK,  # BG color of the full terminal window.
     header_fg=WHITE + BRIGHT,  # FG color of the TITLE of the world.
     header_bg=BLUE + NORMAL,  # BG color of the TITLE of the world.
@@ -66,6 +93,9 @@ UI_def = dict(
     footer_bg=WHITE + NORMAL,  # BG color of the FOOTER.
     tracker_fg=GREEN,  # FG color of the Tracker window.
     tracker_bg=BLACK + NORMAL,  # BF color of the Tracker window.
+    idle_spf=0.25,  # Seconds between redraws while the simulation is halted.
+    fast_forward_spf=0.1,  # Seconds of steps run between progress redraws while fast-forwarding.
+    progress_width=20,  # Width of the progress bar (fast-forward).
 )
 
 
@@ -73,10 +103,17 @@ UI_def = dict(
 # CLASSES
 
 class UI:
-    def __init__(self, stdscr, world):
-        # Register curses screen and world to represent. Initialize attributes.
+    def __init__(self, stdscr, world, scheduler=None, history=None):
+        # Register curses screen, world to represent, the scheduler pacing
+        # it and the history of its latest steps (if any). Initialize attributes.
         self.stdscr = stdscr
-        self.world = world
+        self.world = world  # World drawn: the live one, or a past step of it (see rewind()).
+        self.live_world = world
+        self.scheduler = scheduler
+        self.history = history
+        self.rewind_step = None  # Past step drawn (None when live).
+        self.target_text = None  # Fast-forward target being typed (None if not asked).
+        self.fast_forward = None  # Fast-forward under way: (start step, target step, target time_run).
 
         # Check IO settings.
         self.resize_term = UI_def["resize_term"]
@@ -86,6 +123,7 @@ class UI:
         self.tracker_width = UI_def["tracking_width"]
         self.tracking_right_column = UI_def["tracking_right_column"]
         self.name_length = UI_def["name_length"]
+        self.path_length = UI_def["path_length"]
 
         # UI layout dimensions.
         self.height = max(UI_def["min_ui_height"], 1 + self.world.height + 1)  # header + board + footer.
@@ -115,8 +153,9 @@ class UI:
         self.stdscr.nodelay(False)  # Enable waiting for user input stop.
         curses.curs_set(2)  # Set cursor as 'very' visible.
 
-        # COLORS: try to initialize curses' pairs; set UI colors as defined.
+        # COLORS: prepare curses' pairs (allocated on first use); set UI colors as defined.
         self.has_colors, self.color_pairs = self.init_all_pairs()
+        self.next_pair = 1  # Skip pair 0 ("wired" to black and white).
         self.window_bg = UI_def["window_bg"]
         self.header_fg = UI_def["header_fg"]
         self.header_bg = UI_def["header_bg"]
@@ -148,6 +187,31 @@ class UI:
         self.footer.nodelay(True)  # Establish the "nodelay" mode.
         stdscr.refresh()
 
+        # Input is awaited on stdin through a selector, so that the screen
+        # keeps being redrawn (e.g. while paused) without busy-waiting.
+        self.input_selector = selectors.DefaultSelector()
+        self.input_selector.register(sys.stdin, selectors.EVENT_READ)
+        self.idle_spf = UI_def["idle_spf"]
+        self.fast_forward_spf = UI_def["fast_forward_spf"]
+        self.progress_width = UI_def["progress_width"]
+
+        # Glyph atlas: ready-to-draw (text, attr) segments for every kind of
+        # thing (aspect, color, intensity) and render state, built on demand.
+        # A kind gets N_STATES consecutive codes, from its base code.
+        self.atlas = []
+        self.kinds = []  # Kind of each group of N_STATES codes.
+        self.kind_codes = {}  # Kind -> base code.
+        # Codes of the empty tile or block on each tile, as they never move.
+        self.static_codes = np.zeros((self.world.width, self.world.height), dtype=int)
+        for x in range(self.world.width):
+            for y in range(self.world.height):
+                if self.world.blocks_bitmap[x, y]:
+                    block = self.world.things[x, y]
+                    self.static_codes[x, y] = self.kind_code(block.aspect, block.color, block.intensity) + BLOCK
+                else:
+                    tile = self.world.ground[x, y]
+                    self.static_codes[x, y] = self.kind_code(tile.aspect, tile.color, tile.intensity) + TILE
+
     def reshape_blocks(self, world_blocks):
         # Reshape aspect of world's blocks to fit UI settings.
         if self.extend_blocks:
@@ -161,36 +225,108 @@ class UI:
         curses.use_default_colors()  # Set default values for colors (including transparency color number -1).
         has_colors = curses.has_colors()  # Boolean: whether the terminal can display colors
 
-        color_pairs = np.full((MAX_COLORS, MAX_COLORS), 0)
-        if has_colors:
-            pair = 1  # Skip pair 0 ("wired" to black and white)
-            # Terminal has colors: initialize pairs for curses
-            for fg in range(MAX_COLORS):  # colors ranging from 0 to 15
-                for bg in range(MAX_COLORS):  # colors ranging from 0 to 15
-                    if curses.COLORS >= 16:
-                        # Full allocation of all 16x16 pair combinations
-                        curses.init_pair(pair, fg, bg)
-                        color_pairs[fg, bg] = pair
-                        pair += 1
-                    else:
-                        # Restrict to 8x8 pair combinations within the 16x16 shape
-                        if (fg <= 8 and bg <= 8):
-                            # Allocate new basic pair
-                            curses.init_pair(pair, fg, bg)
-                            color_pairs[fg, bg] = pair
-                            pair += 1
-                        else:
-                            # Reuse lower preallocated pairs
-                            color_pairs[fg, bg] = color_pairs[max(fg, fg - 8), max(bg, bg - 8)]
-
-        else:
-            # Terminal has NO colors: leave ALL pairs as 0 (curses' default pair for fg/bg)
-            pass
+        # Pair numbers for all fg/bg combinations: -1 until first used.
+        # Terminal has NO colors: leave ALL pairs as 0 (curses' default pair for fg/bg).
+        color_pairs = np.full((MAX_COLORS, MAX_COLORS), -1 if has_colors else 0)
 
         return has_colors, color_pairs
 
     def pair(self, fg, bg):
-        return curses.color_pair(self.color_pairs[fg, bg])
+        # Return the attribute for a fg/bg pair, initializing it on first use.
+        pair = self.color_pairs[fg, bg]
+        if pair < 0:
+            if curses.COLORS >= 16:
+                # Full 16x16 pair combinations.
+                curses.init_pair(self.next_pair, fg, bg)
+                pair = self.next_pair
+                self.next_pair += 1
+            elif fg < 8 and bg < 8:
+                # Basic 8x8 pair combinations.
+                curses.init_pair(self.next_pair, fg, bg)
+                pair = self.next_pair
+                self.next_pair += 1
+            else:
+                # Reuse the basic pair for bright colors.
+                self.pair(fg % 8, bg % 8)
+                pair = self.color_pairs[fg % 8, bg % 8]
+            self.color_pairs[fg, bg] = pair
+        return curses.color_pair(pair)
+
+    def kind_code(self, aspect, color, intensity):
+        # Return the base code in the atlas for a kind of thing.
+        kind = (aspect, color, intensity)
+        code = self.kind_codes.get(kind)
+        if code is None:
+            code = self.kind_codes[kind] = len(self.atlas)
+            self.kinds.append(kind)
+            self.atlas.extend([None] * N_STATES)
+        return code
+
+    def glyph(self, code):
+        # Return the (text, attr) segments drawing the atlas' 'code'.
+        segments = self.atlas[code]
+        if segments is None:
+            segments = self.atlas[code] = self.render_glyph(code)
+        return segments
+
+    def render_glyph(self, code):
+        # Build the (text, attr) segments for an atlas' code.
+        aspect, color, intensity = self.kinds[code // N_STATES]
+        state = code % N_STATES
+        bg = self.world.bg_color + self.world.bg_intensity
+        regular_pair = self.pair(color + intensity, bg)
+        dead_color = DEAD_AGENT_COLOR[0] + DEAD_AGENT_COLOR[1]
+
+        if state == TILE:
+            return ((aspect + self.spc_str, regular_pair),)
+        elif state == TILE_HIGHLIGHT:
+            return ((aspect + self.spc_str, self.pair(WHITE + BRIGHT, bg) | curses.A_BLINK),)
+        elif state == BLOCK:
+            if aspect[0] == " ":  # Generic full block style.
+                pair = self.pair(color + intensity, color + intensity)
+            else:
+                pair = regular_pair
+            return ((aspect, pair | curses.A_BOLD),)
+        elif state == TRACKER:
+            return ((aspect, self.pair(color + intensity, self.tracker_bg)),)
+        elif state == TRACKER_DEAD:
+            return ((aspect, self.pair(dead_color, self.tracker_bg)),)
+
+        # Agents: their aspect and the required blanks right after.
+        if state in (AGENT_DEAD, AGENT_DEAD_DROP):
+            regular_pair = self.pair(dead_color, bg)
+        if state == AGENT_DEAD:
+            pair = regular_pair
+        elif state in (AGENT_GAIN, AGENT_GAIN_LOW):
+            # Highlight energy increase.
+            pair = self.pair(color + BRIGHT, color + NORMAL)
+        elif state in (AGENT_DROP, AGENT_DROP_LOW, AGENT_DEAD_DROP):
+            # Highlight huge energy drop.
+            pair = self.pair(ENERGY_DROP_COLOR + BRIGHT, ENERGY_DROP_COLOR + NORMAL)
+        else:
+            pair = regular_pair
+        if state in (AGENT_LOW, AGENT_GAIN_LOW, AGENT_DROP_LOW):
+            pair = pair | curses.A_BLINK
+        return ((aspect, pair | curses.A_BOLD), (self.spc_str, regular_pair))
+
+    def agent_code(self, agent):
+        # Return the atlas' code drawing an agent on the board.
+        code = self.kind_code(agent.aspect, agent.original_color, agent.original_intensity)
+        low = 0 < agent.energy < agent.max_energy * LOW_ENERGY_THRESHOLD
+        if agent.current_energy_delta > 0:
+            return code + (AGENT_GAIN_LOW if low else AGENT_GAIN)
+        elif agent.current_energy_delta < agent.acceptable_energy_drop:
+            if agent.energy <= 0:
+                return code + AGENT_DEAD_DROP
+            return code + (AGENT_DROP_LOW if low else AGENT_DROP)
+        elif agent.energy <= 0:
+            return code + AGENT_DEAD
+        return code + (AGENT_LOW if low else AGENT)
+
+    def tracker_glyph(self, agent):
+        # Return the (text, attr) of an agent's aspect on the tracker.
+        code = self.kind_code(agent.aspect, agent.original_color, agent.original_intensity)
+        return self.glyph(code + (TRACKER_DEAD if agent.energy <= 0 else TRACKER))[0]
 
     def handle_terminal_size(self, stdscr):
         if self.resize_term:
@@ -229,109 +365,225 @@ class UI:
         self.footer.addnstr(0, 0, text.ljust(self.board_width - 1), self.footer.getmaxyx()[1] - 2, pair)
         self.footer.noutrefresh()
 
-    def ask(self, question):
-        # Ask user for TEXT input on footer zone.
+    def draw_prompt(self, text, blink=False):
+        # Print some prompt for the user on footer area (without waiting for input).
         # But first, signal the simulation is paused.
         pair = self.pair(self.header_fg, self.header_bg3)
         self.draw_header2("PAUSED", pair)
 
-        curses.flushinp()  # Throw away any typeahead not yet processed.
-        self.footer.nodelay(False)  # So that getkey() waits for a key press.
         self.footer.erase()  # Erase footer window.
         pair = self.pair(self.footer_fg, self.footer_bg)
-        self.footer.addnstr(0, 0, question.ljust(self.board_width - 1),
+        if blink:
+            pair = pair | curses.A_BLINK
+        self.footer.addnstr(0, 0, text.ljust(self.board_width - 1),
                             self.footer.getmaxyx()[1] - 2,
-                            pair | curses.A_BLINK)
-        self.footer.refresh()
-        answer = self.footer.getkey()
-        self.footer.nodelay(True)  # Back to "nodelay" mode.
-        return answer
-
-    def ask_key(self, question):
-        # Ask user for KEY input on footer zone.
-        # But first, signal the simulation is paused.
-        pair = self.pair(self.header_fg, self.header_bg3)
-        self.draw_header2("PAUSED", pair)
-
-        curses.flushinp()  # Throw away any typeahead not yet processed.
-        self.footer.nodelay(False)  # So that getkey() waits for a key press.
-        self.footer.erase()  # Erase footer window.
-        pair = self.pair(self.footer_fg, self.footer_bg)
-        self.footer.addnstr(0, 0, question.ljust(self.board_width - 1),
-                            self.footer.getmaxyx()[1] - 2,
-                            pair | curses.A_BLINK)
-        self.footer.refresh()
-        answer = self.footer.getch()
-        self.footer.nodelay(True)  # Back to "nodelay" mode.
-        return answer
-
-    def get_key_pressed(self, menu_text):
-        # Print menu_text on footer and capture a key IF pressed.
-        pair = self.pair(self.header_fg, self.header_bg2)
+                            pair)
+        self.footer.noutrefresh()
 
-        # curses.flushinp()  # Throw away any typeahead not yet processed.
+    def draw_menu(self, menu_text):
+        # Print menu_text on footer.
         self.footer.erase()  # Erase footer window.
         pair = self.pair(self.footer_fg, self.footer_bg)
         self.footer.addnstr(0, 0, menu_text.center(self.board_width - 1),
                             self.footer.getmaxyx()[1] - 2,
                             pair)
-        self.footer.refresh()
-        answer = self.footer.getch()
-        return answer
+        self.footer.noutrefresh()
+
+    def wait_for_keys(self, timeout):
+        # Sleep until some input arrives on stdin or 'timeout' seconds pass
+        # (None to wait forever), without busy-waiting.
+        # Return the list of keys pressed (possibly empty).
+        if timeout is None or timeout > 0:
+            self.input_selector.select(timeout)
+        keys = []
+        key = self.footer.getch()  # In "nodelay" mode: -1 when no more keys.
+        while key != -1:
+            keys.append(key)
+            key = self.footer.getch()
+        return keys
+
+    def handle_keys(self, keys):
+        # Process user's keyboard input, either on UI or on world's settings.
+        # Return whether the user asked to quit.
+        user_break = False
+        for key in keys:
+            if key == curses.KEY_RESIZE:
+                self.handle_resize()
+            elif self.target_text is not None:
+                self.type_target(key)
+            elif self.fast_forward is not None:
+                self.stop_fast_forward()
+            elif key in [ord('Q'), ord('q')] and self.world.paused:
+                user_break = True
+            else:
+                self.process_key_stroke(key)
+        return user_break
+
+    def process_key_stroke(self, key):
+        # Process user's keyboard input on world's settings:
+        #   - Left / right key to control simulation speed.
+        #   - Down key to run one single step.
+        #   - Space to pause simulation.
+        #   - Tab to change tracked_agent (without resuming a halted simulation).
+        #   - Comma / period to go back / forth through the latest steps (pausing).
+        #   - F to fast-forward to some step (asked for on the footer).
+        #   - Any other key resumes the simulation (back to live, if rewinding).
+        if key in [ord(','), ord('<')] and self.history is not None:
+            self.rewind(-1)
+            return
+        elif key in [ord('.'), ord('>')] and self.history is not None:
+            self.rewind(1)
+            return
+        elif self.rewind_step is not None and key not in [-1, ord(' '), ord('\t')]:
+            self.end_rewind()
+        world = self.world
+        if key in [ord('F'), ord('f')] and self.scheduler is not None:
+            # Ask for the target (the world waits meanwhile).
+            world.paused = True
+            world.step_by_step = False
+            self.target_text = ""
+            return
+
+        if key == -1:  # No key pressed.
+            pass
+        elif key in [KEY_LEFT, KEY_SLEFT]:  # Slow down speed.
+            world.update_fps(fps_factor=0.5)
+            world.paused = False
+            world.step_by_step = False
+        elif key in [KEY_RIGHT, KEY_SRIGHT]:  # Faster speed.
+            world.update_fps(fps_factor=2.0)
+            world.paused = False
+            world.step_by_step = False
+        elif key in [KEY_UP]:  # Go full speed!
+            world.update_fps(fps_factor=None)
+            world.paused = False
+            world.step_by_step = False
+        elif key in [KEY_DOWN]:  # Go step-by-step.
+            world.paused = False
+            world.step_by_step = True
+            world.step_requested = True
+        elif key == ord(' '):  # Pause the world.
+            world.paused = True
+            world.step_by_step = False
+        elif key == ord('\t'):  # Track a different agent.
+            world.track_next_agent()
+        else:
+            world.paused = False
+            world.step_by_step = False
+
+    def rewind(self, offset):
+        # Draw the step kept 'offset' steps away from the one drawn (back if
+        # negative), pausing the live world. Going past the latest step kept
+        # returns to the live world.
+        steps = self.history.steps()
+        if self.rewind_step is None:
+            index = len(steps) - 1
+        else:
+            index = max(bisect.bisect_right(steps, self.rewind_step) - 1, 0)
+        index = max(index + offset, 0)
+        if index >= len(steps) - 1:
+            if self.rewind_step is not None:
+                self.end_rewind()
+            return
+        self.live_world.paused = True
+        self.live_world.step_by_step = False
+        slot = self.world.tracked_agent.slot if self.world.tracked_agent is not None else None
+        self.world = self.history.view(steps[index])
+        self.rewind_step = steps[index]
+        # Keep tracking the same agent, if it's there.
+        for agent in self.world.agents:
+            if agent.slot == slot:
+                self.world.tracked_agent = agent
+                break
+
+    def end_rewind(self):
+        # Back to drawing the live world.
+        self.world = self.live_world
+        self.rewind_step = None
+
+    def type_target(self, key):
+        # Edit the fast-forward target being typed: Enter starts fast-forwarding
+        # (if valid), Esc cancels.
+        if key in KEYS_ENTER:
+            target = parse_target(self.target_text, self.live_world)
+            self.target_text = None
+            if target is not None:
+                self.fast_forward = (self.live_world.steps,) + target
+        elif key == KEY_ESC:
+            self.target_text = None
+        elif key in KEYS_BACKSPACE:
+            self.target_text = self.target_text[:-1]
+        elif 0 <= key < 256 and chr(key) in "0123456789+sS.,_":
+            self.target_text += chr(key)
+
+    def fast_forwarding(self):
+        # Return whether the fast-forward under way (if any) is still short of
+        # its target, otherwise it's over, leaving the world paused there.
+        if self.fast_forward is None:
+            return False
+        world = self.live_world
+        _, target_step, target_time = self.fast_forward
+        if world.is_end_loop() or (target_step is not None and world.steps >= target_step) or (
+                target_time is not None and world.time_run >= target_time):
+            self.stop_fast_forward()
+            return False
+        return True
+
+    def stop_fast_forward(self):
+        # Back to normal drawing, paused (either at target or cancelled by user).
+        self.fast_forward = None
+        self.live_world.paused = True
+        self.live_world.step_by_step = False
+
+    def draw_progress(self):
+        # Show the progress of a fast-forward (only header and footer).
+        world = self.live_world
+        start_step, target_step, target_time = self.fast_forward
+        if target_step is not None:
+            progress = (world.steps - start_step) / max(target_step - start_step, 1)
+            target = "{:,}".format(target_step)
+        else:
+            progress = world.time_run / target_time if target_time > 0 else 1
+            target = "{}".format(datetime.timedelta(seconds=round(target_time)))
+        filled = int(round(min(max(progress, 0), 1) * self.progress_width))
+        bar = "█" * filled + "░" * (self.progress_width - filled)
+        self.draw_header2(">>", self.pair(self.header_fg, self.header_bg3))
+        self.draw_menu("{} {:,} → {} (any key to stop)".format(bar, world.steps, target))
+        curses.doupdate()
+
+    def handle_resize(self):
+        # Terminal was resized: repaint everything on next draw().
+        curses.update_lines_cols()
+        self.stdscr.clear()
+        self.stdscr.noutrefresh()
+        for window in (self.header, self.board, self.footer, self.tracker):
+            window.touchwin()
 
     def draw_board(self):
-        # Update board state.
+        # Update board state: one atlas lookup per tile.
         x_tracked, y_tracked = self.world.tracked_agent.position
+        things = self.world.things
+        blocks_bitmap = self.world.blocks_bitmap
+        static_codes = self.static_codes
+        x_step = 1 + self.spc_len  # X axis must follow specific spacing.
 
         for y in range(self.world.height - 1, -1, -1):
-            x_screen = 0
+            y_screen = self.world.height - y - 1
+            highlight_row = y_tracked - 1 <= y <= y_tracked + 1
             for x in range(self.world.width):
-                thing = self.world.things[x, y]
-                if thing is None:
-                    # Emtpy TILE here. May be highlighted.
-                    tile = self.world.ground[x, y]
-                    text = tile.aspect + self.spc_str
-                    if (x_tracked - 1 <= x <= x_tracked + 1) and (y_tracked - 1 <= y <= y_tracked + 1):
-                        # Hightlight tile (contiguous to tracked agent).
-                        color, intensity, blink = WHITE, BRIGHT, curses.A_BLINK
-                    else:
-                        # Regular tile.
-                        color, intensity, blink = tile.color, tile.intensity, curses.A_NORMAL
-                    pair = self.pair(color + intensity, self.world.bg_color + self.world.bg_intensity)
-                    self.board.addstr(self.world.height - y - 1, x_screen, text, pair | blink)
+                thing = things[x, y]
+                if thing is None or blocks_bitmap[x, y]:
+                    # Emtpy TILE (may be highlighted, if contiguous to tracked agent) or a BLOCK.
+                    code = static_codes[x, y]
+                    if thing is None and highlight_row and x_tracked - 1 <= x <= x_tracked + 1:
+                        code += TILE_HIGHLIGHT - TILE
                 else:
-                    # Some AGENT/BLOCK here.
-                    if thing in self.world.blocks:
-                        # A BLOCK:
-                        t_aspect = thing.aspect
-                        if t_aspect[0] == " ":  # Generic full block style.
-                            pair = self.pair(thing.color + thing.intensity, thing.color + thing.intensity)
-                        else:
-                            pair = self.pair(thing.color + thing.intensity,
-                                             self.world.bg_color + self.world.bg_intensity)
-                        # Display the block.
-                        self.board.addstr(self.world.height - y - 1, x_screen, t_aspect, pair | curses.A_BOLD)
-                    else:
-                        # An AGENT:
-                        if thing.current_energy_delta > 0:
-                            # Highlight energy increase.
-                            pair = self.pair(thing.color + BRIGHT,
-                                             thing.color + NORMAL)
-                        elif thing.current_energy_delta < thing.acceptable_energy_drop:
-                            # Highlight huge energy drop.
-                            pair = self.pair(ENERGY_DROP_COLOR + BRIGHT,
-                                             ENERGY_DROP_COLOR + NORMAL)
-                        else:
-                            # Otherwise, use agent's and world's regular color/intensity.
-                            pair = self.pair(thing.color + thing.intensity,
-                                             self.world.bg_color + self.world.bg_intensity)
-                        if 0 < thing.energy < thing.max_energy * LOW_ENERGY_THRESHOLD:
-                            pair = pair | curses.A_BLINK
-                        # Display the agent and the required blanks right after.
-                        self.board.addstr(self.world.height - y - 1, x_screen, thing.aspect, pair | curses.A_BOLD)
-                        pair = self.pair(thing.color + thing.intensity, self.world.bg_color + self.world.bg_intensity)
-                        self.board.addstr(self.spc_str, pair)
-                x_screen += 1 + self.spc_len  # X axis must follow specific spacing.
+                    # An AGENT.
+                    code = self.agent_code(thing)
+                segments = self.atlas[code] or self.glyph(code)
+                self.board.move(y_screen, x * x_step)
+                for text, attr in segments:
+                    self.board.addstr(text, attr)
         self.board.noutrefresh()
 
     def draw_tracker(self):
@@ -341,7 +593,7 @@ class UI:
         red_color_pair = self.pair(RED, self.tracker_bg)
         bright_red_color_pair = self.pair(RED + BRIGHT, self.tracker_bg)
         tracked_agent = self.world.tracked_agent
-        agent_color_pair = self.pair(tracked_agent.color + tracked_agent.intensity, self.tracker_bg)
+        aspect, agent_color_pair = self.tracker_glyph(tracked_agent)
 
         # Clean up and draw a fresh Box.
         self.tracker.erase()
@@ -352,7 +604,7 @@ class UI:
 
         # Tracked agent: header.
         self.tracker.addstr(0, 1, "[ ", fg_bright_color_pair)
-        self.tracker.addstr(tracked_agent.aspect, agent_color_pair | curses.A_BOLD)
+        self.tracker.addstr(aspect, agent_color_pair | curses.A_BOLD)
         self.tracker.addstr(" {} ".format(tracked_agent.name[:self.name_length]), fg_bright_color_pair | curses.A_BOLD)
         energy_percent = round(100 * tracked_agent.energy / tracked_agent.max_energy)
         n_blocks = 5
@@ -407,17 +659,26 @@ class UI:
         self.tracker.addstr("{}".format('[]'), fg_bright_color_pair)
         self.tracker.addstr(9, 2, "{:<14}".format('Message:'), fg_color_pair)
         self.tracker.addstr("{}".format('[]'), fg_bright_color_pair)
-        self.tracker.addstr(10, 2, "{:<14}".format('Explored:'), fg_color_pair)
-        self.tracker.addstr("{}".format('-'), fg_bright_color_pair)
-        self.tracker.addstr(11, 2, "{:<14}".format('Plc_holdr:'), fg_color_pair)
-        self.tracker.addstr("{}".format('-'), fg_bright_color_pair)
+        self.tracker.addstr(10, 2, "{:<14}".format('Path:'), fg_color_pair)
+        if self.world.trajectories is not None:
+            path = self.world.trajectories.path_icons(tracked_agent.slot)[-self.path_length:]
+        else:
+            path = ""
+        self.tracker.addstr("{}".format(path or '-'), fg_bright_color_pair)
+        self.tracker.addstr(11, 2, "{:<14}".format('Timing:'), fg_color_pair)
+        if self.scheduler is not None and self.scheduler.achieved_fps() is not None:
+            timing = "{:,.1f} fps ±{:.0f}ms".format(self.scheduler.achieved_fps(),
+                                                    1000 * self.scheduler.jitter())
+        else:
+            timing = "-"
+        self.tracker.addstr("{}".format(timing), fg_bright_color_pair)
 
         # Rest of Things (agents, blocks?).
         self.tracker.addstr(2, self.tracking_right_column, " Top Agents     Energy ", fg_bright_color_pair | curses.A_REVERSE)
         y = 3  # Initial line.
-        agents_list = self.world.agents
+        agents_list = itertools.chain(self.world.active, self.world.dead)  # Living ones by energy, then the dead.
         for agent in filter(lambda a: a.action is not None, agents_list):
-            agent_color_pair = self.pair(agent.color + agent.intensity, self.tracker_bg)
+            aspect, agent_color_pair = self.tracker_glyph(agent)
             if agent == tracked_agent:
                 prefix = "▶ "
                 pair = fg_bright_color_pair | curses.A_BOLD
@@ -425,7 +686,7 @@ class UI:
                 prefix = "  "
                 pair = fg_color_pair
             self.tracker.addstr(y, self.tracking_right_column, prefix, fg_bright_color_pair)
-            self.tracker.addstr(agent.aspect, agent_color_pair)
+            self.tracker.addstr(aspect, agent_color_pair)
             self.tracker.addstr(" {:<11}".format(agent.name[:self.name_length]), pair)
             if agent.energy > agent.max_energy * LOW_ENERGY_THRESHOLD:
                 pair = fg_bright_color_pair
@@ -453,14 +714,18 @@ class UI:
 
     def draw(self):
         # Generate and display a full refresh of the world state using curses lib.
-        # Then check for user's input.
+        # It never waits for user's input (see wait_for_keys()).
 
-        # Erase screen first.
+        # Bring passive agents' energy up to date, then erase screen.
+        self.world.materialize_passive()
         self.stdscr.erase()
 
         # HEADER: Title on top + status.
         self.draw_header()
-        self.draw_header2("LIVE", self.pair(self.header_fg, self.header_bg2))
+        if self.rewind_step is not None:
+            self.draw_header2("REWIND", self.pair(self.header_fg, self.header_bg3))
+        else:
+            self.draw_header2("LIVE", self.pair(self.header_fg, self.header_bg2))
 
         # BOARD: Update world representation.
         self.draw_board()
@@ -468,27 +733,48 @@ class UI:
         # TRACKER: Update current state of the world.
         self.draw_tracker()
 
-        # FOOTER:
-        if self.world.paused:
-            # Ask user whether to go on.
-            answer = self.ask(" Press to continue... (Q to quit) ")
-            user_break = answer in ["Q", "q"]
-            self.world.paused = False
+        # FOOTER: Show options available (input is handled by handle_keys()).
+        if self.target_text is not None:
+            self.draw_prompt(" Fast-forward to step (+N, Ns): {}_ ".format(self.target_text))
+        elif self.rewind_step is not None:
+            steps = self.history.steps()
+            self.draw_menu("Step {:,} of {:,}..{:,} Back(,) Forth(.) Live(any)".format(
+                self.rewind_step, steps[0], steps[-1]))
+        elif self.world.paused:
+            self.draw_prompt(" Press to continue... (Q to quit) ", blink=True)
         elif self.world.step_by_step:
-            # Check for next step or back to normal play.
-            key = self.ask_key(" Press to continue... (▼ for step) ")
-            self.world.process_key_stroke(key)
-            user_break = False
+            self.draw_prompt(" Press to continue... (▼ for step) ", blink=True)
+        elif self.history is not None:
+            self.draw_menu("Stop(SPC) Speed(◀ ▲ ▼ ▶) Select(TAB) Rewind(,) FFwd(F)")
         else:
-            # Update keyboard options at bottom. Get keyboard input.
-            key = self.get_key_pressed("Stop(SPC) Speed(◀ ▲ ▼ ▶) Select(TAB)")
-            self.world.process_key_stroke(key)
-            user_break = False
+            self.draw_menu("Stop(SPC) Speed(◀ ▲ ▼ ▶) Select(TAB)")
 
         # Refresh screen.
         curses.doupdate()
 
-        return user_break
+
+###############################################################
+# FUNCTIONS
+
+def parse_target(text, world):
+    # Return the fast-forward target typed by the user as (step, time_run),
+    # one of them None: a step number, or simulated seconds with an 's'
+    # suffix; relative to the current ones with a '+' prefix.
+    # Return None if not valid, or not ahead of the world.
+    text = text.strip().replace(",", "").replace("_", "").lower()
+    relative = text.startswith("+")
+    in_seconds = text.endswith("s")
+    try:
+        value = float(text.strip("+s"))
+    except ValueError:
+        return None
+    if in_seconds:
+        target = (None, world.time_run * relative + value)
+        ahead = target[1] > world.time_run
+    else:
+        target = (world.steps * relative + int(value), None)
+        ahead = target[0] > world.steps
+    return target if ahead else None
 
 
 ###############################################################
@@ -0,0 +1,84 @@
+###############################################################
+# Lil' ASCII Lab
+# Viewer attaching to a world shared or streamed by another process
+# (e.g. "python lal.py --headless"), drawn with the regular UI.
+
+###############################################################
+
+# Libraries.
+from curses import wrapper
+import argparse
+import time
+
+# Modules.
+import world as w
+import shared
+import stream
+import ui
+
+VIEWER_SPF = 0.05  # Seconds between checks for new frames.
+
+
+def viewer_loop(stdscr, reader, world):
+    '''
+    :param stdscr: standard screen created by curses' wrapper.
+    :param reader: a shared.Reader (or stream.Receiver) following the world being run.
+    :param world: the mirror world on which frames are applied.
+    :return: (nothing).
+    '''
+
+    # Initialize UI. Pausing here only freezes this viewer's display.
+    u_i = ui.UI(stdscr, world)
+    world.paused = world.step_by_step = False
+
+    end_loop = False
+    while not end_loop:
+        # Display the world as of latest frame read.
+        u_i.draw()
+
+        # Wait for user's input till next check for frames.
+        user_break = u_i.handle_keys(u_i.wait_for_keys(VIEWER_SPF))
+
+        # Follow the simulation (never waiting for it).
+        if not world.paused and reader.is_new():
+            frame = reader.read()
+            if frame is not None:
+                shared.apply_frame(world, frame)
+                if frame.ended:
+                    world.aux_msg = "Simulation ended."
+                    world.paused = True
+        end_loop = user_break
+
+
+if __name__ == '__main__':
+    # Main program.
+    parser = argparse.ArgumentParser(description="Lil' ASCII Lab viewer")
+    parser.add_argument("name", nargs="?", default=shared.SHARED_NAME,
+                        help="name of the shared world (default: %(default)s)")
+    parser.add_argument("--stream", metavar="ADDRESS",
+                        help="follow a world streamed on a socket instead (a path, or host:port)")
+    args = parser.parse_args()
+    time_0 = time.ctime()  # Start time.
+
+    # Attach to the shared (or streamed) world and rebuild it locally.
+    if args.stream:
+        reader = stream.Receiver(args.stream)
+    else:
+        reader = shared.Reader(args.name)
+    frame = reader.read()
+    if frame is None:
+        reader.close()
+        parser.exit(1, "No frame could be read from {} (is the world still being run?)\n".format(
+            args.stream or 'shared memory "{}"'.format(args.name)))
+    world = shared.mirror_world(frame)
+    try:
+        wrapper(viewer_loop, reader, world)
+    finally:
+        reader.close()
+
+    # Quit program.
+    print("Lil' ASCII Lab viewer v{}".format(w.VERSION))
+    print("{:<20}{}".format("- Started:", time_0))
+    print("{:<20}{}".format("- Ended:", time.ctime()))
+    print("{:<20}{:,}".format("- Steps viewed:", world.steps))
+    print("{:<20}{}".format("- Random seed used:", world.random_seed))
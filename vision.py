@@ -0,0 +1,190 @@
+###############################################################################
+# VISION
+# Line-of-sight for "Lil' ASCII Lab"'s agents...
+###############################################################################
+
+# Libraries.
+import numpy as np
+from collections import namedtuple, OrderedDict
+
+# Modules.
+pass
+
+###############################################################################
+# CONSTANTS
+
+# Multipliers transforming octant-local (dx, dy) into window coordinates.
+OCTANTS = (
+    (1, 0, 0, -1), (0, 1, -1, 0), (0, -1, -1, 0), (-1, 0, 0, -1),
+    (-1, 0, 0, 1), (0, -1, 1, 0), (0, 1, 1, 0), (1, 0, 0, 1)
+)
+
+# What an agent perceives through its sight, as local maps of
+# (2 * radius + 1) x (2 * radius + 1) tiles centered on the agent.
+Visual_field = namedtuple("Visual_field", [
+    'energy_map',  # Energy on visible tiles (0 elsewhere).
+    'occupation_bitmap',  # Occupation of visible tiles (occupied elsewhere).
+    'visible',  # Boolean map of visible tiles.
+    'origin',  # World coordinates of the window's [0, 0] tile.
+    'position'  # Agent's coordinates on the window, i.e. [radius, radius].
+])
+
+MAX_STATIC_MASKS = 20000  # Static masks cached (least recently used ones go first).
+
+# Shadows cast by one single occluder, per radius (see single_shadows()).
+_single_shadows = {}
+
+###############################################################################
+# Auxiliary functions
+
+
+def shadowcast(opaque, radius):
+    # Return the boolean map of tiles visible from the center of the
+    # (2 * radius + 1)^2 'opaque' window (recursive shadowcasting).
+    # Opaque tiles are visible themselves, but hide what lies behind them.
+    size = 2 * radius + 1
+    visible = np.zeros((size, size), dtype=bool)
+    visible[radius, radius] = True
+    for xx, xy, yx, yy in OCTANTS:
+        _cast_light(opaque, visible, radius, 1, 1.0, 0.0, xx, xy, yx, yy)
+    return visible
+
+
+def _cast_light(opaque, visible, radius, row, start, end, xx, xy, yx, yy):
+    # Light one octant from 'row' on, between slopes 'start' and 'end'.
+    if start < end:
+        return
+    radius_squared = (radius + 0.5) ** 2
+    new_start = start
+    for j in range(row, radius + 1):
+        dx, dy = -j - 1, -j
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            x = radius + dx * xx + dy * xy
+            y = radius + dx * yx + dy * yy
+            l_slope = (dx - 0.5) / (dy + 0.5)
+            r_slope = (dx + 0.5) / (dy - 0.5)
+            if start < r_slope:
+                continue
+            elif end > l_slope:
+                break
+            if dx * dx + dy * dy < radius_squared:
+                visible[x, y] = True
+            if blocked:
+                if opaque[x, y]:
+                    new_start = r_slope
+                else:
+                    blocked = False
+                    start = new_start
+            elif opaque[x, y] and j < radius:
+                # Start of a shadow: light the rest of the octant beyond it.
+                blocked = True
+                _cast_light(opaque, visible, radius, j + 1, start, l_slope, xx, xy, yx, yy)
+                new_start = r_slope
+        if blocked:
+            break
+
+
+def single_shadows(radius):
+    # Return a (size, size, size, size) boolean table where [ox, oy] maps the
+    # tiles hidden by a single occluder at window coordinates (ox, oy).
+    # Computed once per radius.
+    if radius not in _single_shadows:
+        size = 2 * radius + 1
+        opaque = np.zeros((size, size), dtype=bool)
+        open_field = shadowcast(opaque, radius)
+        shadows = np.zeros((size, size, size, size), dtype=bool)
+        for ox in range(size):
+            for oy in range(size):
+                if (ox, oy) != (radius, radius):
+                    opaque[ox, oy] = True
+                    shadows[ox, oy] = open_field & ~shadowcast(opaque, radius)
+                    opaque[ox, oy] = False
+        _single_shadows[radius] = shadows
+    return _single_shadows[radius]
+
+
+def window(grid, position, radius, fill):
+    # Return a copy of the (2 * radius + 1)^2 area of 'grid' centered on
+    # 'position', using 'fill' for off-board tiles.
+    x0, y0 = position
+    width, height = grid.shape
+    result = np.full((2 * radius + 1, 2 * radius + 1), fill, dtype=grid.dtype)
+    x_min, x_max = max(0, x0 - radius), min(width, x0 + radius + 1)
+    y_min, y_max = max(0, y0 - radius), min(height, y0 + radius + 1)
+    result[x_min - x0 + radius:x_max - x0 + radius,
+           y_min - y0 + radius:y_max - y0 + radius] = grid[x_min:x_max, y_min:y_max]
+    return result
+
+
+def onboard(shape, position, radius):
+    # Return the boolean (2 * radius + 1)^2 window centered on 'position'
+    # flagging tiles within a world of the given shape.
+    x0, y0 = position
+    width, height = shape
+    result = np.zeros((2 * radius + 1, 2 * radius + 1), dtype=bool)
+    result[max(0, radius - x0):min(2 * radius + 1, width - x0 + radius),
+           max(0, radius - y0):min(2 * radius + 1, height - y0 + radius)] = True
+    return result
+
+###############################################################################
+
+
+class Visibility:
+    # Fields of view over a world whose static occluders (blocks) never move.
+    # Masks for static geometry are cached per tile and radius (up to
+    # 'max_masks', so that memory doesn't grow with the area explored);
+    # dynamic occluders (agents) are applied on top through precomputed shadows.
+    def __init__(self, opaque, max_masks=MAX_STATIC_MASKS):
+        self.opaque = opaque  # Boolean grid of static occluders.
+        self.static_masks = OrderedDict()  # (x, y, radius) -> boolean window, least recently used first.
+        self.max_masks = max_masks
+
+    def static_field(self, position, radius):
+        # Return the (cached) boolean window visible from 'position' when
+        # only static occluders are considered.
+        key = (position[0], position[1], radius)
+        mask = self.static_masks.get(key)
+        if mask is None:
+            # Off-board tiles are opaque and never visible.
+            opaque = window(self.opaque, position, radius, True)
+            mask = shadowcast(opaque, radius) & onboard(self.opaque.shape, position, radius)
+            self.static_masks[key] = mask
+            if len(self.static_masks) > self.max_masks:
+                self.static_masks.popitem(last=False)
+        else:
+            self.static_masks.move_to_end(key)
+        return mask
+
+    def clear(self):
+        # Forget all static masks (e.g. after blocks change).
+        self.static_masks.clear()
+
+    def field(self, position, radius, occluders=None):
+        # Return the boolean window visible from 'position', with 'occluders'
+        # as the boolean window of moving occluders around it (if any).
+        visible = self.static_field(position, radius)
+        if occluders is not None:
+            occluders = occluders & visible  # Hidden occluders cast no new shadows.
+            occluders[radius, radius] = False  # The viewer itself.
+            if occluders.any():
+                hidden = single_shadows(radius)[occluders].any(axis=0)
+                visible = visible & ~hidden
+        return visible
+
+    def visual_field(self, position, radius, energy_map, occupation_bitmap, occupied=0):
+        # Return the Visual_field perceived from 'position', where any
+        # occupied tile without a block (i.e. an agent) is a moving occluder.
+        occupation = window(occupation_bitmap, position, radius, occupied)
+        occluders = (occupation == occupied) & ~window(self.opaque, position, radius, True)
+        visible = self.field(position, radius, occluders)
+        energy = window(energy_map, position, radius, 0) * visible
+        occupation[~visible] = occupied
+        return Visual_field(
+            energy,
+            occupation,
+            visible,
+            [position[0] - radius, position[1] - radius],
+            [radius, radius]
+        )
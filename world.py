@@ -6,13 +6,23 @@
 
 # Libraries.
 import numpy as np
+import heapq
+import itertools
+import math
 import random
 import time
+from collections import deque
 
 # Modules.
 import things
 import act
-import ui
+import trajectory
+import vision
+import grid
+import worldgen
+import food
+import style
+import zobrist
 
 
 # World definition:
@@ -21,13 +31,20 @@ WORLD_DEF = dict(
     name="Random Blox",  # Descriptive string.
     width=30,  # Defining coordinate x from 0 to width - 1
     height=20,  # Defining coordinate y from 0 to height - 1
-    bg_color=ui.BLACK,  # background color (see ui.py module).
-    bg_intensity=ui.NORMAL,  # background intensity (see ui.py module).
+    bg_color=style.BLACK,  # background color (see style.py module).
+    bg_intensity=style.NORMAL,  # background intensity (see style.py module).
     n_blocks_rnd=0.4,  # % of +/- randomness in number of blocks [0, 1]
     max_steps=None,  # How long to run the world ('None' for infinite loop).
     fps=5,  # Frames-Per-Second, i.e. number of time steps run per second.
     initial_pause=True,  # Initiates world in 'pause' mode.
     random_seed=None,  # Seed for reproducible runs (None for random).
+    trajectory_length=32,  # Number of latest steps kept per agent (None to disable).
+    step_mode="sequential",  # How agents' actions are resolved (SEQUENTIAL or SIMULTANEOUS).
+    dead_lifetime=None,  # Steps dead (non-respawnable) agents stay on the board (None: forever; 0: removed at once).
+    respawn_candidates=1,  # Random free tiles a respawn takes the least crowded of (1: just a random one), see find_quiet_tile().
+    steady_state=None,  # What to do on reaching a steady state (None to go on, STOP or PAUSE; see check_steady_state(); states are only hashed when set).
+    steady_window=500,  # Steps only revisiting latest states for the world to be deemed steady.
+    energy_quantum=1.0,  # Energy resolution of the state hash (see zobrist.py).
 )
 
 # Simulation definition:
@@ -37,14 +54,25 @@ Simulation_def = dict(
     tile=things.TILE_DEF,  # The tiles it will contain.
     blocks=things.BLOCKS_DEF,  # The blocks to put in it.
     agents=things.AGENTS_DEF,  # The agents who will live in it.
+    layout=None,  # Procedural layout of blocks laid before agents, instead of 'blocks' (see worldgen.Layout_def), or None.
+    food=None,  # Food growing on the ground, harvested by EATing on empty tiles (see food.Food_def), or None.
 )
 
 # Constants:
+VERSION = "0.1"  # Version of "Lil' ASCII Lab" (part of the key of cached results, see sweep.py).
 WORLD_DEFAULT_FPS = 5  # Fall-back world speed (in frames-per-second).
 WORLD_DEFAULT_SPF = 1 / WORLD_DEFAULT_FPS  # (the same in seconds-per-frame).
 
-OCCUPIED_TILE = 0  # Multiply to ZERO OUT values on maps.
-UNOCCUPIED_TILE = 1  # Multiply to KEEP values on maps.
+# Step modes:
+SEQUENTIAL = "sequential"  # Agents act one after another (by energy), seeing previous actions' results.
+SIMULTANEOUS = "simultaneous"  # All agents decide on the same snapshot; actions are resolved together.
+
+# Actions on a steady state:
+STOP = "stop"  # End the run.
+PAUSE = "pause"  # Halt the world: the UI stays idle till the user resumes (headless runs end).
+
+OCCUPIED_TILE = grid.OCCUPIED_TILE  # Multiply to ZERO OUT values on maps.
+UNOCCUPIED_TILE = grid.UNOCCUPIED_TILE  # Multiply to KEEP values on maps.
 
 ###############################################################
 
@@ -53,10 +81,13 @@ class World:
     # A tiled, rectangular setting on which a little universe takes life.
     def __init__(self, Simulation_def):
         # Create a world from the definitions given.
+        self.simulation_def = Simulation_def  # (E.g. to rebuild it, see shared.mirror_world()).
         world_def = Simulation_def["world"]
         tile_def = Simulation_def["tile"]
         blocks_def = Simulation_def["blocks"]
         agents_def = Simulation_def["agents"]
+        layout_def = Simulation_def.get("layout")
+        self.food_def = Simulation_def.get("food")
 
         # Assign values from w_def.
         self.name = world_def["name"]
@@ -66,11 +97,17 @@ class World:
         self.bg_intensity = world_def["bg_intensity"]
         self.n_blocks_rnd = world_def["n_blocks_rnd"]
         self.max_steps = world_def["max_steps"]
+        self.step_mode = world_def.get("step_mode", SEQUENTIAL)
+        self.dead_lifetime = world_def.get("dead_lifetime")
+        self.respawn_candidates = world_def.get("respawn_candidates", 1)
+        self.steady_state = world_def.get("steady_state")
+        self.steady_window = world_def.get("steady_window", WORLD_DEF["steady_window"])
 
         # Time and speed settings.
         self.initialize_fps(world_def["fps"])
         self.paused = world_def["initial_pause"]  # Whether the user has paused simulation.
         self.step_by_step = world_def["initial_pause"]  # Whether the user has activated step-by-step.
+        self.step_requested = False  # Whether the user asked for one more step (in step-by-step).
         self.creation_time = time.time
 
         # Initialize world: randomness, steps and list of 'things' on it.
@@ -81,13 +118,19 @@ class World:
         random.seed(seed)
 
         self.steps = 0
+        self.time_run = 0.0  # Simulated seconds, as per the speed each step was run at.
         # A grid for agents and blocks [references].
         self.things = np.full((self.width, self.height), None)
         # A grid tracking energy [floats] on each tile.
         self.energy_map = np.zeros((self.width, self.height))
-        # A grid tracking occupation [1 / 0] of each tile.
+        # A grid tracking occupation [1 / 0, uint8] of each tile.
         self.occupation_bitmap = np.full(
-            (self.width, self.height), UNOCCUPIED_TILE)
+            (self.width, self.height), UNOCCUPIED_TILE, dtype=np.uint8)
+        # Neighbour masks [uint8] of each tile (see grid.py), kept up to date
+        # on every change, so that adjacent moves and bites are table lookups:
+        self.free_masks = grid.NeighbourMasks(self.width, self.height)  # Free neighbours.
+        self.free_masks.reset(self.occupation_bitmap == UNOCCUPIED_TILE)
+        self.energy_masks = grid.NeighbourMasks(self.width, self.height)  # Neighbours with energy.
 
         # Put TILES on the ground.
         self.ground = np.full((self.width, self.height), None)  # Fill in the basis of the world.
@@ -97,32 +140,62 @@ class World:
                 tile = things.Tile(tile_def)
                 self.ground[x, y] = tile
 
-        # Put AGENTS in the world.
+        # A grid flagging tiles with blocks [bool], i.e. static occluders.
+        self.blocks_bitmap = np.zeros((self.width, self.height), dtype=bool)
+        self.blocks = []
+        self.visibility = None  # Lines of sight (created once blocks are in, see below).
+
+        # Lay out a procedural pattern of BLOCKS, if defined (all free tiles connected).
+        if layout_def is not None:
+            rng = np.random.RandomState(random.getrandbits(32))
+            mask = worldgen.generate(layout_def, self.width, self.height, rng)
+            self.place_blocks(things.Block(layout_def.thing_settings), mask)
+
+        # Preallocate agents' trajectories (fixed memory regardless of steps run).
+        n_agents = sum(a_def.n_instances for a_def in agents_def)
+        if world_def["trajectory_length"]:
+            self.trajectories = trajectory.Trajectories(n_agents, world_def["trajectory_length"])
+        else:
+            self.trajectories = None
+
+        # Put AGENTS in the world (from a pool recycling them, see spawn()).
+        self.pool = things.AgentPool(n_agents)
         self.agents = []  # List of all types of agent in the world.
+        # Agents by state (updated on transitions, so that steps only go over the active ones):
+        self.active = []  # Agents with a mind and alive (or respawnable), sorted by energy after each step.
+        self.passive = []  # Mindless agents (e.g. resources), only acted upon.
+        self.dead = {}  # Dead agents that won't respawn -> step they died on (in order of death).
+        self.just_died = []  # Agents that died on latest step (whose energy deltas are yet to be reset).
+        self.just_respawned = []  # Agents that died and respawned on latest step.
+        # Passive agents' step costs are applied lazily (see materialize()):
+        self.touched = {}  # Passive agents whose energy was changed by others on this step.
+        self.rescheduled = []  # Passive agents whose lazy drain was (re)started on this step.
+        self.lazy_events = []  # Heap of (step, slot) on which passive agents hit 0 or their max energy.
+        self.lazy_rate = 0  # Sum of passive agents' drains.
+        self.lazy_offset = 0  # Sum of passive agents' drain * last_update_step.
+        # (energy_map keeps passive agents' energy_at_step.)
         self.tracked_agent = None  # The agent to track during simulation.
+        self.spawn_counts = {}  # Number of agents spawned per name (for their suffixes).
+        self.population_changes = 0  # Number of spawns and despawns so far (i.e. changes of slots in use).
+        self.deaths = {}  # Number of deaths per kind of agent (respawnable ones included).
+        self.respawns = {}  # Number of respawns per kind of agent.
+        # State hash (agents' kinds, positions and energies), updated on every change (see rehash()),
+        # but only while 'hashing': when steady states are acted upon, or since a digest was asked for:
+        self.state_hash = zobrist.StateHash(self.height, world_def.get("energy_quantum", WORLD_DEF["energy_quantum"]))
+        self.hashing = self.steady_state is not None
+        self.digests = {}  # State hash -> latest step on which it was seen (within steady_window).
+        self.digest_steps = deque()  # (State hash, step) of the latest steps, oldest first.
+        self.repeats = 0  # Number of consecutive steps revisiting a latest state.
+        self.steady = None  # Why the world is steady (None if it's not).
         for a_def in agents_def:  # Loop over the types of agent defined.
             for i in range(a_def.n_instances):  # Create the number of instances specified.
-                # Create agent as defined, defining now its suffix.
-                if a_def.n_instances == 1:  # Check if it's a single instance.
-                    agent_suffix = None
-                else:
-                    agent_suffix = i
-                agent = things.Agent(
-                    a_def.thing_settings,
-                    a_def.energy_settings,
-                    a_def.ai_settings,
-                    agent_suffix
-                    )
                 # Put agent in the world on requested position, relocating on colisions (on failure, Agent is ignored).
-                success = self.place_at(agent, agent.position, relocate=True)
-                if success:
-                    # Update agents list and tracked_agent (only the first time).
-                    self.agents.append(agent)
-                    if self.tracked_agent is None:
-                        self.tracked_agent = agent
-
-        # Put in some BLOCKS.
-        self.blocks = []
+                _ = self.spawn(a_def, a_def.thing_settings.initial_position, relocate=True)
+
+        # Put in some BLOCKS (unless laid out: random ones could cut off free
+        # tiles of the layout, which must stay all connected).
+        if layout_def is not None:
+            blocks_def = ()
         for b_def in blocks_def:  # List of all types of block in the world.
             if (b_def.n_instances is None):
                 # Unspecified number of blocks; base on width.
@@ -139,6 +212,19 @@ class World:
                 self.blocks.append(block)
                 n += 1
 
+        # Lines of sight (cached, since blocks never move).
+        self.visibility = vision.Visibility(self.blocks_bitmap)
+        # A grid with food [floats] on each tile, if any grows (not on blocks).
+        self.fertile_bitmap = ~self.blocks_bitmap
+        if self.food_def is not None:
+            self.food_map = food.create(self.food_def, self.fertile_bitmap)
+        else:
+            self.food_map = None
+        # Distance fields towards energy, shared by all agents within a step.
+        self.energy_fields = {}
+        # Whole-map occupancy queries (free neighbours, frontier, crowding), idem.
+        self.occupancy_maps = {}
+
         # Final settings.
         self.total_energy = self.energy_map.sum()  # Total from all agents.
         self.aux_msg = ""
@@ -184,17 +270,9 @@ class World:
             self.spf = 1 / self.fps
 
     def seconds_run(self):
-        # Return the number of seconds run in world's time based on spf(seconds per frame).
-        # Assumptions:
-        # - Since speed can vary at user's request, original_spf is assumed.
-        # - And if original_fps was None, WORLD_DEFAULT_SPF us assumed.
-
-        if self.original_spf is not None:
-            referential_spf = self.original_spf
-        else:
-            referential_spf = WORLD_DEFAULT_SPF
-
-        return (self.steps * referential_spf) // 1
+        # Return the number of (whole) seconds run in world's time, i.e. the
+        # sum of the durations of all steps at the speed they were run.
+        return self.time_run // 1
 
     def place_at(self, thing, position=things.RANDOM_POSITION, relocate=False):
         # Put "things" in the world, updating the thing and
@@ -225,31 +303,269 @@ class World:
             if thing.position != things.RANDOM_POSITION:
                 # The Thing was already in the world; clear out old place.
                 self.things[thing.position[0], thing.position[1]] = None
-                self.energy_map[thing.position[0], thing.position[1]] = 0
-                self.occupation_bitmap[
-                    thing.position[0], thing.position[1]
-                    ] = UNOCCUPIED_TILE
+                self.set_energy(thing.position, 0)
+                self.set_occupation(thing.position, UNOCCUPIED_TILE)
 
             self.things[position[0], position[1]] = thing
             if type(thing) is things.Agent:
-                self.energy_map[position[0], position[1]] = thing.energy
-            self.occupation_bitmap[
-                position[0], position[1]
-                ] = OCCUPIED_TILE
+                self.set_energy(position, thing.energy)
+            elif type(thing) is things.Block:
+                self.blocks_bitmap[position[0], position[1]] = True
+                if self.visibility is not None:
+                    self.visibility.clear()  # Cached lines of sight may be blocked now.
+            self.set_occupation(position, OCCUPIED_TILE)
             thing.position = position
+            if type(thing) is things.Agent:
+                self.rehash(thing)
 
         return success
 
+    def spawn(self, agent_def, position=things.RANDOM_POSITION, relocate=False):
+        # Put a new agent as per 'agent_def' in the world, on 'position' (or a
+        # random free tile), relocating it if occupied and allowed by 'relocate'.
+        # Despawned agents are recycled, with their slots and buffers.
+        # Meant to be called between steps (or from post_step).
+        # Result: the agent, or None if there was no room for it.
+        name = agent_def.thing_settings.name
+        count = self.spawn_counts.get(name, 0)
+        self.spawn_counts[name] = count + 1
+        if agent_def.n_instances == 1 and count == 0:  # Check if it's a single instance.
+            agent_suffix = None
+        else:
+            agent_suffix = count
+
+        agent = self.pool.acquire(agent_def, agent_suffix)
+        agent.position = things.RANDOM_POSITION  # Not on the board yet.
+        if not self.place_at(agent, position, relocate):
+            self.pool.release(agent)
+            return None
+
+        # Update agents lists, its history and tracked_agent (only the first time).
+        self.agents.append(agent)
+        self.population_changes += 1
+        agent.last_update_step = self.steps
+        self.enlist(agent)
+        if self.trajectories is not None:
+            self.trajectories.reserve(self.pool.capacity())
+            self.trajectories.reset(agent.slot)
+        if self.tracked_agent is None:
+            self.tracked_agent = agent
+
+        return agent
+
+    def despawn(self, *agents):
+        # Take agents out of the world and back to the pool, for later spawns
+        # (any number at once, in a single pass over the list of agents).
+        # Meant to be called between steps (or from post_step).
+        for agent in agents:
+            self.unschedule(agent)
+            if agent.position != things.RANDOM_POSITION:
+                x, y = agent.position
+                self.things[x, y] = None
+                self.set_energy(agent.position, 0)
+                self.set_occupation(agent.position, UNOCCUPIED_TILE)
+                agent.position = things.RANDOM_POSITION
+                self.rehash(agent)
+            self.pool.release(agent)
+
+        despawned = set(agents)
+        self.population_changes += len(despawned)
+        self.agents[:] = [agent for agent in self.agents if agent not in despawned]
+        self.active[:] = [agent for agent in self.active if agent not in despawned]
+        self.passive[:] = [agent for agent in self.passive if agent not in despawned]
+        self.just_died[:] = [agent for agent in self.just_died if agent not in despawned]
+        self.just_respawned[:] = [agent for agent in self.just_respawned if agent not in despawned]
+        self.rescheduled[:] = [agent for agent in self.rescheduled if agent not in despawned]
+        for agent in agents:
+            self.dead.pop(agent, None)
+            self.touched.pop(agent, None)
+        if self.tracked_agent in despawned:
+            self.tracked_agent = self.agents[0] if self.agents else None
+
+    def enlist(self, agent):
+        # Add an agent to its set as per its state (active, passive or dead).
+        # Only NON_RECHARGEABLE agents are ever dead: drained RECHARGEABLE
+        # ones wait in their sets to be recharged.
+        if agent.energy <= 0 and agent.recycling == things.NON_RECHARGEABLE:
+            self.dead[agent] = self.steps
+        elif agent.action is None:
+            self.passive.append(agent)
+            self.schedule(agent)
+        else:
+            self.active.append(agent)
+
+    def update_agent_sets(self):
+        # Rebuild the sets of agents from scratch (e.g. after the state of
+        # all agents was overwritten, as on mirror worlds).
+        self.active, self.passive, self.dead, self.just_died, self.just_respawned = [], [], {}, [], []
+        self.touched, self.rescheduled, self.lazy_events, self.lazy_rate, self.lazy_offset = {}, [], [], 0, 0
+        for agent in self.agents:
+            agent.drain, agent.last_update_step = 0, self.steps
+            self.enlist(agent)
+        self.active.sort(key=lambda x: x.energy, reverse=True)
+        if self.hashing:
+            self.state_hash.reset(self.agents)
+
+    def materialize(self, agent):
+        # Bring a passive agent's energy up to date. Its step_cost is not paid
+        # on every step, but applied in closed form when its energy is needed
+        # (i.e. when bitten, drawn or summed), from its energy_at_step on
+        # (which is only changed by schedule(), so any number of calls give
+        # the same result; its steps are counted by schedule() too).
+        agent.energy = max(min(
+            agent.energy_at_step + agent.drain * (self.steps - agent.last_update_step),
+            agent.max_energy), 0)
+        if agent.energy <= 0:
+            agent.color, agent.intensity = style.DEAD_AGENT_COLOR
+
+    def materialize_passive(self):
+        # Bring all passive agents' energy up to date (e.g. to draw them).
+        for agent in self.passive:
+            self.materialize(agent)
+
+    def unschedule(self, agent):
+        # Stop the lazy drain of a passive agent.
+        self.lazy_rate -= agent.drain
+        self.lazy_offset -= agent.drain * agent.last_update_step
+        agent.drain = 0
+        agent.event_step = None
+
+    def schedule(self, agent):
+        # (Re)start the lazy drain of a passive agent from its current energy,
+        # as per its step_cost, till the step on which it hits 0 or its max
+        # energy (handled then by post_step, see lazy_events).
+        self.unschedule(agent)
+        agent.steps += self.steps - agent.last_update_step
+        agent.energy_at_step = agent.energy
+        agent.last_update_step = self.steps
+        self.rescheduled.append(agent)
+        if agent.position != things.RANDOM_POSITION:
+            self.set_energy(agent.position, agent.energy)
+            self.rehash(agent)
+        step_cost = agent.step_cost
+        if agent.recycling == things.EVERLASTING or step_cost == 0 or (step_cost < 0 and agent.energy <= 0):
+            return
+        if step_cost < 0:
+            steps_left = math.ceil(agent.energy / -step_cost)
+        elif agent.energy <= 0:
+            steps_left = 1  # Drained but recharging: checked on next step (see post_step).
+        elif agent.energy < agent.max_energy:
+            steps_left = math.ceil((agent.max_energy - agent.energy) / step_cost)
+        else:
+            return
+        agent.drain = step_cost
+        agent.event_step = agent.last_update_step + max(steps_left, 1)
+        self.lazy_rate += agent.drain
+        self.lazy_offset += agent.drain * agent.last_update_step
+        heapq.heappush(self.lazy_events, (agent.event_step, agent.slot))
+
+    def harvest(self, agent, position):
+        # Take food from the tile on 'position' (up to the agent's bite_power);
+        # return the amount taken.
+        x, y = position
+        if self.food_map is None or not ((0 <= x < self.width) and (0 <= y < self.height)):
+            return 0
+        food_taken = min(agent.bite_power, self.food_map[x, y])
+        self.food_map[x, y] -= food_taken
+        return food_taken
+
+    def living_energy(self):
+        # Return the sum of all agents' energy (passive ones in closed form).
+        return (sum(a.energy for a in self.active) + sum(a.energy_at_step for a in self.passive)
+                + self.steps * self.lazy_rate - self.lazy_offset)
+
+    def place_blocks(self, block, mask):
+        # Put one same block on all free tiles flagged in the boolean 'mask',
+        # in bulk (the block stands for all of them and keeps no position).
+        mask = mask & (self.occupation_bitmap == UNOCCUPIED_TILE)
+        self.things[mask] = block
+        self.occupation_bitmap[mask] = OCCUPIED_TILE
+        self.blocks_bitmap[mask] = True
+        self.blocks.append(block)
+        self.update_masks()
+        if self.visibility is not None:
+            self.visibility.clear()  # Cached lines of sight may be blocked now.
+
+    def set_occupation(self, position, occupation):
+        # Mark a tile as occupied or not (keeping free_masks up to date).
+        free = occupation == UNOCCUPIED_TILE
+        if self.free_masks.is_flagged(position) != free:
+            self.free_masks.flag(position, free)
+        self.occupation_bitmap[position[0], position[1]] = occupation
+
+    def set_energy(self, position, energy):
+        # Put the energy of a tile (keeping energy_masks up to date).
+        positive = energy > 0
+        if self.energy_masks.is_flagged(position) != positive:
+            self.energy_masks.flag(position, positive)
+        self.energy_map[position[0], position[1]] = energy
+
+    def update_masks(self):
+        # Recompute all neighbour masks from the grids, e.g. after bulk changes.
+        self.free_masks.reset(self.occupation_bitmap == UNOCCUPIED_TILE)
+        self.energy_masks.reset(self.energy_map > 0)
+
     def update_agent_energy(self, agent, energy_delta, energy_source_position=None):
         # Execute agent's method to update its 'energy' state and then
         # the world's internal status (self.energy_map).
+        passive = agent.action is None
+        if passive:
+            self.materialize(agent)
         energy_taken = agent.update_energy(
             energy_delta,
             energy_source_position)
-        self.energy_map[agent.position[0], agent.position[1]] = agent.energy
+        self.set_energy(agent.position, agent.energy)
+        if passive:
+            self.schedule(agent)
+            self.touched[agent] = None
+        else:
+            self.rehash(agent)
 
         return energy_taken
 
+    def energy_field(self, ignore=None):
+        # Return a grid with the distance (in moves over free tiles) from each
+        # tile to the closest agent with some energy, skipping agents whose
+        # action function is 'ignore' (e.g. the one asking, so that it is not
+        # attracted by itself or its peers).
+        # Computed once per step and shared by any number of agents.
+        field = self.energy_fields.get(ignore)
+        if field is None:
+            sources = self.energy_map > 0
+            if ignore is not None:
+                for agent in self.active:
+                    if agent.action is ignore and agent.position != things.RANDOM_POSITION:
+                        sources[agent.position[0], agent.position[1]] = False
+            field = grid.distance_field(sources, self.occupation_bitmap == UNOCCUPIED_TILE)
+            self.energy_fields[ignore] = field
+        return field
+
+    def free_neighbours(self):
+        # Return a uint8 grid with the number of free neighbours of each tile
+        # (a table lookup on free_masks). Computed once per step.
+        counts = self.occupancy_maps.get("free_neighbours")
+        if counts is None:
+            counts = self.occupancy_maps["free_neighbours"] = grid.MASK_COUNTS[self.free_masks.masks]
+        return counts
+
+    def frontier(self):
+        # Return the boolean grid of free tiles next to some occupied one
+        # (agent or block). Computed once per step.
+        tiles = self.occupancy_maps.get("frontier")
+        if tiles is None:
+            tiles = self.occupancy_maps["frontier"] = grid.frontier(self.occupation_bitmap == UNOCCUPIED_TILE)
+        return tiles
+
+    def crowding(self, radius=2):
+        # Return a float32 grid with the ratio of tiles with an agent within
+        # 'radius' of each tile (blocks aside). Computed once per step.
+        key = ("crowding", radius)
+        ratios = self.occupancy_maps.get(key)
+        if ratios is None:
+            agents = (self.occupation_bitmap == OCCUPIED_TILE) & ~self.blocks_bitmap
+            ratios = self.occupancy_maps[key] = grid.density(agents, radius)
+        return ratios
+
     def tile_is_empty(self, position):
         # Check if a given position exists within world's limits and is free.
         x, y = position
@@ -278,19 +594,36 @@ class World:
         y = random.randint(0, self.height - 1)
         found = self.tile_is_empty([x, y])
 
-        x0, y0 = x, y  # Starting position to search from.
         success = True
-        while not found and success:
-            x = (x + 1) % self.width  # Increment x not exceeding width.
-            if x == 0:  # When x is back to 0, increment y not exceeding height.
-                y = (y + 1) % self.height
-            if self.tile_is_empty([x, y]):  # Check "success" condition.
-                found = True
-            elif (x, y) == (x0, y0):  # Failed if loop over the world is complete.
+        if not found:
+            # Then, the next free one scanning rows (x first, then y) from
+            # there, wrapping around: one pass over the occupancy grid.
+            free = np.flatnonzero(self.occupation_bitmap.T == UNOCCUPIED_TILE)
+            if len(free) > 0:
+                start = y * self.width + x
+                i = free[np.searchsorted(free, start) % len(free)]
+                x, y = int(i % self.width), int(i // self.width)
+            else:
                 success = False
 
         return [x, y], success
 
+    def find_quiet_tile(self, n_candidates):
+        # Return the least crowded of 'n_candidates' random free tiles (the one
+        # with most free neighbours, on ties), as per crowding() as of its
+        # first call on this step (i.e. not seeing agents placed since).
+        # Result: a position, or RANDOM_POSITION if no tile is free.
+        crowding, free_neighbours = self.crowding(), self.free_neighbours()
+        best, best_score = things.RANDOM_POSITION, None
+        for _ in range(n_candidates):
+            (x, y), success = self.find_free_tile()
+            if not success:
+                break
+            score = (crowding[x, y], -int(free_neighbours[x, y]))
+            if best_score is None or score < best_score:
+                best, best_score = [x, y], score
+        return best
+
     def get_adjacent_empty_tiles(self, position):  # TODO: Allow x4 adjacence.
         # Return a list with all adjacent empty tiles, respecting world's borders.
         x0, y0 = position
@@ -303,63 +636,316 @@ class World:
 
         return tiles
 
-    def step(self):
+    def step(self, dt=None):
+        # Run one step of the world, lasting 'dt' seconds of simulated time
+        # (current spf by default, or WORLD_DEFAULT_SPF when at full-speed).
+        if dt is None:
+            dt = self.spf if self.spf is not None else WORLD_DEFAULT_SPF
+
         # Prepare world's info for step.
         self.pre_step()
 
         # Run step over all "living and acting" agents.
-        for agent in filter(lambda a:
-                            a.energy > 0 and a.action is not None,
-                            self.agents):
-            # Request action from agent based on world state.
-            action = agent.choose_action(world=self)
-            # Try to execute action.
-            success, energy_delta = self.execute_action(agent, action)
-            # Update agent's internal information.
-            agent.update_after_action(success)
+        acting_agents = [a for a in self.active if a.energy > 0]
+        if self.step_mode == SIMULTANEOUS:
+            # All agents choose their actions on the same snapshot, then
+            # actions are resolved.
+            for agent in acting_agents:
+                agent.choose_action(world=self)
+            codes = np.array([agent.action_code for agent in acting_agents], dtype=np.int64)
+            self.resolve_simultaneous(acting_agents, codes)
+        else:
+            for agent in acting_agents:
+                # Request action from agent based on world state.
+                agent.choose_action(world=self)
+                # Try to execute action.
+                success, energy_delta = self.execute_action(agent, agent.action_code)
+                # Update agent's internal information.
+                self.after_action(agent, success, energy_delta)
 
         # Update the world's info after step.
         self.post_step()
+        self.time_run += dt
+
+    def after_action(self, agent, success, energy_delta, reset_touch_maps=True):
+        # Update agent's internal information and keep track of its latest steps.
+        agent.update_after_action(success, reset_touch_maps)
+        if self.trajectories is not None:
+            self.trajectories.record(
+                agent.slot, self.steps, agent.position,
+                agent.action_code, energy_delta, success)
+
+    def resolve_simultaneous(self, agents, codes):
+        # Resolve together the actions all agents chose on the same
+        # snapshot of the world, given as an array of action codes (see act.py):
+        #   1. Step and move costs are paid by all.
+        #   2. Bites: each prey loses at most its energy, shared among its
+        #      biters in proportion to their bite_power (and likewise, the
+        #      food on empty tiles, if any).
+        #   3. Moves: only onto tiles free in the snapshot; conflicts on a
+        #      target tile are settled by a seeded random priority.
+        n = len(agents)
+        if n == 0:
+            return
+        verbs = act.ACTION_VERBS[codes]
+
+        positions = np.array([agent.position for agent in agents])
+        targets = positions + act.ACTION_DELTAS[codes]
+        on_board = ((targets[:, 0] >= 0) & (targets[:, 0] < self.width) &
+                    (targets[:, 1] >= 0) & (targets[:, 1] < self.height))
+        targets = np.where(on_board[:, None], targets, 0)
+        # Actions not affordable fail (as in execute_action()).
+        move_costs = np.array([agent.move_cost for agent in agents])
+        ratios = act.ENERGY_RATIOS[codes]
+        affordable = ~(move_costs * ratios > np.array([agent.energy for agent in agents]))
+        wants_move = verbs == act.VERB_MOVE
+        wants_eat = verbs == act.VERB_EAT
+        is_move = wants_move & on_board & affordable
+        is_eat = wants_eat & on_board & affordable
+
+        # Moves: legal targets on snapshot, then one winner per target tile.
+        legal = is_move & (self.occupation_bitmap[targets[:, 0], targets[:, 1]] == UNOCCUPIED_TILE)
+        movers = np.nonzero(legal)[0]
+        priority = np.random.RandomState(random.getrandbits(32)).permutation(n)
+        target_keys = targets[movers, 0] * self.height + targets[movers, 1]
+        order = np.lexsort((priority[movers], target_keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = target_keys[order][1:] != target_keys[order][:-1]
+        move_wins = np.zeros(n, dtype=bool)
+        move_wins[movers[order[first]]] = True
+
+        # Bites: preys on snapshot (agents only, not blocks).
+        preys = [self.things[x, y] if is_eat[i] else None for i, (x, y) in enumerate(targets.tolist())]
+        is_harvest = is_eat & np.array([prey is None for prey in preys]) & (self.food_map is not None)
+        is_eat &= np.array([isinstance(prey, things.Agent) for prey in preys])
+
+        # 1. Costs.
+        action_deltas = np.where(affordable & (move_wins | ~wants_move), move_costs * ratios, 0)
+        energy_deltas = action_deltas + np.array([agent.step_cost for agent in agents])
+        for agent, energy_delta in zip(agents, energy_deltas.tolist()):
+            self.update_agent_energy(agent, energy_delta)
+            # From here on, touch maps gather what others do to the agent.
+            agent.reset_touch_maps()
+
+        # 2. Bites.
+        eaters = np.nonzero(is_eat)[0]
+        bites_taken = np.zeros(n)
+        if len(eaters) > 0:
+            prey_ids = {}
+            prey_index = np.array([prey_ids.setdefault(id(preys[i]), len(prey_ids)) for i in eaters])
+            prey_list = [None] * len(prey_ids)
+            for i in eaters:
+                prey_list[prey_ids[id(preys[i])]] = preys[i]
+            demands = np.array([agents[i].bite_power for i in eaters], dtype=float)
+            total_demands = np.bincount(prey_index, weights=demands)
+            for prey in prey_list:
+                if prey.action is None:
+                    self.materialize(prey)
+            prey_energies = np.array([prey.energy if prey.recycling != things.EVERLASTING else np.inf
+                                      for prey in prey_list])
+            losses = np.minimum(total_demands, prey_energies)
+            shares = np.where(total_demands[prey_index] > 0,
+                              demands * losses[prey_index] / np.maximum(total_demands[prey_index], 1e-12), 0)
+            for i, share in zip(eaters.tolist(), shares.tolist()):
+                eater, prey = agents[i], preys[i]
+                energy_taken = self.update_agent_energy(prey, -share, eater.position)
+                bites_taken[i] = -energy_taken
+                self.update_agent_energy(eater, -energy_taken, prey.position)
+
+        # 2b. Harvests: food on empty tiles, shared among its eaters in
+        # proportion to their bite_power.
+        harvesters = np.nonzero(is_harvest)[0]
+        if len(harvesters) > 0:
+            tiles, tile_index = np.unique(targets[harvesters, 0] * self.height + targets[harvesters, 1],
+                                          return_inverse=True)
+            demands = np.array([agents[i].bite_power for i in harvesters], dtype=float)
+            total_demands = np.bincount(tile_index, weights=demands)
+            losses = np.minimum(total_demands, self.food_map[tiles // self.height, tiles % self.height])
+            self.food_map[tiles // self.height, tiles % self.height] -= losses
+            shares = np.where(total_demands[tile_index] > 0,
+                              demands * losses[tile_index] / np.maximum(total_demands[tile_index], 1e-12), 0)
+            for i, share in zip(harvesters.tolist(), shares.tolist()):
+                self.update_agent_energy(agents[i], share, targets[i].tolist())
+                bites_taken[i] = share
+        energy_deltas += bites_taken
+
+        # 3. Moves (agents emptied by bites stay put).
+        for i in np.nonzero(move_wins)[0]:
+            if agents[i].energy > 0:
+                self.place_at(agents[i], targets[i].tolist())
+            else:
+                move_wins[i] = False
+
+        # Update agents' internal information.
+        success = np.where(wants_move, move_wins, np.where(wants_eat, bites_taken > 0, affordable))
+        for i, agent in enumerate(agents):
+            self.after_action(agent, bool(success[i]), energy_deltas[i],
+                              reset_touch_maps=False)
 
     def pre_step(self):
         # Prepare world's info before actually running core step() functionality.
 
-        # Reset agents' step variables.
-        for agent in self.agents:
+        # Reset agents' step variables (passive and dead ones only after
+        # their energy changed).
+        for agent in self.active:
             agent.pre_step()
+        for agent in self.touched:
+            agent.pre_step()
+        self.touched.clear()
+        for agent in self.just_died:
+            agent.pre_step()
+        self.just_died.clear()
+        self.just_respawned.clear()
+        self.rescheduled.clear()
 
-        # TODO: Generate new energy in the world?
-        pass
+        # Forget distance fields and occupancy maps from previous step.
+        self.energy_fields.clear()
+        self.occupancy_maps.clear()
 
-        # TODO: Remove long-dead non-RECHARGEABLE agents.
-        pass
+        # Generate new energy in the world (if there's food).
+        if self.food_map is not None:
+            food.grow(self.food_map, self.food_def, self.fertile_bitmap)
 
     def post_step(self):
         # Execute actions after a world's step (and before 'respawns').
-        self.total_energy = self.energy_map.sum()
-        assert np.isclose(self.total_energy, sum(a.energy for a in self.agents)), \
-            "Total energy mismatch ({}) between world.energy_map and agents.".format(self.total_energy - sum(a.energy for a in self.agents))
-
-        # Call all agents' post_step() here.
-        for agent in self.agents:
+        self.total_energy = self.energy_map.sum() + self.steps * self.lazy_rate - self.lazy_offset
+        assert np.isclose(self.total_energy, self.living_energy()), \
+            "Total energy mismatch ({}) between world.energy_map and agents.".format(
+                self.total_energy - self.living_energy())
+
+        # Passive agents to be checked: those acted upon, and those whose
+        # lazy energy hits a bound on this step.
+        passive_agents = list(self.touched)
+        while self.lazy_events and self.lazy_events[0][0] <= self.steps:
+            step, slot = heapq.heappop(self.lazy_events)
+            agent = self.pool.agents[slot]
+            if agent.event_step == step:
+                self.materialize(agent)
+                self.schedule(agent)
+                passive_agents.append(agent)
+
+        # Call all agents' post_step() here (but for the dead).
+        for agent in itertools.chain(self.active, passive_agents):
             if agent.energy <= 0 and agent.recycling == things.RESPAWNABLE:
                 # Respawn dead agent on new random place.
+                kind = agent.kind()
+                self.deaths[kind] = self.deaths.get(kind, 0) + 1
+                self.respawns[kind] = self.respawns.get(kind, 0) + 1
                 agent.respawn()
-                _ = self.place_at(agent)
-            else:
-                # Regular post_step()
+                agent.death_step = agent.respawn_step = self.steps + 1
+                self.just_respawned.append(agent)
+                if self.respawn_candidates > 1:
+                    _ = self.place_at(agent, self.find_quiet_tile(self.respawn_candidates), relocate=True)
+                else:
+                    _ = self.place_at(agent)
+                if agent.action is None:
+                    agent.last_update_step = self.steps
+                    self.schedule(agent)
+                if self.trajectories is not None:
+                    self.trajectories.reset(agent.slot)
+            elif agent.recycling == things.RECHARGEABLE:
+                # Drained agents stay in place (and in their sets) till they
+                # get energy again: both transitions are recorded as deaths
+                # and respawns (in place).
+                drained = agent.death_step is not None and (
+                    agent.respawn_step is None or agent.respawn_step < agent.death_step)
+                kind = agent.kind()
+                if agent.energy <= 0 and not drained:
+                    self.deaths[kind] = self.deaths.get(kind, 0) + 1
+                    agent.death_step = self.steps + 1
+                    self.just_died.append(agent)
+                elif agent.energy > 0 and drained:
+                    self.respawns[kind] = self.respawns.get(kind, 0) + 1
+                    agent.respawn_step = self.steps + 1
+                    agent.color, agent.intensity = agent.original_color, agent.original_intensity
+                    self.just_respawned.append(agent)
+                if agent.action is not None and (agent.energy > 0 or not drained):
+                    agent.post_step()
+            elif agent.energy <= 0 and agent.recycling == things.NON_RECHARGEABLE:
+                # Dead for good (NON_RECHARGEABLE): no more steps for it.
+                if agent not in self.dead:
+                    kind = agent.kind()
+                    self.deaths[kind] = self.deaths.get(kind, 0) + 1
+                    agent.post_step()
+                    self.dead[agent] = self.steps
+                    agent.death_step = self.steps + 1
+                    self.just_died.append(agent)
+            elif agent.action is not None:
+                # Regular post_step() (not needed by passive agents).
                 agent.post_step()
+        if self.just_died:
+            self.active[:] = [agent for agent in self.active if agent not in self.dead]
+            self.passive[:] = [agent for agent in self.passive if agent not in self.dead]
+
+        # Remove agents dead for longer than dead_lifetime (oldest first).
+        if self.dead_lifetime is not None:
+            expired = []
+            for agent, step in self.dead.items():
+                if self.steps - step < self.dead_lifetime:
+                    break
+                expired.append(agent)
+            if expired:
+                self.despawn(*expired)
 
         # Update rest of world's internal info.
-        self.agents.sort(key=lambda x: x.energy, reverse=True)
+        self.active.sort(key=lambda x: x.energy, reverse=True)
         self.steps += 1
+        self.step_requested = False
+        self.check_steady_state()
+
+    def rehash(self, agent):
+        # Update the state hash after an agent moved or its energy changed
+        # (two splitmix64 calls: skipped while no one needs the hash).
+        if self.hashing:
+            self.state_hash.update(agent)
+
+    def digest(self):
+        # Return the state hash as of latest step (e.g. to check that other
+        # code paths lead to the same states). The first call computes it
+        # from scratch, and has it kept up to date from then on.
+        if not self.hashing:
+            self.hashing = True
+            self.state_hash.reset(self.agents)
+        return self.state_hash.value
+
+    def check_steady_state(self):
+        # Check whether the world is steady: either no agent with a mind is
+        # alive, or its states (as per the state hash) have only been
+        # revisiting those of latest steps for 'steady_window' steps (i.e.
+        # stuck in a cycle). On becoming steady, act as per 'steady_state'.
+        # (Cycles are only looked for while hashing, see digest().)
+        if self.hashing:
+            digest = self.state_hash.value
+            self.repeats = self.repeats + 1 if digest in self.digests else 0
+            self.digests[digest] = self.steps
+            self.digest_steps.append((digest, self.steps))
+            if len(self.digest_steps) > self.steady_window:
+                old_digest, old_step = self.digest_steps.popleft()
+                if self.digests[old_digest] == old_step:
+                    del self.digests[old_digest]
+
+        if not self.active:
+            steady = "No agents with a mind alive."
+        elif self.repeats >= self.steady_window:
+            steady = "Steady: states repeating."
+        else:
+            steady = None
+        if steady is not None and self.steady is None and self.steady_state == PAUSE:
+            self.paused = True
+            self.step_by_step = False
+            self.aux_msg = steady
+        elif steady is None and self.steady is not None and self.aux_msg == self.steady:
+            self.aux_msg = ""
+        self.steady = steady
 
-    def execute_action(self, agent, action):
-        # Check if the action is feasible and execute it returning results.
+    def execute_action(self, agent, code):
+        # Check if the action with the given code (see act.py) is feasible
+        # and execute it returning results.
 
         # Initialize internal variables.
-        action_type, action_arguments = action
-        action_energy_ratio = act.ACTIONS_DEF[action_type].energy_ratio
+        verb = act.ACTION_VERBS.item(code)
+        action_arguments = act.ACTION_DELTAS[code]
+        action_energy_ratio = act.ENERGY_RATIOS.item(code)
 
         # Calculate energy cost IF action is actually made.
         action_delta = agent.move_cost * action_energy_ratio
@@ -373,13 +959,13 @@ class World:
             energy_delta = action_delta + agent.step_cost
             self.update_agent_energy(agent, energy_delta)
 
-        elif action_type == act.NONE:
+        elif verb == act.VERB_NONE:
             # Rest action.
             success = True
             energy_delta = action_delta + agent.step_cost
             self.update_agent_energy(agent, energy_delta)
 
-        elif action_type == act.MOVE:
+        elif verb == act.VERB_MOVE:
             # Update locations [try to], checking if destination tile is free.
             success = self.place_at(agent,
                                     [agent.position[0] + action_arguments[0],
@@ -391,13 +977,14 @@ class World:
             energy_delta = action_delta + agent.step_cost
             self.update_agent_energy(agent, energy_delta)
 
-        elif action_type == act.EAT:
+        elif verb == act.VERB_EAT:
             # Firstly, update energy spent in step for whichever result,
             # (allowing full replenishment).
             _ = self.update_agent_energy(agent, agent.step_cost) # Dropped energy is lost.
             
-            prey = self.things[agent.position[0] + action_arguments[0],
-                               agent.position[1] + action_arguments[1]]
+            target = [agent.position[0] + action_arguments[0],
+                      agent.position[1] + action_arguments[1]]
+            prey = self.things[target[0], target[1]]
             if prey is not None:
                 # Take energy from prey (limited by prey's energy).
                 # TODO: Limit to 'Agent' class (avoiding biting a 'Block')
@@ -413,6 +1000,12 @@ class World:
                     agent,
                     action_delta,
                     prey.position)
+            elif self.food_map is not None:
+                # Harvest food from the empty tile.
+                food_taken = self.harvest(agent, target)
+                action_delta += food_taken
+                success = food_taken > 0
+                _ = self.update_agent_energy(agent, food_taken, target)
             else:
                 success = False
                 action_delta = 0
@@ -420,60 +1013,33 @@ class World:
             energy_delta = action_delta + agent.step_cost
 
         else:
-            raise Exception('Invalid action type passed: {}.'.format(action_type))
+            raise Exception('Invalid action code passed: {}.'.format(code))
 
         return success, energy_delta
 
+    def is_running(self):
+        # Check if the simulation should go on stepping (as opposed to being
+        # halted by the user while the UI keeps on running).
+        return not self.paused and (not self.step_by_step or self.step_requested)
+
     def is_end_loop(self):
         # Check if the world's loop has come to an end.
         if self.max_steps is None:
             end = False
         else:
             end = self.steps >= self.max_steps
+        if self.steady is not None and self.steady_state == STOP:
+            end = True
 
         return end
 
-    def process_key_stroke(self, key):
-        # Process user's keyboard input:
-        #   - Left / right key to control simulation speed.
-        #   - Space to pause simulation.
-        #   - Tab to change tracked_agent.
-
-        if key == -1:  # No key pressed.
-            pass
-        elif key in [ui.KEY_LEFT, ui.KEY_SLEFT]:  # Slow down speed.
-            self.update_fps(fps_factor=0.5)
-            self.step_by_step = False
-        elif key in [ui.KEY_RIGHT, ui.KEY_SRIGHT]:  # Faster speed.
-            self.update_fps(fps_factor=2.0)
-            self.step_by_step = False
-        elif key in [ui.KEY_UP]:  # Go full speed!
-            self.update_fps(fps_factor=None)
-            self.step_by_step = False
-        elif key in [ui.KEY_DOWN]:  # Go step-by-step.
-            self.paused = False
-            self.step_by_step = True
-        elif key == ord(' '):  # Pause the world.
-            self.paused = True
-            self.step_by_step = False
-        elif key == ord('\t'):  # Track a different agent.
-            initial_idx = idx = self.agents.index(self.tracked_agent)
-            next_agent = None
-            end_search = False
-            while not end_search:
-                # Pick next index, and its corresponding agent.
-                if idx == len(self.agents) - 1:
-                    idx = 0
-                else:
-                    idx += 1
-                next_agent = self.agents[idx]
-                # Check if valid [alive and no void 'action'], or if full cycle is complete.
-                if (next_agent.action is not None and next_agent.energy > 0) or idx == initial_idx:
-                    end_search = True
-            self.tracked_agent = next_agent
-        else:
-            self.paused = False
-            self.step_by_step = False
+    def track_next_agent(self):
+        # Track next agent which is alive and acting (if any), by energy.
+        if self.tracked_agent in self.active:
+            idx = self.active.index(self.tracked_agent)
+            self.tracked_agent = self.active[(idx + 1) % len(self.active)]
+        elif self.active:
+            self.tracked_agent = self.active[0]
 
 
 ###############################################################
@@ -481,5 +1047,96 @@ class World:
 # (code for TESTING purposes only.)
 
 if __name__ == '__main__':
-    print("world.py is a module of Lil' ASCII Lab and has no real main module.")
-    _ = input("Press to exit...")
+    # Check that the simulation core imports fast and without curses, e.g.
+    # for headless runs (on a fresh interpreter).
+    import subprocess
+    import sys
+
+    IMPORT_TIME_BUDGET = 0.5  # Seconds.
+    CORE_MODULES = ("world", "things", "ai", "act")
+    code = ("import sys, time; t0 = time.perf_counter(); import {}; "
+            "print(time.perf_counter() - t0, 'curses' in sys.modules)").format(", ".join(CORE_MODULES))
+    output = subprocess.check_output([sys.executable, "-c", code]).decode().split()
+    import_time, curses_imported = float(output[0]), output[1] == "True"
+    print("Core import: {:.3f}s (budget: {}s); curses imported: {}".format(
+        import_time, IMPORT_TIME_BUDGET, curses_imported))
+    assert not curses_imported, "The simulation core must not import curses."
+    assert import_time <= IMPORT_TIME_BUDGET, "The simulation core takes too long to import."
+
+    # Check that agents churning (despawned and spawned by thousands) are
+    # recycled, keeping the world consistent and creating no new objects.
+    simulation_def = dict(Simulation_def)
+    simulation_def["world"] = dict(WORLD_DEF, width=120, height=80, random_seed=1)
+    world = World(simulation_def)
+    world.digest()  # (Keep the state hash from now on, to check it below.)
+    bug_def = [a_def for a_def in simulation_def["agents"] if a_def.thing_settings.name == "bug"][0]
+    for step in range(20):
+        if step % 2 == 0:
+            for _ in range(2000):
+                world.spawn(bug_def)
+        else:
+            world.despawn(*[a for a in world.agents if a.name.startswith("bug")][:2000])
+        if step == 1:
+            num_agents = things.Agent.num_agents
+        world.step()
+    print("Agents: {} in world, {} slots, {} created after warm-up.".format(
+        len(world.agents), world.pool.capacity(), things.Agent.num_agents - num_agents))
+    assert things.Agent.num_agents == num_agents, "Despawned agents should be recycled."
+    digest = world.digest()
+    assert digest == world.state_hash.reset(world.agents), "Incremental state hash went astray."
+    assert (world.free_masks.masks == grid.neighbour_masks(world.occupation_bitmap == UNOCCUPIED_TILE)).all() and \
+        (world.energy_masks.masks == grid.neighbour_masks(world.energy_map > 0)).all(), "Neighbour masks went astray."
+    assert (world.free_neighbours() == grid.neighbour_counts(world.occupation_bitmap == UNOCCUPIED_TILE)).all(), \
+        "Free neighbour counts went astray."
+    print("Occupancy: {:,} bytes ({:,} bit-packed), {:.0%} of free tiles on the frontier, crowding up to {:.0%}.".format(
+        world.occupation_bitmap.nbytes, grid.pack(world.occupation_bitmap).nbytes,
+        world.frontier().sum() / (world.occupation_bitmap == UNOCCUPIED_TILE).sum(), world.crowding().max()))
+
+    # Check that state hashes are kept right in both step modes, and that a
+    # world with no minds alive is found steady (and stopped).
+    for step_mode in (SEQUENTIAL, SIMULTANEOUS):
+        simulation_def["world"] = dict(WORLD_DEF, random_seed=1, step_mode=step_mode)
+        world = World(simulation_def)
+        for _ in range(300):
+            world.step()
+            assert world.digest() == world.state_hash.reset(world.agents), "Incremental state hash went astray."
+        print("{}: digest {:016x} after {} steps.".format(step_mode.capitalize(), world.digest(), world.steps))
+
+    # Check that respawns taking the least crowded of some free tiles land
+    # on quieter tiles than random ones (crowding measured after each step).
+    quietness = {}
+    for n_candidates in (1, 8):
+        simulation_def["world"] = dict(WORLD_DEF, random_seed=1, respawn_candidates=n_candidates)
+        world = World(simulation_def)
+        crowding = []
+        for _ in range(300):
+            world.step()
+            agents = (world.occupation_bitmap == OCCUPIED_TILE) & ~world.blocks_bitmap
+            crowding += [grid.density(agents, 2)[tuple(a.position)] for a in world.just_respawned]
+        quietness[n_candidates] = np.mean(crowding)
+    print("Respawn crowding: {:.1%} on random tiles, {:.1%} on the quietest of 8.".format(quietness[1], quietness[8]))
+    assert quietness[8] < quietness[1], "Respawns should land on quieter tiles."
+    simulation_def["world"] = dict(WORLD_DEF, random_seed=1, steady_state=STOP)
+    simulation_def["agents"] = tuple(a_def for a_def in Simulation_def["agents"] if a_def.ai_settings.action is None)
+    world = World(simulation_def)
+    while not world.is_end_loop():
+        world.step()
+    print("Mindless world stopped on step {}: {}".format(world.steps, world.steady))
+
+    # Check that drained RECHARGEABLE agents are kept (never dead), waiting
+    # to be recharged.
+    simulation_def["agents"] = tuple(
+        a_def._replace(energy_settings=a_def.energy_settings._replace(initial_energy=2, recycling_type=things.RECHARGEABLE))
+        if a_def.thing_settings.name == "bug" else a_def for a_def in Simulation_def["agents"])
+    simulation_def["world"] = dict(WORLD_DEF, random_seed=1)
+    world = World(simulation_def)
+    for _ in range(100):
+        world.step()
+    bugs = [a for a in world.agents if a.name.startswith("bug")]
+    drained = [a for a in bugs if a.energy <= 0]
+    print("Rechargeable bugs: {} of {} drained, {} dead, {} deaths recorded.".format(
+        len(drained), len(bugs), len(world.dead), world.deaths.get(bugs[0].kind(), 0)))
+    assert len(bugs) == 15 and not any(a in world.dead for a in bugs) and \
+        all(a in world.active or a in world.passive for a in bugs), "Drained RECHARGEABLE agents should be kept."
+    assert np.count_nonzero(world.occupation_bitmap == OCCUPIED_TILE) == \
+        np.count_nonzero(world.blocks_bitmap) + sum(a.position != things.RANDOM_POSITION for a in world.agents)
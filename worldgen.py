@@ -0,0 +1,223 @@
+###############################################################################
+# WORLDGEN
+# Procedural layouts of blocks for "Lil' ASCII Lab"'s worlds...
+#
+# A generator produces a whole boolean mask (True = block) in one pass of
+# NumPy operations. generate() then carves corridors so that every free
+# tile can be reached from any other one.
+###############################################################################
+
+# Libraries.
+import numpy as np
+from collections import namedtuple
+
+# Modules.
+import grid
+
+###############################################################################
+# LAYOUT:
+# Settings defining a procedural layout of blocks:
+
+Layout_def = namedtuple("Layout_def", [
+    'generator',  # Function generating the mask (e.g. worldgen.caves).
+    'density',  # Approximate ratio of tiles with blocks [0, 1].
+    'thing_settings'  # Settings of the blocks placed (see things.Thing_settings_def).
+])
+
+###############################################################################
+# Generators:
+#
+# - Input:
+#       - width, height: dimensions of the world.
+#       - density: approximate ratio of tiles to be covered by blocks.
+#       - rng: a numpy.random.RandomState.
+#
+# - Output: a boolean (width, height) mask, True on tiles with a block.
+###############################################################################
+
+
+def noise(width, height, density, rng, scale=8):
+    # Blobs from thresholding smooth value noise: random values on a coarse
+    # lattice (every 'scale' tiles), bilinearly interpolated.
+    lattice = rng.random_sample((width // scale + 2, height // scale + 2))
+    x = np.arange(width) / scale
+    y = np.arange(height) / scale
+    x0, y0 = x.astype(int), y.astype(int)
+    fx, fy = (x - x0)[:, None], (y - y0)[None, :]
+    field = (lattice[x0][:, y0] * (1 - fx) * (1 - fy) +
+             lattice[x0 + 1][:, y0] * fx * (1 - fy) +
+             lattice[x0][:, y0 + 1] * (1 - fx) * fy +
+             lattice[x0 + 1][:, y0 + 1] * fx * fy)
+    return field < np.percentile(field, 100 * density)
+
+
+def caves(width, height, density, rng, iterations=4):
+    # Cave-like blobs: random values averaged over 3x3 windows 'iterations'
+    # times (edges mirrored), then thresholded at the 'density' percentile so
+    # that the ratio of blocks is met.
+    field = rng.random_sample((width, height))
+    for _ in range(iterations):
+        padded = np.pad(field, 1, mode='reflect')
+        field = sum(padded[dx:dx + width, dy:dy + height] for dx in range(3) for dy in range(3)) / 9
+    return field > np.percentile(field, 100 * (1 - density))
+
+
+def rectangle_tiles(width, height, x0, x1, y0, y1):
+    # Return the coordinates (xs, ys) of the tiles within the rectangles
+    # [x0, x1) x [y0, y1), clipped to the world (tiles in several of them
+    # come more than once), enumerated for all rectangles at once.
+    x0, x1 = np.clip(x0, 0, width).astype(np.int32), np.clip(x1, 0, width).astype(np.int32)
+    y0, y1 = np.clip(y0, 0, height).astype(np.int32), np.clip(y1, 0, height).astype(np.int32)
+    sizes_y = np.maximum(y1 - y0, 0)
+    sizes = np.maximum(x1 - x0, 0) * sizes_y
+    # Index of each tile within its rectangle, in column-major order.
+    offsets = np.arange(sizes.sum(), dtype=np.int32) - np.repeat(np.cumsum(sizes, dtype=np.int32) - sizes, sizes)
+    sizes_y = np.repeat(sizes_y, sizes)
+    return np.repeat(x0, sizes) + offsets // sizes_y, np.repeat(y0, sizes) + offsets % sizes_y
+
+
+def rooms(width, height, density, rng, min_size=3, max_size=8, max_batches=100):
+    # Rectangular rooms joined in sequence by L-shaped corridors, carved out
+    # of a world full of blocks. Rooms are added in batches till free tiles
+    # reach (1 - density) of the world (or after 'max_batches', since
+    # overlapping rooms carve ever less as the world empties).
+    mask = np.ones((width, height), dtype=bool)
+    target = (1 - density) * width * height
+    previous_center = None
+    free = 0
+    batches = 0
+    while free < target and batches < max_batches:
+        batches += 1
+        # Enough rooms to reach the target if they didn't overlap.
+        n_rooms = 1 + int((target - free) // ((min_size + max_size) ** 2 / 4))
+        ws = rng.randint(min_size, max_size + 1, n_rooms)
+        hs = rng.randint(min_size, max_size + 1, n_rooms)
+        # (Rooms may reach the last row and column, clipped by the world.)
+        xs = rng.randint(0, max(1, width - min_size + 1), n_rooms)
+        ys = rng.randint(0, max(1, height - min_size + 1), n_rooms)
+        # Visit rooms strip by strip (alternating direction) for short corridors.
+        strips = ys // (2 * max_size)
+        order = np.lexsort((np.where(strips % 2 == 0, xs, -xs), strips))
+        xs, ys, ws, hs = xs[order], ys[order], ws[order], hs[order]
+        # Corridors from each room's center to the next one's: along x on the
+        # row of the lower one (in x, then y), then along y on its column.
+        centers_x = np.minimum(xs + ws // 2, width - 1)
+        centers_y = np.minimum(ys + hs // 2, height - 1)
+        if previous_center is None:
+            previous_center = (centers_x[0], centers_y[0])
+        from_x = np.concatenate(([previous_center[0]], centers_x[:-1]))
+        from_y = np.concatenate(([previous_center[1]], centers_y[:-1]))
+        previous_center = (centers_x[-1], centers_y[-1])
+        swap = (from_x > centers_x) | ((from_x == centers_x) & (from_y > centers_y))
+        x0, x1 = np.where(swap, centers_x, from_x), np.where(swap, from_x, centers_x)
+        y0, y1 = np.where(swap, centers_y, from_y), np.where(swap, from_y, centers_y)
+        # Carve rooms and corridors as rectangles [x0, x1) x [y0, y1) at once.
+        mask[rectangle_tiles(width, height,
+                             np.concatenate((xs, x0, x1)),
+                             np.concatenate((xs + ws, x1 + 1, x1 + 1)),
+                             np.concatenate((ys, y0, np.minimum(y0, y1))),
+                             np.concatenate((ys + hs, y0 + 1, np.maximum(y0, y1) + 1)))] = False
+        free = width * height - np.count_nonzero(mask)
+    return mask
+
+
+def maze(width, height, density, rng):
+    # A perfect maze (binary-tree algorithm): cells on even coordinates,
+    # each one opening a passage either north or east at random.
+    # ('density' is ignored: half the tiles, roughly, are walls.)
+    mask = np.ones((width, height), dtype=bool)
+    cells_x, cells_y = (width + 1) // 2, (height + 1) // 2
+    mask[0::2, 0::2] = False
+    north = rng.random_sample((cells_x, cells_y)) < 0.5
+    north[-1, :] = True  # Last column can only open north...
+    north[:, -1] = False  # ...and top row only east.
+    cx, cy = np.nonzero(north)
+    cx, cy = 2 * cx, 2 * cy + 1
+    ok = cy < height
+    mask[cx[ok], cy[ok]] = False
+    cx, cy = np.nonzero(~north)
+    cx, cy = 2 * cx + 1, 2 * cy
+    ok = cx < width
+    mask[cx[ok], cy[ok]] = False
+    return mask
+
+###############################################################################
+# Layout generation
+
+
+def connect(mask):
+    # Carve corridors through blocks so that all free tiles are reachable
+    # (8-adjacency), cutting few blocks (the density barely drops): every free
+    # region is grown over the blocks at once, the cheapest meeting point is
+    # kept for each pair of touching regions and a minimum spanning tree of
+    # those (Kruskal) is carved back to the regions.
+    labels = grid.label_components(~mask)
+    n_regions = labels.max() + 1
+    if n_regions <= 1:
+        return mask
+    owners, distances = grid.grow_labels(labels)
+    width, height = mask.shape
+    flat_owners, flat_distances = owners.ravel(), distances.ravel()
+    # Candidate corridors: pairs of adjacent tiles (x, y), (x + dx, y + dy)
+    # of different regions, costing the blocks to carve from both sides.
+    tiles, others = [], []
+    for dx, dy in ((1, -1), (1, 0), (1, 1), (0, 1)):
+        y0, y1 = max(0, -dy), height - max(0, dy)
+        x, y = np.nonzero(owners[:width - dx, y0:y1] != owners[dx:, y0 + dy:y1 + dy])
+        tiles.append(x * height + y + y0)
+        others.append(x * height + y + y0 + dx * height + dy)
+    tiles, others = np.concatenate(tiles), np.concatenate(others)
+    a, b = flat_owners[tiles], flat_owners[others]
+    pairs = np.minimum(a, b).astype(np.int64) * n_regions + np.maximum(a, b)
+    costs = flat_distances[tiles] + flat_distances[others]
+    # The cheapest candidate of each pair of regions, cheapest first.
+    order = np.argsort(pairs * (costs.max() + 1) + costs)
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pairs[order[1:]] != pairs[order[:-1]]
+    order = order[first]
+    order = order[np.argsort(costs[order], kind='mergesort')]
+    tiles, others = tiles[order], others[order]
+    parent = list(range(n_regions))
+
+    def root(region):
+        while parent[region] != region:
+            parent[region] = parent[parent[region]]
+            region = parent[region]
+        return region
+
+    chosen = []
+    for i, (a, b) in enumerate(zip(flat_owners[tiles].tolist(), flat_owners[others].tolist())):
+        a, b = root(a), root(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+            chosen.append(i)
+            if len(chosen) == n_regions - 1:
+                break
+    # Walk back from both ends of the chosen corridors to their regions at
+    # once, down the distances, carving the blocks on the way.
+    mask = mask.copy()
+    xs, ys = np.divmod(np.concatenate((tiles[chosen], others[chosen])), height)
+    while True:
+        away = distances[xs, ys] > 0
+        xs, ys = xs[away], ys[away]
+        if len(xs) == 0:
+            break
+        mask[xs, ys] = False
+        next_xs, next_ys = xs.copy(), ys.copy()
+        found = np.zeros(len(xs), dtype=bool)
+        for dx, dy in grid.NEIGHBOURS:
+            x, y = xs + dx, ys + dy
+            step = ~found & (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            step[step] = ((owners[x[step], y[step]] == owners[xs[step], ys[step]]) &
+                          (distances[x[step], y[step]] == distances[xs[step], ys[step]] - 1))
+            next_xs[step], next_ys[step] = x[step], y[step]
+            found |= step
+        xs, ys = next_xs, next_ys
+    return mask
+
+
+def generate(layout_def, width, height, rng):
+    # Return the boolean mask of blocks for the given Layout_def, with all
+    # its free tiles connected.
+    mask = layout_def.generator(width, height, layout_def.density, rng)
+    return connect(mask)
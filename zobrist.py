@@ -0,0 +1,68 @@
+###############################################################################
+# ZOBRIST
+# Incremental hashing of the state of "Lil' ASCII Lab"'s worlds...
+#
+# The state hash is the XOR of one 64-bit key per agent on the board, made
+# from its kind, its tile and its (quantized) energy. So it's updated in
+# O(1) whenever an agent moves or its energy changes: XOR out its old key,
+# XOR in the new one. Keys are mixed with splitmix64 instead of drawn from
+# tables, so no memory is taken per tile, and digests are the same on any
+# run or platform (unlike Python's hash()). Blocks never move: left out.
+###############################################################################
+
+# Libraries.
+import zlib
+
+# Modules.
+import things
+
+###############################################################################
+# CONSTANTS
+
+MASK_64 = (1 << 64) - 1
+
+###############################################################################
+
+
+def splitmix64(x):
+    # Return a well-mixed 64-bit value out of any 64-bit value.
+    x = (x + 0x9E3779B97F4A7C15) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return x ^ (x >> 31)
+
+
+class StateHash:
+    # Hash of the agents on a world's board (see World.rehash()).
+    def __init__(self, height, energy_quantum):
+        self.height = height
+        self.energy_quantum = energy_quantum  # Energy differences below this may go unnoticed.
+        self.value = 0
+        self.kind_codes = {}  # Agent's name -> code of its kind.
+
+    def key(self, agent):
+        # Return the key of an agent as it is now (0 if not on the board).
+        # Passive agents count with the energy their lazy drain started from.
+        if agent.position == things.RANDOM_POSITION:
+            return 0
+        code = self.kind_codes.get(agent.name)
+        if code is None:
+            code = self.kind_codes[agent.name] = zlib.crc32(agent.kind().encode())
+        x, y = agent.position
+        energy = agent.energy_at_step if agent.action is None else agent.energy
+        level = int(energy // self.energy_quantum)
+        return splitmix64(splitmix64((code << 32) | int(x * self.height + y)) ^ level)
+
+    def update(self, agent):
+        # Replace an agent's key by its current one.
+        key = self.key(agent)
+        self.value ^= agent.state_key ^ key
+        agent.state_key = key
+
+    def reset(self, agents):
+        # Recompute the hash from scratch (e.g. to check the incremental one).
+        self.value = 0
+        for agent in agents:
+            agent.state_key = 0
+            self.update(agent)
+        return self.value